@@ -6,7 +6,7 @@ TCP Network Service Ping Utilities
 """
 import json
 import os
-from .serviceping import calc_deviation, StatsList
+from .serviceping import calc_deviation, StatsList, WindowedStatsList
 from .network import scan
 
 
@@ -40,4 +40,7 @@ if __git_origin__.endswith('.git'):  # pragma: no cover
     __git_base_url__ = __git_origin__[:-4].strip('/')
 __source_url__ = __git_base_url__ + '/tree/' + __git_hash__
 
-__all__ = ['cli', 'commandline', 'network', 'serviceping']
+__all__ = [
+    'aio', 'cli', 'commandline', 'exporter', 'httpreader', 'network', 'output', 'pool', 'recording', 'resolver',
+    'results', 'rollup', 'scheduler', 'serviceping', 'session', 'sharded', 'synprobe', 'tls'
+]
@@ -0,0 +1,249 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Asyncio network port scan functions
+
+These coroutines mirror the blocking functions in :mod:`serviceping.network`
+so a single event loop can keep many probes in flight at once.
+"""
+import asyncio
+import socket
+import ssl
+import time
+from .httpreader import ConnectionClosed, async_read_response
+from .network import (
+    ScanFailed, _failure, _record_response, _remaining, _request_failure, calculate_durations, error_reason,
+    result_to_response, timedelta_durations
+)
+from .tls import get_context
+
+
+# asyncio.TimeoutError is only the same exception as socket.timeout from Python 3.11
+_TIMEOUTS = (asyncio.TimeoutError, socket.timeout)
+
+
+async def async_scan(
+        host, port=80, url=None, https=False, timeout=1.0, max_size=65535, dns_cache=None, verify=False,
+        keep_response=True
+):
+    """
+    Scan a network port without blocking the event loop
+
+    Parameters
+    ----------
+    host : str
+        Host or ip address to scan
+
+    port : int, optional
+        Port to scan, default=80
+
+    url : str, optional
+        URL to perform get request to on the host and port specified
+
+    https : bool, optional
+        Perform ssl connection on the socket, default=False
+
+    timeout : float
+        Number of seconds the whole scan, from the dns lookup to the end of the response, can
+        take before it times out, default=1
+
+    max_size : int, optional
+        The max size of the response kept in the result, 0 keeps the whole response.  The whole
+        response is always read and timed, default=65535
+
+    dns_cache : serviceping.resolver.DNSCache, optional
+        Cache to resolve the host with, the host is resolved on every scan if not provided
+
+    verify : bool, optional
+        Verify the server certificate and host name of ssl connections, default=False
+
+    keep_response : bool, optional
+        Decode the response of url requests and return it in the result, default=True
+
+    Returns
+    -------
+    dict
+        Result dictionary with the same keys as :func:`serviceping.network.scan`, asyncio
+        streams can not resume ssl sessions so ssl_resumed is always False
+
+    Raises
+    ------
+    ScanFailed - The scan operation failed
+    """
+    try:
+        result = await _async_scan(host, port, url, https, timeout, max_size, dns_cache, verify, keep_response)
+    except ScanFailed as failure:
+        failure.result['durations'] = timedelta_durations(failure.result.get('durations_ns'))
+        raise
+    if 'response' in result:
+        result['response'] = result['response'].decode('ascii', errors='ignore')
+    result['durations'] = timedelta_durations(result['durations_ns'])
+    return result
+
+
+async def _async_scan(host, port, url, https, timeout, max_size, dns_cache, verify, keep_response):
+    """
+    Scan a network port without blocking the event loop, the same as async_scan() except the
+    response is returned undecoded as bytes
+    """
+    loop = asyncio.get_running_loop()
+    starts = {}
+    ends = {}
+    port = int(port)
+    result = dict(
+        host=host, port=port, state='closed', durations_ns={}, ssl_version=''
+    )
+    if url:
+        result['code'] = None
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    starts['all'] = starts['dns'] = time.perf_counter_ns()
+
+    # DNS Lookup
+    try:
+        # The time left is taken before the lookup is started, so no lookup is left unawaited
+        remaining = _remaining(deadline)
+        if dns_cache is not None:
+            lookup = dns_cache.async_resolve(host)
+        else:
+            lookup = loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = await asyncio.wait_for(lookup, remaining)
+        hostip = addresses[0][1][0] if dns_cache is not None else addresses[0][4][0]
+        result['ip'] = hostip
+        ends['dns'] = time.perf_counter_ns()
+    except _TIMEOUTS:
+        # A lookup that does not finish in time is reported like a connect timeout
+        result['reason'] = 'timeout'
+        ends['all'] = time.perf_counter_ns()
+        calculate_durations(result, starts, ends)
+        return result
+    except socket.gaierror:
+        raise _failure(result, 'dns', 'DNS Lookup failed')
+
+    # Before Python 3.11 streams can not be upgraded to ssl, so the handshake
+    # is done as part of the connect and included in the connect duration.
+    tls_upgrade = https and hasattr(asyncio.StreamWriter, 'start_tls')
+    connect_ssl = get_context(host, verify) if https and not tls_upgrade else None
+
+    # TCP Connect
+    starts['connect'] = time.perf_counter_ns()
+    reader = writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(hostip, port, ssl=connect_ssl, server_hostname=host if connect_ssl else None),
+            _remaining(deadline)
+        )
+    except _TIMEOUTS:
+        result['reason'] = 'timeout'
+    except ssl.SSLError:
+        result['reason'] = 'ssl_error'
+    except OSError as error:
+        result['reason'] = error_reason(error.errno)
+    ends['connect'] = time.perf_counter_ns()
+
+    try:
+        # SSL
+        if tls_upgrade and writer:
+            starts['ssl'] = time.perf_counter_ns()
+            try:
+                await asyncio.wait_for(
+                    writer.start_tls(get_context(host, verify), server_hostname=host), _remaining(deadline)
+                )
+            except _TIMEOUTS:
+                raise _failure(result, 'timeout', f'SSL socket timeout ({timeout} seconds)')
+            except ssl.SSLError as error:
+                raise _failure(result, 'ssl_error', f'SSL error: {error}')
+            except OSError as error:
+                raise _failure(result, error_reason(error.errno), f'SSL connection error: {error}')
+            ends['ssl'] = time.perf_counter_ns()
+        if https and writer:
+            result['ssl_version'] = writer.get_extra_info('ssl_object').version()
+            result['ssl_resumed'] = False
+
+        # Get request
+        if writer and url:
+            starts['request'] = time.perf_counter_ns()
+            writer.write(
+                "GET {0} HTTP/1.0\r\nHost: {1}\r\n\r\n".format(
+                    url, host
+                ).encode('ascii'))
+            try:
+                response = await asyncio.wait_for(
+                    async_read_response(reader, max_size, keep_response), _remaining(deadline)
+                )
+            except _TIMEOUTS:
+                raise _failure(result, 'timeout', f'TCP socket timeout ({timeout} seconds)')
+            except (OSError, ValueError, ConnectionClosed) as error:
+                raise _request_failure(result, error, timeout)
+            _record_response(result, starts, ends, response)
+        # The scan ends before the connection is closed, closing is not part of the ping
+        ends['all'] = time.perf_counter_ns()
+    finally:
+        if writer:
+            writer.close()
+            try:
+                remaining = _remaining(deadline)
+                await asyncio.wait_for(writer.wait_closed(), remaining)
+            except _TIMEOUTS + (OSError,):
+                pass
+
+    # Calculate durations
+    calculate_durations(result, starts, ends)
+    if writer:
+        result['state'] = 'open'
+    return result
+
+
+async def async_ping(
+        host, port=80, url=None, https=False, timeout=1.0, max_size=65535, sequence=0, dns_cache=None, verify=False,
+        keep_response=True
+):
+    """
+    Ping a host without blocking the event loop
+
+    Parameters
+    ----------
+    host: str
+        The host or ip address to ping
+
+    port: int, optional
+        The port to ping, default=80
+
+    url: str, optional
+        URL to ping, will do a host/port ping if not provided
+
+    https: bool, optional
+        Connect via ssl, default=False
+
+    timeout: float, optional
+        Number of seconds to wait for a response before timing out, default=1 second
+
+    max_size: int, optional
+        The max size of the response kept in the ping response, 0 keeps the whole response,
+        default=65535.
+
+    sequence: int, optional
+        Sequence number for the ping request
+
+    dns_cache: serviceping.resolver.DNSCache, optional
+        Cache to resolve the host with, the host is resolved on every ping if not provided
+
+    verify: bool, optional
+        Verify the server certificate and host name of ssl connections, default=False
+
+    keep_response: bool, optional
+        Keep the decoded response of url pings in the ping response, default=True
+
+    Returns
+    -------
+    PingResponse:
+        The ping response object
+    """
+    try:
+        result = await _async_scan(host, port, url, https, timeout, max_size, dns_cache, verify, keep_response)
+    except ScanFailed as failure:
+        result = failure.result
+        result['error'] = True
+        result['error_message'] = str(failure)
+    return result_to_response(result, host=host, port=port, sequence=sequence)
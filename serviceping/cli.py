@@ -6,30 +6,96 @@
 Command line utility providing a ping like interface for pinging tcp/ssl
 services.
 """
+import asyncio
 import datetime
+import functools
 import socket
 import sys
 import time
-from urllib.parse import urlparse
+from collections import namedtuple
+from contextlib import ExitStack, redirect_stdout
 
-from .commandline import parse_arguments
-from .serviceping import calc_deviation
+from .aio import async_ping
+from .commandline import parse_arguments, parse_destination, read_destinations
+from .exporter import MetricsServer, PingMetrics
+from .output import BackgroundWriter, get_writer
+from .recording import RecordingWriter
+from .serviceping import StatsList, WindowedStatsList
 from .network import scan, ping
+from .resolver import DNSCache, getaddresses
+from .scheduler import IntervalScheduler
+from .session import PingSession
+from .tls import TLSSessionCache
 
 
 TIMEOUT = 10  # Set a reasonable timeout value
 
+PingCaches = namedtuple('PingCaches', ['dns', 'tls_sessions'])
 
-def exit_statistics(hostname, start_time, count_sent, count_received, min_time, avg_time, max_time, deviation):
+
+def milliseconds(value):
+    """
+    Convert a duration to floating point milliseconds
+
+    Parameters
+    ----------
+    value : int or datetime.timedelta
+        The duration as integer nanoseconds or as a timedelta
+
+    Returns
+    -------
+    float
+        The duration in milliseconds
+    """
+    if isinstance(value, datetime.timedelta):
+        return value / datetime.timedelta(milliseconds=1)
+    return value / 1000000
+
+
+def exit_statistics(
+        hostname, start_time, count_sent, count_received, min_time, avg_time, max_time, deviation, percentiles=None,
+        loss=None
+):
     """
     Print ping exit statistics
+
+    Parameters
+    ----------
+    hostname : str
+        The name shown in the statistics header
+
+    start_time : int or datetime.datetime
+        The time.perf_counter_ns() value when pinging started, a datetime is also accepted
+
+    count_sent : int
+        Number of pings sent
+
+    count_received : int
+        Number of pings that received a response
+
+    min_time : int or datetime.timedelta
+        The minimum ping time in nanoseconds or as a timedelta
+
+    avg_time : float
+        The average ping time in milliseconds
+
+    max_time : int or datetime.timedelta
+        The maximum ping time in nanoseconds or as a timedelta
+
+    deviation : float
+        The deviation of the ping times in milliseconds
+
+    percentiles : dict, optional
+        The estimated ping time percentiles in milliseconds, keyed by the percentile
+
+    loss : float, optional
+        The packet loss percentage, default is calculated from the sent and received counts
     """
-    end_time = datetime.datetime.now()
-    duration = end_time - start_time
-    duration_sec = float(duration.seconds * 1000)
-    duration_ms = float(duration.microseconds / 1000)
-    duration = duration_sec + duration_ms
-    package_loss = 100 - ((float(count_received) / float(count_sent)) * 100)
+    if isinstance(start_time, datetime.datetime):
+        duration = milliseconds(datetime.datetime.now() - start_time)
+    else:
+        duration = milliseconds(time.perf_counter_ns() - start_time)
+    package_loss = loss if loss is not None else 100 - ((float(count_received) / float(count_sent)) * 100)
     print(f'\b\b--- {hostname} ping statistics ---')
     try:
         print(f'{count_sent} packets transmitted, {count_received} received, {package_loss}% packet loss, time {duration}ms')
@@ -37,120 +103,762 @@ def exit_statistics(hostname, start_time, count_sent, count_received, min_time,
         print(f'{count_sent} packets transmitted, {count_received} received, 100% packet loss, time {duration}ms')
     print(
         'rtt min/avg/max/dev = %.2f/%.2f/%.2f/%.2f ms' % (
-            min_time.seconds*1000 + float(min_time.microseconds)/1000,
-            float(avg_time) / 1000,
-            max_time.seconds*1000 + float(max_time.microseconds)/1000,
+            milliseconds(min_time),
+            float(avg_time),
+            milliseconds(max_time),
             float(deviation)
         )
     )
+    if percentiles:
+        print('rtt %s = %s ms' % (
+            '/'.join('p%g' % percentile for percentile in percentiles.keys()),
+            '/'.join('%.2f' % value for value in percentiles.values())
+        ))
+
+
+def format_addresses(addresses):
+    """
+    Format the state and timings of each address tried by a ping
+
+    Parameters
+    ----------
+    addresses : list of dict
+        The addresses list of a ping response
+
+    Returns
+    -------
+    list of str
+        A line for each address
+    """
+    lines = []
+    for address in addresses:
+        line = '    address %s: state=%s ' % (address['ip'], address['state'])
+        if address.get('reason'):
+            line += 'reason=%s ' % address['reason']
+        line += ''.join(
+            '%s=%.2fms ' % (d, milliseconds(address['durations_ns'][d]))
+            for d in ['connect', 'ssl', 'request', 'all'] if d in address['durations_ns']
+        )
+        lines.append(line)
+    return lines
+
+
+def print_addresses(addresses):
+    """
+    Print the state and timings of each address tried by a ping
+
+    Parameters
+    ----------
+    addresses : list of dict
+        The addresses list of a ping response
+    """
+    print('\n'.join(format_addresses(addresses)))
+
+
+class PingStatistics(object):
+    """
+    Ping statistics accumulated over a series of ping responses
+
+    The min and max times cover every response, the average, deviation and percentiles
+    cover every response or only the most recent ``window`` responses.
+
+    Parameters
+    ----------
+    window : int, optional
+        Number of most recent responses the average, deviation and percentiles are
+        calculated from, default is every response
+    """
+    def __init__(self, window=None):
+        self.count_sent = self.count_received = 0
+        self.max_time = self.min_time = 0
+        self.stats = WindowedStatsList(window) if window else StatsList()
+        self.start_time = time.perf_counter_ns()
+
+    def update(self, ping_response):
+        """
+        Update the statistics with a ping response
+
+        Parameters
+        ----------
+        ping_response : PingResponse
+            The response of the ping
+        """
+        self.count_sent += 1
+        if not ping_response.responding:
+            return
+        self.count_received += 1
+        duration = ping_response.durations_ns['all']
+        if duration > self.max_time:
+            self.max_time = duration
+        if self.min_time == 0 or duration < self.min_time:
+            self.min_time = duration
+        self.stats.append(milliseconds(duration))
+
+    @property
+    def avg_time(self):
+        """
+        The average ping time in milliseconds
+        """
+        return self.stats.mean()
+
+    @property
+    def deviation(self):
+        """
+        The standard deviation of the ping times in milliseconds
+        """
+        return self.stats.standard_deviation()
+
+    def exit_statistics(self, hostname):
+        """
+        Print the exit statistics
+
+        Parameters
+        ----------
+        hostname : str
+            The name shown in the statistics header
+        """
+        exit_statistics(
+            hostname, self.start_time, self.count_sent, self.count_received, self.min_time, self.avg_time,
+            self.max_time, self.deviation, percentiles=self.stats.percentiles() if self.stats.count else None
+        )
+
+
+class PingTarget(PingStatistics):
+    """
+    The ping state and statistics of a single destination
+
+    The result of each ping is printed, or written as a record by the writer of a machine
+    readable output format if one is given, and appended to the recording if one is given.
+    """
+    def __init__(self, destination, window=None, writer=None, recorder=None):
+        super().__init__(window=window)
+        self.destination = destination
+        self.writer = writer
+        self.recorder = recorder
+        self.hostname, self.port, self.url, self.https = parse_destination(destination)
+        self.ip = None
+        self.rc = 1
+        self.session = None
+        self.scheduler = None
+
+    def banner(self):
+        """
+        Print the banner line shown when starting to ping the destination
+        """
+        print('SERVICEPING %s:%d (%s:%d).' % (self.hostname, self.port, self.ip, self.port))
+
+    def record(self, ping_response, timings=False, show_sequence=False):
+        """
+        Update the statistics with a ping response and print the result line
+
+        Parameters
+        ----------
+        ping_response : PingResponse
+            The response of the ping
+
+        timings : bool, optional
+            Print the timings of each stage of the ping, default=False
+
+        show_sequence : bool, optional
+            Include the sequence number of the ping in the output, default=False
+        """
+        self.update(ping_response)
+        self.rc = 0 if ping_response.responding else 1
+        if self.recorder is not None:
+            self.recorder.write(ping_response)
+        if self.writer is not None:
+            self.writer.write(ping_response)
+            return
+        # Format the result once so it is a single write to stdout
+        text = self.format(ping_response, timings=timings, show_sequence=show_sequence)
+        if text:
+            print(text)
+
+    def format(self, ping_response, timings=False, show_sequence=False):
+        """
+        Format the result of a ping response
+
+        Parameters
+        ----------
+        ping_response : PingResponse
+            The response of the ping
+
+        timings : bool, optional
+            Include the timings of each stage of the ping, default=False
+
+        show_sequence : bool, optional
+            Include the sequence number of the ping, default=False
+
+        Returns
+        -------
+        str
+            The result lines without a trailing newline, empty if nothing is shown for the
+            response
+        """
+        hostname, port, ip = self.hostname, self.port, ping_response.ip or self.ip
+        lines = []
+        if ping_response.responding:
+            code_string = ''
+            if ping_response.ssl_version:
+                code_string += f'ssl={ping_response.ssl_version}'
+                if ping_response.ssl_resumed:
+                    code_string += ':resumed'
+            if self.url:
+                if code_string:
+                    code_string += ':'
+                code_string += 'response=%s' % ping_response.code
+            if show_sequence:
+                code_string += ' seq=%d' % ping_response.sequence
+            line = '%sfrom %s:%s (%s:%s):%s' % (
+                '%d bytes ' % ping_response.length if ping_response.length else '',
+                hostname, port, ip, port, code_string
+            )
+            if timings:
+                line += ' ' + ''.join(
+                    '%s=%.2fms ' % (d, milliseconds(ping_response.durations_ns[d]))
+                    for d in ['dns', 'connect', 'ssl', 'ttfb', 'request', 'all'] if d in ping_response.durations_ns
+                )
+            else:
+                line += ' time=%.2f ms ' % milliseconds(ping_response.durations_ns['all'])
+            lines.append(line)
+        elif ping_response.error and ping_response.error_message:
+            if show_sequence:
+                lines.append(f'{ping_response.error_message} for {hostname}:{port} seq {ping_response.sequence}')
+            else:
+                lines.append(f'{ping_response.error_message} for seq {ping_response.sequence}')
+        elif show_sequence:
+            lines.append(
+                f'no response from {hostname}:{port} ({ip}:{port}): seq={ping_response.sequence} '
+                f'state={ping_response.state}{" reason=" + ping_response.reason if ping_response.reason else ""}'
+            )
+        if ping_response.addresses:
+            lines.extend(format_addresses(ping_response.addresses))
+        return '\n'.join(lines)
+
+    def exit_statistics(self, hostname=None, show_port=False):
+        """
+        Print the exit statistics of the destination
+
+        Parameters
+        ----------
+        hostname : str, optional
+            The name shown in the statistics header, default is the destination hostname
+
+        show_port : bool, optional
+            Include the port in the statistics header, default=False
+        """
+        if not hostname:
+            hostname = '%s:%d' % (self.hostname, self.port) if show_port else self.hostname
+        super().exit_statistics(hostname)
+        if self.session:
+            print('keep-alive %d requests, %d connections, %d reconnects' % (
+                self.session.requests, self.session.connections, self.session.reconnects
+            ))
+        if self.scheduler and self.scheduler.missed:
+            print('%d missed intervals, pings took longer than the %gs interval' % (
+                self.scheduler.missed, self.scheduler.period
+            ))
+
+    def close(self):
+        """
+        Close the persistent connection of the destination, if there is one
+        """
+        if self.session:
+            self.session.close()
+
+
+def ping_arguments(options, caches=None):
+    """
+    Get the keyword arguments of the ping functions for the command line options
+
+    Parameters
+    ----------
+    options : argparse.Namespace
+        The parsed command line options
+
+    caches : PingCaches, optional
+        The caches shared by the pings
+
+    Returns
+    -------
+    dict
+        The keyword arguments
+    """
+    caches = caches or PingCaches(dns=None, tls_sessions=None)
+    # The response body is only written by the machine readable formats
+    return dict(
+        timeout=options.timeout, dns_cache=caches.dns, address_mode=options.address_mode, tls_sessions=caches.tls_sessions,
+        keep_response=options.output_format != 'text' and not options.no_response_body
+    )
+
+
+def target_session(target, options, caches=None):
+    """
+    Get the persistent connection session used to ping a destination
+
+    Parameters
+    ----------
+    target : PingTarget
+        The destination to ping
+
+    options : argparse.Namespace
+        The parsed command line options
+
+    caches : PingCaches, optional
+        The caches shared by the pings
+
+    Returns
+    -------
+    PingSession
+        The session of the destination, or None if the destination is not pinged over a
+        persistent connection
+    """
+    if not options.keep_alive or not target.url:
+        return None
+    if not target.session:
+        arguments = ping_arguments(options, caches)
+        del arguments['address_mode']
+        target.session = PingSession(target.hostname, port=target.port, url=target.url, https=target.https, **arguments)
+    return target.session
+
+
+def target_scheduler(target, options):
+    """
+    Get the scheduler that spaces out the pings of a destination, creating it on first use
+
+    Parameters
+    ----------
+    target : PingTarget
+        The destination
+
+    options : argparse.Namespace
+        The parsed command line options
+
+    Returns
+    -------
+    IntervalScheduler
+        The scheduler of the destination
+    """
+    if target.scheduler is None:
+        target.scheduler = IntervalScheduler(options.interval, jitter=options.jitter, rate=options.rate)
+    return target.scheduler
+
+
+async def ping_once(target, options, sequence, caches=None):
+    """
+    Ping a destination once from the event loop
+
+    The address modes that probe multiple addresses, ssl session resumption and persistent
+    connections are only provided by the blocking ping, so those pings are run in the default
+    executor.
+
+    Returns
+    -------
+    PingResponse:
+        The ping response object
+    """
+    session = target_session(target, options, caches)
+    if session:
+        return await asyncio.get_running_loop().run_in_executor(None, session.ping, sequence)
+    arguments = ping_arguments(options, caches)
+    if arguments['address_mode'] == 'first' and arguments['tls_sessions'] is None:
+        del arguments['address_mode'], arguments['tls_sessions']
+        return await async_ping(
+            host=target.hostname, port=target.port, url=target.url, https=target.https, sequence=sequence, **arguments
+        )
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+        ping, host=target.hostname, port=target.port, url=target.url, https=target.https, sequence=sequence, **arguments
+    ))
+
+
+async def ping_target(target, options, semaphore, caches=None):
+    """
+    Ping a single destination until the requested count is reached
+
+    Parameters
+    ----------
+    target : PingTarget
+        The destination to ping
+
+    options : argparse.Namespace
+        The parsed command line options
+
+    semaphore : asyncio.Semaphore
+        Semaphore bounding the number of pings in flight
+
+    caches : PingCaches, optional
+        The caches shared by the pings
+    """
+    scheduler = target_scheduler(target, options)
+    while True:
+        await scheduler.async_wait()
+        async with semaphore:
+            ping_response = await ping_once(target, options, target.count_sent, caches=caches)
+        target.record(ping_response, timings=options.timings, show_sequence=True)
+        if options.count and options.count == target.count_sent:
+            return
+
+
+async def ping_targets(targets, options, caches=None):
+    """
+    Ping multiple destinations concurrently
+
+    Parameters
+    ----------
+    targets : list of PingTarget
+        The destinations to ping
+
+    options : argparse.Namespace
+        The parsed command line options
+
+    caches : PingCaches, optional
+        The caches shared by the pings
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max(options.concurrency, 1))
+    resolved = []
+    for target in targets:
+        try:
+            if caches and caches.dns is not None:
+                target.ip = (await caches.dns.async_resolve(target.hostname))[0][1][0]
+            else:
+                addresses = await loop.getaddrinfo(target.hostname, target.port, type=socket.SOCK_STREAM)
+                target.ip = addresses[0][4][0]
+        except socket.gaierror:
+            print('serviceping: unknown host %s' % target.hostname, file=sys.stderr)
+            continue
+        target.banner()
+        resolved.append(target)
+    await asyncio.gather(*[ping_target(target, options, semaphore, caches=caches) for target in resolved])
+    return resolved
+
+
+async def ping_destination(destination, options, summary, caches=None, writer=None, recorder=None):
+    """
+    Ping a destination read from a target file and print one line per ping as it finishes
+
+    Parameters
+    ----------
+    destination : str
+        The destination to ping
+
+    options : argparse.Namespace
+        The parsed command line options
+
+    summary : PingStatistics
+        Statistics accumulated across every destination
+
+    caches : PingCaches, optional
+        The caches shared by the pings
+
+    writer : serviceping.output.ResponseWriter, optional
+        The writer of the machine readable output format, default is to print the results
+
+    recorder : serviceping.recording.RecordingWriter, optional
+        The recording to append the results to
+    """
+    try:
+        target = PingTarget(destination, window=options.window, writer=writer, recorder=recorder)
+    except ValueError:
+        print('serviceping: invalid destination %s' % destination, file=sys.stderr)
+        summary.rc = 1
+        return
+    scheduler = target_scheduler(target, options)
+    for sequence in range(options.count or 1):
+        await scheduler.async_wait()
+        ping_response = await ping_once(target, options, sequence, caches=caches)
+        target.record(ping_response, timings=options.timings, show_sequence=True)
+        summary.update(ping_response)
+    target.close()
+    if target.rc:
+        summary.rc = 1
+
+
+async def ping_destinations(destinations, options, summary, caches=None, writer=None, recorder=None):
+    """
+    Ping a stream of destinations, with at most ``options.concurrency`` destinations in progress
+
+    Destinations are pulled from the iterable only as slots become free, so arbitrarily long
+    target lists are handled without loading them or their results into memory.
+
+    Parameters
+    ----------
+    destinations : iterable of str
+        The destinations to ping
+
+    options : argparse.Namespace
+        The parsed command line options
+
+    summary : PingStatistics
+        Statistics accumulated across every destination
+    """
+    semaphore = asyncio.Semaphore(max(options.concurrency, 1))
+    pending = set()
+
+    async def run(destination):
+        try:
+            await ping_destination(destination, options, summary, caches=caches, writer=writer, recorder=recorder)
+        finally:
+            semaphore.release()
+
+    for destination in destinations:
+        await semaphore.acquire()
+        summary.destinations += 1
+        task = asyncio.ensure_future(run(destination))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.gather(*pending)
+
+
+async def monitor_targets(targets, options, metrics, caches=None):
+    """
+    Ping destinations on their schedule and update the exported metrics with each response
+
+    The destinations are pinged until the requested count is reached, or forever if no
+    count was given.
+
+    Parameters
+    ----------
+    targets : list of PingTarget
+        The destinations to ping
+
+    options : argparse.Namespace
+        The parsed command line options
+
+    metrics : serviceping.exporter.PingMetrics
+        The metrics to update
+
+    caches : PingCaches, optional
+        The caches shared by the pings
+    """
+    semaphore = asyncio.Semaphore(max(options.concurrency, 1))
+
+    async def monitor(target):
+        scheduler = target_scheduler(target, options)
+        while not options.count or target.count_sent < options.count:
+            await scheduler.async_wait()
+            async with semaphore:
+                ping_response = await ping_once(target, options, target.count_sent, caches=caches)
+            target.update(ping_response)
+            metrics.update(target.destination, ping_response)
+            if target.recorder is not None:
+                target.recorder.write(ping_response)
+
+    await asyncio.gather(*[monitor(target) for target in targets])
+
+
+def run_exporter(destinations, options, caches=None, recorder=None):
+    """
+    Run the exporter daemon, pinging the destinations and serving their metrics
+
+    Parameters
+    ----------
+    destinations : iterable of str
+        The destinations to ping
+
+    options : argparse.Namespace
+        The parsed command line options
+
+    caches : PingCaches, optional
+        The caches shared by the pings
+
+    recorder : serviceping.recording.RecordingWriter, optional
+        The recording to append the results to
+
+    Returns
+    -------
+    int
+        The exit return code
+    """
+    metrics = PingMetrics()
+    targets = []
+    for destination in destinations:
+        try:
+            targets.append(PingTarget(destination, window=options.window, recorder=recorder))
+        except ValueError:
+            print('serviceping: invalid destination %s' % destination, file=sys.stderr)
+            return 1
+        metrics.add_target(destination)
+    address, port = options.exporter
+    with MetricsServer(metrics, address, port) as server:
+        print('SERVICEPING exporter serving %d destinations on http://%s:%d/metrics' % (
+            len(targets), server.address, server.port
+        ))
+        try:
+            asyncio.run(monitor_targets(targets, options, metrics, caches=caches))
+        except KeyboardInterrupt:  # pragma: no cover
+            pass
+        finally:
+            for target in targets:
+                target.close()
+    return 0
+
+
+def ping_file(filename, options, caches=None, writer=None, recorder=None):
+    """
+    Ping every destination listed in a target file, "-" reads the destinations from stdin
+
+    Parameters
+    ----------
+    filename : str
+        The name of the target file
+
+    options : argparse.Namespace
+        The parsed command line options
+
+    caches : PingCaches, optional
+        The caches shared by the pings
+
+    writer : serviceping.output.ResponseWriter, optional
+        The writer of the machine readable output format, default is to print the results
+
+    recorder : serviceping.recording.RecordingWriter, optional
+        The recording to append the results to
+
+    Returns
+    -------
+    int
+        The exit return code
+    """
+    summary = PingStatistics(window=options.window)
+    summary.destinations = 0
+    summary.rc = 0
+    file_handle = sys.stdin if filename == '-' else open(filename)
+    try:
+        asyncio.run(ping_destinations(
+            read_destinations(file_handle), options, summary, caches=caches, writer=writer, recorder=recorder
+        ))
+    except KeyboardInterrupt:  # pragma: no cover
+        pass
+    finally:
+        if file_handle is not sys.stdin:
+            file_handle.close()
+    if summary.count_sent:
+        summary.exit_statistics('%d destinations' % summary.destinations)
+    return summary.rc
 
 
 def main():
     (options, command_args) = parse_arguments()
 
-    rc = 1
-    https = False
-    if command_args[0].startswith('http:') or command_args[0].startswith('https:'):
-        urlp = urlparse(command_args[0])
-        hostname = urlp.hostname
-        port = urlp.port
-        if command_args[0].startswith('https:'):
-            https = True
-        if not port:
-            if urlp.scheme in ['https']:
-                port = 443
-            else:
-                port = 80
-        url = urlp.path
-    else:
-        args = command_args[0].split(':')
-        hostname = args[0]
+    # Share host lookups between the cli and the pings, unless every ping should do its own lookup
+    caches = PingCaches(
+        dns=None if options.no_dns_cache else DNSCache(),
+        tls_sessions=TLSSessionCache() if options.tls_resume else None
+    )
+
+    with ExitStack() as stack:
+        recorder = None
+        if options.record:
+            try:
+                recorder = stack.enter_context(RecordingWriter(options.record))
+            except (OSError, ValueError) as error:
+                print('serviceping: can not record to %s: %s' % (options.record, error), file=sys.stderr)
+                return 1
+        # The output is written from a background thread so a slow terminal or pipe does not
+        # delay the pings
+        if options.output_format == 'text':
+            stack.enter_context(redirect_stdout(stack.enter_context(BackgroundWriter(sys.stdout))))
+            return run_pings(options, command_args, caches, recorder=recorder)
+        # Only the records go to stdout, the banners and statistics are printed to stderr
+        output = stack.enter_context(BackgroundWriter(sys.stdout.buffer))
         try:
-            port = int(args[1])
-        except IndexError:
-            port = 80
+            writer = get_writer(options.output_format, output, response_body=not options.no_response_body)
+        except RuntimeError as error:
+            print('serviceping: %s' % error, file=sys.stderr)
+            return 1
+        stack.enter_context(writer)
+        stack.enter_context(redirect_stdout(sys.stderr))
+        return run_pings(options, command_args, caches, writer=writer, recorder=recorder)
+
+
+def run_pings(options, command_args, caches, writer=None, recorder=None):
+    """
+    Ping the destinations of the command line
+
+    Parameters
+    ----------
+    options : argparse.Namespace
+        The parsed command line options
+
+    command_args : list of str
+        The destinations on the command line
+
+    caches : PingCaches
+        The caches shared by the pings
+
+    writer : serviceping.output.ResponseWriter, optional
+        The writer of the machine readable output format, default is to print the results
+
+    recorder : serviceping.recording.RecordingWriter, optional
+        The recording to append the results to
+
+    Returns
+    -------
+    int
+        The exit return code
+    """
+    if options.exporter:
+        destinations = list(command_args)
+        if options.target_file:
+            with (open(options.target_file) if options.target_file != '-' else sys.stdin) as file_handle:
+                destinations.extend(read_destinations(file_handle))
+        return run_exporter(destinations, options, caches=caches, recorder=recorder)
+
+    if options.target_file:
+        return ping_file(options.target_file, options, caches=caches, writer=writer, recorder=recorder)
+
+    if len(command_args) > 1:
+        rc = 0
+        targets = []
+        for destination in command_args:
+            try:
+                targets.append(PingTarget(destination, window=options.window, writer=writer, recorder=recorder))
+            except ValueError:
+                print('serviceping: invalid destination %s' % destination, file=sys.stderr)
+                rc = 1
+        if not targets:
+            return rc
         try:
-            url = args[2]
-        except IndexError:
-            url = None
-    count_sent = count_received = 0
-    max_time = min_time = datetime.timedelta(0)
-    avg_time = 0
-    deviation = 0
-    start_time = datetime.datetime.now()
-    times = []
+            asyncio.run(ping_targets(targets, options, caches=caches))
+        except KeyboardInterrupt:  # pragma: no cover
+            pass
+        for target in targets:
+            target.close()
+            if target.count_sent:
+                target.exit_statistics(show_port=True)
+        return max([rc] + [target.rc for target in targets])
+
+    target = PingTarget(command_args[0], window=options.window, writer=writer, recorder=recorder)
     try:
-        ip = socket.gethostbyname(hostname)
+        addresses = caches.dns.resolve(target.hostname) if caches.dns is not None else getaddresses(target.hostname)
+        target.ip = addresses[0][1][0]
     except socket.gaierror:
-        print('serviceping: unknown host %s' % hostname, file=sys.stderr)
+        print('serviceping: unknown host %s' % target.hostname, file=sys.stderr)
         return 1
-    print('SERVICEPING %s:%d (%s:%d).' % (hostname, port, ip, port))
+    target.banner()
+    session = target_session(target, options, caches)
+    scheduler = target_scheduler(target, options)
     while True:
         try:
-            ip = socket.gethostbyname(hostname)
-        except socket.gaierror:
-            print('serviceping: unknown host %s' % hostname, file=sys.stderr)
-            return 1
-
-        try:
-            ping_response = ping(host=hostname, port=port, url=url, https=https, sequence=count_sent, timeout=options.timeout)
-            count_sent += 1
-            if ping_response.responding:
-                count_received += 1
-                if ping_response.durations['all'] > max_time:
-                    max_time = ping_response.durations['all']
-                if min_time == datetime.timedelta(0) or ping_response.durations['all'] < min_time:
-                    min_time = ping_response.durations['all']
-                times.append(ping_response.durations['all'].seconds * 1000 + float(ping_response.durations['all'].microseconds))
-                avg_time = sum(times) / float(len(times))
-                deviation = calc_deviation(times, avg_time)
-                if len(times) > 100:
-                    times = times[-100:]
-                code_string = ''
-                if ping_response.ssl_version:
-                    code_string += f'ssl={ping_response.ssl_version}'
-                if url:
-                    if code_string:
-                        code_string += ':'
-                    code_string += 'response=%s' % ping_response.code
-                if options.timings:
-                    print(
-                        '%sfrom %s:%s (%s:%s):%s' % (
-                            '%d bytes ' % ping_response.length if ping_response.length else '',
-                            hostname, port, ip, port, code_string),
-                        end=" "
-                    )
-                    for d in ['dns', 'connect', 'ssl', 'request', 'all']:
-                        if d in ping_response.durations.keys():
-                            print('%s=%.2fms' % (
-                                d,
-                                ping_response.durations[d].seconds * 1000
-                                + float(ping_response.durations[d].microseconds) / 1000
-                            ), end=" ")
-                else:
-                    print(
-                        '%sfrom %s:%s (%s:%s):%s time=%.2f ms' % (
-                            '%d bytes ' % ping_response.length if ping_response.length else '',
-                            hostname, port, ip, port, code_string,
-                            float(
-                                ping_response.durations['all'].seconds * 1000
-                                + ping_response.durations['all'].microseconds
-                            ) / 1000
-                        ),
-                        end=" ")
-                print()
-                rc = 0
+            scheduler.wait()
+            if session:
+                ping_response = session.ping(sequence=target.count_sent)
             else:
-                if ping_response.error and ping_response.error_message:
-                    print(f'{ping_response.error_message} for seq {ping_response.sequence}')
-                rc = 1
-            if options.count and options.count == count_sent:
-                exit_statistics(hostname, start_time, count_sent, count_received, min_time, avg_time, max_time, deviation)
-                return rc
-            time.sleep(options.interval)
+                ping_response = ping(
+                    host=target.hostname, port=target.port, url=target.url, https=target.https,
+                    sequence=target.count_sent, **ping_arguments(options, caches)
+                )
+            target.record(ping_response, timings=options.timings)
+            if options.count and options.count == target.count_sent:
+                target.close()
+                target.exit_statistics()
+                return target.rc
         except KeyboardInterrupt:  # pragma: no cover
-            exit_statistics(hostname, start_time, count_sent, count_received, min_time, avg_time, max_time, deviation)
-            return rc
+            target.close()
+            target.exit_statistics()
+            return target.rc
 
 
 if __name__ == '__main__':  # pragma: no cover
@@ -2,6 +2,100 @@
 Command Line Utility Functions
 """
 import argparse
+from collections import namedtuple
+from urllib.parse import urlparse
+
+
+Destination = namedtuple('Destination', ['hostname', 'port', 'url', 'https'])
+
+
+def parse_destination(destination):
+    """
+    Parse a destination command line argument
+
+    Parameters
+    ----------
+    destination : str
+        A url or a destination in the form of host[:port[:url]]
+
+    Returns
+    -------
+    Destination
+        Named tuple with the hostname, port, url and https values of the destination
+    """
+    https = False
+    if destination.startswith('http:') or destination.startswith('https:'):
+        urlp = urlparse(destination)
+        hostname = urlp.hostname
+        port = urlp.port
+        if destination.startswith('https:'):
+            https = True
+        if not port:
+            if urlp.scheme in ['https']:
+                port = 443
+            else:
+                port = 80
+        url = urlp.path
+    else:
+        args = destination.split(':')
+        hostname = args[0]
+        try:
+            port = int(args[1])
+        except IndexError:
+            port = 80
+        try:
+            url = args[2]
+        except IndexError:
+            url = None
+    return Destination(hostname, port, url, https)
+
+
+def read_destinations(file_handle):
+    """
+    Lazily read destinations from a file, one destination per line
+
+    Blank lines and lines starting with a "#" are skipped.
+
+    Parameters
+    ----------
+    file_handle : file
+        The file object to read the destinations from
+
+    Yields
+    ------
+    str
+        The destinations in the file
+    """
+    for line in file_handle:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        yield line
+
+
+def parse_listen_address(value):
+    """
+    Parse a listen address command line argument
+
+    Parameters
+    ----------
+    value : str
+        A port or an address and port in the form of address:port
+
+    Returns
+    -------
+    tuple
+        The address, 127.0.0.1 if only a port is given, and the port
+
+    Raises
+    ------
+    argparse.ArgumentTypeError - The port is not a number
+    """
+    address, _, port = value.rpartition(':')
+    try:
+        return address.strip('[]') or '127.0.0.1', int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid listen address %r' % value)
 
 
 def parse_arguments():
@@ -22,11 +116,76 @@ def parse_arguments():
         help="Show timings for the entire connection"
     )
     parser.add_argument(
-        'destination', nargs='+', help='Destination host or URL'
+        'destination', nargs='*', help='Destination host or URL'
+    )
+    parser.add_argument(
+        "-f", dest="target_file", default=None,
+        help="Read the destinations from a file, one per line, use - to read from stdin"
     )
     parser.add_argument(
         "-W", dest="timeout", default=1.0, type=float,
         help="Time  to  wait  for a response, in seconds. The option affects only timeout in absence of any responses"
     )
+    parser.add_argument(
+        "--concurrency", dest="concurrency", default=10, type=int,
+        help="Maximum number of pings in flight at once when pinging multiple destinations"
+    )
+    parser.add_argument(
+        "--no-dns-cache", dest="no_dns_cache", default=False, action="store_true",
+        help="Resolve the destination host on every ping instead of caching the lookups"
+    )
+    parser.add_argument(
+        "--addresses", dest="address_mode", default="first", choices=['first', 'all', 'race'],
+        help="How to ping hosts with multiple addresses: the first address, all addresses in parallel "
+             "or race the addresses (happy eyeballs), default=first"
+    )
+    parser.add_argument(
+        "--tls-resume", dest="tls_resume", default=False, action="store_true",
+        help="Resume the ssl session of the previous ping to measure resumed instead of full ssl handshakes"
+    )
+    parser.add_argument(
+        "--keep-alive", dest="keep_alive", default=False, action="store_true",
+        help="Send the url pings of each destination over one persistent HTTP/1.1 connection"
+    )
+    parser.add_argument(
+        "--window", dest="window", default=None, type=int,
+        help="Calculate the average, deviation and percentiles from only the last WINDOW pings"
+    )
+    parser.add_argument(
+        "--jitter", dest="jitter", default=0.0, type=float,
+        help="Delay each ping by a random fraction of up to JITTER of the interval, between 0 and 1, default=0"
+    )
+    parser.add_argument(
+        "--rate", dest="rate", default=None, type=float,
+        help="Maximum number of pings per second to each destination"
+    )
+    parser.add_argument(
+        "--exporter", dest="exporter", default=None, type=parse_listen_address, metavar="[ADDRESS:]PORT",
+        help="Ping the destinations continuously and serve their metrics for Prometheus on "
+             "http://ADDRESS:PORT/metrics, the address defaults to 127.0.0.1"
+    )
+    parser.add_argument(
+        "--format", dest="output_format", default="text", choices=['text', 'jsonl', 'csv', 'msgpack'],
+        help="Write the result of each ping to stdout as human readable text, JSON lines, CSV rows or "
+             "MessagePack maps, default=text"
+    )
+    parser.add_argument(
+        "--no-response-body", dest="no_response_body", default=False, action="store_true",
+        help="Leave the response of url pings out of the jsonl, csv and msgpack records"
+    )
+    parser.add_argument(
+        "--record", dest="record", default=None, metavar="FILE",
+        help="Append the result of each ping to the binary recording FILE, see serviceping.recording"
+    )
     args = parser.parse_args()
+    if not args.destination and not args.target_file:
+        parser.error('a destination or a target file is required')
+    if args.window is not None and args.window < 1:
+        parser.error('the window must be at least 1')
+    if args.interval < 0:
+        parser.error('the interval can not be negative')
+    if not 0 <= args.jitter <= 1:
+        parser.error('the jitter must be between 0 and 1')
+    if args.rate is not None and args.rate <= 0:
+        parser.error('the rate must be greater than 0')
     return args, args.destination
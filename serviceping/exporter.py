@@ -0,0 +1,237 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Prometheus / OpenMetrics exporter of ping metrics
+"""
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EXPORTED_PHASES = ('dns', 'connect', 'ssl', 'request', 'ttfb', 'all')
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+def _escape(value):
+    """
+    Escape a label value of the exposition format
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+class _TargetMetrics(object):
+    """
+    The metrics of one target
+    """
+    __slots__ = ('label', 'up', 'pings', 'errors', 'buckets', 'sums', 'counts')
+
+    def __init__(self, target, phases, bucket_count):
+        self.label = 'target="%s"' % _escape(target)
+        self.up = 0
+        self.pings = 0
+        self.errors = {}
+        self.buckets = {phase: [0] * bucket_count for phase in phases}
+        self.sums = dict.fromkeys(phases, 0)
+        self.counts = dict.fromkeys(phases, 0)
+
+
+class PingMetrics(object):
+    """
+    Metrics of the pings of a set of targets
+
+    The histograms, gauges and counters are updated as each ping response arrives and only
+    the aggregates are kept, so rendering the metrics takes time in proportion to the number
+    of targets no matter how many pings were done.  The metrics can be updated and rendered
+    from different threads.
+
+    The exported metrics are:
+
+    * serviceping_up - 1 if the last ping of the target responded, 0 if not
+    * serviceping_pings_total - the number of pings of the target
+    * serviceping_errors_total - the number of failed pings of the target, by reason
+    * serviceping_duration_seconds - histogram of the duration of each phase of the pings
+      that responded, by phase
+
+    Parameters
+    ----------
+    buckets : iterable of float, optional
+        The upper bounds of the histogram buckets in seconds, default=DEFAULT_BUCKETS
+
+    phases : iterable of str, optional
+        The phases of the ping durations to export, default=EXPORTED_PHASES
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, phases=EXPORTED_PHASES):
+        self.bounds = tuple(sorted(buckets)) + (float('inf'),)
+        self._bounds_ns = [bound * 1000000000 for bound in self.bounds]
+        self.phases = tuple(phases)
+        self._targets = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._targets)
+
+    def _target(self, target):
+        metrics = self._targets.get(target)
+        if metrics is None:
+            metrics = self._targets[target] = _TargetMetrics(target, self.phases, len(self.bounds))
+        return metrics
+
+    def add_target(self, target):
+        """
+        Add a target so it is exported as down before its first ping
+
+        Parameters
+        ----------
+        target : str
+            The name of the target, used as the target label
+        """
+        with self._lock:
+            self._target(target)
+
+    def update(self, target, ping_response):
+        """
+        Update the metrics of a target with a ping response
+
+        Parameters
+        ----------
+        target : str
+            The name of the target, used as the target label
+
+        ping_response : PingResponse
+            The response of the ping
+        """
+        with self._lock:
+            metrics = self._target(target)
+            metrics.pings += 1
+            metrics.up = 1 if ping_response.responding else 0
+            if not ping_response.responding:
+                reason = ping_response.reason or 'error'
+                metrics.errors[reason] = metrics.errors.get(reason, 0) + 1
+                return
+            durations_ns = ping_response.durations_ns or {}
+            for phase in self.phases:
+                duration = durations_ns.get(phase)
+                if duration is None:
+                    continue
+                metrics.buckets[phase][bisect_left(self._bounds_ns, duration)] += 1
+                metrics.sums[phase] += duration
+                metrics.counts[phase] += 1
+
+    def render(self, openmetrics=False):
+        """
+        Render the metrics in the exposition format
+
+        Parameters
+        ----------
+        openmetrics : bool, optional
+            Render the OpenMetrics format instead of the Prometheus text format, default=False
+
+        Returns
+        -------
+        str
+            The metrics
+        """
+        with self._lock:
+            snapshot = [
+                (metrics.label, metrics.up, metrics.pings, dict(metrics.errors),
+                 {phase: list(counts) for phase, counts in metrics.buckets.items()}, dict(metrics.sums),
+                 dict(metrics.counts))
+                for metrics in self._targets.values()
+            ]
+        counter_suffix = '' if openmetrics else '_total'
+        lines = [
+            '# HELP serviceping_up Whether the last ping of the target responded',
+            '# TYPE serviceping_up gauge',
+        ]
+        lines.extend('serviceping_up{%s} %d' % (label, up) for label, up, *_ in snapshot)
+        lines.extend([
+            '# HELP serviceping_pings%s Number of pings of the target' % counter_suffix,
+            '# TYPE serviceping_pings%s counter' % counter_suffix,
+        ])
+        lines.extend('serviceping_pings_total{%s} %d' % (label, pings) for label, _, pings, *_ in snapshot)
+        lines.extend([
+            '# HELP serviceping_errors%s Number of failed pings of the target by reason' % counter_suffix,
+            '# TYPE serviceping_errors%s counter' % counter_suffix,
+        ])
+        for label, _, _, errors, *_ in snapshot:
+            for reason, count in sorted(errors.items()):
+                lines.append('serviceping_errors_total{%s,reason="%s"} %d' % (label, _escape(reason), count))
+        lines.extend([
+            '# HELP serviceping_duration_seconds Duration of each phase of the pings that responded',
+            '# TYPE serviceping_duration_seconds histogram',
+        ])
+        for label, _, _, _, buckets, sums, counts in snapshot:
+            for phase in self.phases:
+                phase_label = '%s,phase="%s"' % (label, phase)
+                cumulative = 0
+                for bound, count in zip(self.bounds, buckets[phase]):
+                    cumulative += count
+                    lines.append('serviceping_duration_seconds_bucket{%s,le="%s"} %d' % (
+                        phase_label, _format_bound(bound), cumulative
+                    ))
+                lines.append('serviceping_duration_seconds_sum{%s} %r' % (phase_label, sums[phase] / 1000000000))
+                lines.append('serviceping_duration_seconds_count{%s} %d' % (phase_label, counts[phase]))
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+        body = self.metrics.render(openmetrics=openmetrics).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class _MetricsHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class MetricsServer(object):
+    """
+    Context manager serving the metrics on a /metrics http endpoint from a background thread
+
+    Parameters
+    ----------
+    metrics : PingMetrics
+        The metrics to serve
+
+    address : str, optional
+        The address to listen on, default="127.0.0.1"
+
+    port : int, optional
+        The port to listen on, 0 picks a free port, default=9115
+    """
+    def __init__(self, metrics, address='127.0.0.1', port=9115):
+        handler = type('MetricsHandler', (_MetricsHandler,), {'metrics': metrics})
+        self.server = _MetricsHTTPServer((address, port), handler)
+        self.address, self.port = self.server.server_address[:2]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
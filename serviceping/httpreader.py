@@ -0,0 +1,309 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Streaming HTTP/1.1 response reader
+"""
+import asyncio
+import socket
+import threading
+import time
+
+
+RECV_SIZE = 65536
+NO_BODY_CODES = (204, 304)
+
+_buffers = threading.local()
+
+
+class ConnectionClosed(Exception):
+    """
+    The server closed the connection before sending a response
+    """
+
+
+class HTTPResponseParser(object):
+    """
+    Incremental parser of a HTTP/1.0 or HTTP/1.1 response
+
+    The data received from the connection is fed to the parser as it arrives.  The status
+    line and headers are parsed once they are complete, then the end of the body is found
+    from the Content-Length header, the chunked transfer encoding or the connection closing.
+    Body bytes are counted and dropped, only the first max_size bytes of the response are
+    kept and they are only decoded when the response attribute is read.
+
+    The time.perf_counter_ns() time the first byte, the end of the headers and the end of the
+    response were received are recorded in first_byte_ns, headers_ns and done_ns.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        Number of bytes of the response to keep, 0 keeps the whole response, default=65535
+
+    keep_response : bool, optional
+        Keep the start of the response, default=True
+    """
+    def __init__(self, max_size=65535, keep_response=True):
+        self.max_size = max_size
+        self.kept = bytearray() if keep_response else None
+        self.buffer = bytearray()
+        self.state = 'headers'
+        self.version = None
+        self.code = None
+        self.headers = {}
+        self.length = 0
+        self.body_length = 0
+        self.remaining = 0
+        self.keep_alive = False
+        self.done = False
+        self.first_byte_ns = None
+        self.headers_ns = None
+        self.done_ns = None
+
+    @property
+    def response(self):
+        """
+        The decoded start of the response, None if the response was not kept
+
+        The kept bytes are decoded each time this is read, use kept to get the bytes.
+        """
+        if self.kept is None:
+            return None
+        return self.kept.decode('ascii', errors='ignore')
+
+    def feed(self, data):
+        """
+        Parse data received from the connection
+
+        Parameters
+        ----------
+        data : bytes or memoryview
+            The received data, the parser copies what it needs so a memoryview of a receive
+            buffer can be reused once this returns
+
+        Returns
+        -------
+        bool
+            True if the response is complete
+
+        Raises
+        ------
+        ValueError - The response is not a valid HTTP response
+        """
+        if self.first_byte_ns is None:
+            self.first_byte_ns = time.perf_counter_ns()
+        self.length += len(data)
+        if self.kept is not None and (not self.max_size or len(self.kept) < self.max_size):
+            self.kept += data[:self.max_size - len(self.kept)] if self.max_size else data
+        if self.state == 'headers':
+            self.buffer += data
+            end = self.buffer.find(b'\r\n\r\n')
+            if end < 0:
+                return False
+            self._parse_headers(bytes(self.buffer[:end]))
+            # The rest of the buffer is the start of the body, which is the end of the data
+            data = data[len(data) - (len(self.buffer) - end - 4):]
+            self.buffer.clear()
+        if self.state == 'length':
+            self.body_length += min(len(data), self.remaining)
+            self.remaining -= len(data)
+            if self.remaining <= 0:
+                self._finish()
+        elif self.state == 'until_close':
+            self.body_length += len(data)
+        elif self.state in ('chunk_size', 'trailers'):
+            self._feed_chunked(data)
+        return self.done
+
+    def eof(self):
+        """
+        Handle the server closing the connection
+
+        Returns
+        -------
+        bool
+            True, the response is complete when the connection is closed
+
+        Raises
+        ------
+        ConnectionClosed - The server closed the connection without sending anything
+
+        ValueError - The server closed the connection in the middle of the headers
+        """
+        if self.state == 'headers':
+            if not self.length:
+                raise ConnectionClosed()
+            raise ValueError('Connection closed during the response headers')
+        self._finish()
+        self.keep_alive = False
+        return True
+
+    def _finish(self):
+        self.done = True
+        self.state = 'done'
+        self.done_ns = time.perf_counter_ns()
+
+    def _parse_headers(self, head):
+        self.headers_ns = time.perf_counter_ns()
+        lines = head.split(b'\r\n')
+        status = lines[0].split(None, 2)
+        if len(status) < 2 or not status[0].startswith(b'HTTP/'):
+            raise ValueError('Invalid HTTP status line')
+        self.version = status[0]
+        self.code = int(status[1])
+        for line in lines[1:]:
+            name, _, value = line.partition(b':')
+            self.headers[name.strip().lower()] = value.strip().lower()
+        connection = self.headers.get(b'connection', b'')
+        self.keep_alive = connection == b'keep-alive' or (self.version == b'HTTP/1.1' and connection != b'close')
+        if self.code in NO_BODY_CODES or 100 <= self.code < 200:
+            self._finish()
+        elif b'chunked' in self.headers.get(b'transfer-encoding', b''):
+            self.state = 'chunk_size'
+        elif b'content-length' in self.headers:
+            self.remaining = int(self.headers[b'content-length'])
+            self.state = 'length'
+            if not self.remaining:
+                self._finish()
+        else:
+            self.state = 'until_close'
+            self.keep_alive = False
+
+    def _feed_chunked(self, data):
+        if self.remaining:
+            # Skip the chunk data and the CRLF after it without buffering it
+            skipped = min(self.remaining, len(data))
+            self.remaining -= skipped
+            data = data[skipped:]
+        self.buffer += data
+        while not self.remaining and not self.done:
+            if self.state == 'chunk_size':
+                end = self.buffer.find(b'\r\n')
+                if end < 0:
+                    return
+                size = int(bytes(self.buffer[:end]).split(b';', 1)[0], 16)
+                del self.buffer[:end + 2]
+                if not size:
+                    self.state = 'trailers'
+                    continue
+                self.body_length += size
+                skip = size + 2
+                if len(self.buffer) >= skip:
+                    del self.buffer[:skip]
+                else:
+                    self.remaining = skip - len(self.buffer)
+                    self.buffer.clear()
+            elif self.buffer.startswith(b'\r\n') or self.buffer.find(b'\r\n\r\n') >= 0:
+                self.buffer.clear()
+                self._finish()
+            else:
+                return
+
+
+def receive_buffer():
+    """
+    Get the receive buffer of the current thread
+
+    Returns
+    -------
+    memoryview
+        A view of a RECV_SIZE bytearray that is allocated once for each thread and reused by
+        every read_response() in the thread
+    """
+    try:
+        return _buffers.view
+    except AttributeError:
+        _buffers.view = memoryview(bytearray(RECV_SIZE))
+        return _buffers.view
+
+
+def read_response(network_socket, max_size=65535, keep_response=True, deadline=None):
+    """
+    Read one HTTP response from a connection
+
+    The data is received into the receive buffer of the thread with recv_into(), so reading
+    the body does not allocate memory for the data.
+
+    Parameters
+    ----------
+    network_socket : socket.socket
+        The connection the request was sent on
+
+    max_size : int, optional
+        Number of bytes of the response to keep, 0 keeps the whole response, default=65535
+
+    keep_response : bool, optional
+        Keep the start of the response, default=True
+
+    deadline : float, optional
+        The time.monotonic() time the whole response must be received by, default is to use
+        the timeout of the socket for each receive
+
+    Returns
+    -------
+    HTTPResponseParser
+        The parsed response
+
+    Raises
+    ------
+    ConnectionClosed - The server closed the connection without sending anything
+
+    ValueError - The response is not a valid HTTP response
+
+    socket.timeout - The response was not received before the deadline
+    """
+    view = receive_buffer()
+    parser = HTTPResponseParser(max_size, keep_response)
+    while True:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout('timed out')
+            network_socket.settimeout(remaining)
+        size = network_socket.recv_into(view)
+        if not size:
+            parser.eof()
+            return parser
+        if parser.feed(view[:size]):
+            return parser
+
+
+async def async_read_response(stream_reader, max_size=65535, keep_response=True, timeout=None):
+    """
+    Read one HTTP response from an asyncio stream
+
+    Parameters
+    ----------
+    stream_reader : asyncio.StreamReader
+        The stream of the connection the request was sent on
+
+    max_size : int, optional
+        Number of bytes of the response to keep, 0 keeps the whole response, default=65535
+
+    keep_response : bool, optional
+        Keep the start of the response, default=True
+
+    timeout : float, optional
+        Number of seconds to wait for each read, default is to wait forever
+
+    Returns
+    -------
+    HTTPResponseParser
+        The parsed response
+
+    Raises
+    ------
+    ConnectionClosed - The server closed the connection without sending anything
+
+    ValueError - The response is not a valid HTTP response
+
+    asyncio.TimeoutError - A read timed out
+    """
+    parser = HTTPResponseParser(max_size, keep_response)
+    while True:
+        data = await asyncio.wait_for(stream_reader.read(RECV_SIZE), timeout)
+        if not data:
+            parser.eof()
+            return parser
+        if parser.feed(data):
+            return parser
@@ -3,11 +3,21 @@ Network port scan functions
 """
 from __future__ import print_function
 import datetime
+import errno
+import heapq
+import itertools
+import selectors
 import socket
 import ssl
 import struct
 import sys
-from collections import OrderedDict
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .httpreader import ConnectionClosed, read_response
+from .resolver import getaddresses
+from .tls import get_context
 
 
 class ScanFailed(Exception):
@@ -15,14 +25,176 @@ class ScanFailed(Exception):
     The scan operation encountered a failure
     """
     def __init__(self, *args, **kwargs):
-        try:
-            self.result = kwargs.pop('result')
-        except KeyError:
-            result = {}
+        self.result = kwargs.pop('result', {})
         super().__init__(*args, **kwargs)
 
 
-def scan(host, port=80, url=None, https=False, timeout=1.0, max_size=65535):
+ADDRESS_MODES = ['first', 'all', 'race']
+_ProbeSettings = namedtuple(
+    '_ProbeSettings',
+    ['host', 'port', 'url', 'https', 'timeout', 'max_size', 'verify', 'tls_sessions', 'keep_response', 'pool', 'deadline']
+)
+CONNECTION_ATTEMPT_DELAY = 0.25  # RFC 8305 recommended delay between connection attempts
+
+# The reason a connection failed, by errno
+ERROR_REASONS = {
+    errno.ECONNREFUSED: 'refused',
+    errno.ETIMEDOUT: 'timeout',
+    errno.ECONNRESET: 'reset',
+    errno.ECONNABORTED: 'reset',
+    errno.EPIPE: 'reset',
+    errno.EHOSTUNREACH: 'unreachable',
+    errno.ENETUNREACH: 'unreachable',
+    errno.ENETDOWN: 'unreachable',
+    errno.EACCES: 'prohibited',
+    errno.EPERM: 'prohibited',
+}
+if hasattr(errno, 'EHOSTDOWN'):  # pragma: no cover
+    ERROR_REASONS[errno.EHOSTDOWN] = 'unreachable'
+
+
+def error_reason(error):
+    """
+    Classify why a connection failed
+
+    Parameters
+    ----------
+    error : int
+        The errno of the failure
+
+    Returns
+    -------
+    str
+        One of "refused" (the host sent a reset), "timeout" (nothing came back before the
+        deadline), "unreachable" (the network or host can not be reached), "reset" (the
+        connection was reset after it was established), "prohibited" (a local firewall
+        rejected the connection) or "error" for any other errno
+    """
+    return ERROR_REASONS.get(error, 'error')
+
+
+def _failure(result, reason, message):
+    """
+    Record the reason of a failure in a scan result and get the ScanFailed exception to raise
+    """
+    result['reason'] = reason
+    return ScanFailed(message, result=result)
+
+
+def _request_failure(result, error, timeout):
+    """
+    Get the ScanFailed exception for an exception raised while sending a request or reading
+    the response
+    """
+    if isinstance(error, socket.timeout):
+        return _failure(result, 'timeout', f'TCP socket timeout ({timeout} seconds)')
+    if isinstance(error, ssl.SSLError):
+        return _failure(result, 'ssl_error', f'SSL error: {error}')
+    if isinstance(error, ValueError):
+        return _failure(result, 'invalid_response', f'Invalid HTTP response: {error}')
+    if isinstance(error, ConnectionClosed):
+        return _failure(result, 'eof', 'Connection closed by the server')
+    return _failure(result, error_reason(error.errno), f'Connection error: {error}')
+
+
+def _remaining(deadline):
+    """
+    Get the number of seconds left before a time.monotonic() deadline, None if there is no deadline
+
+    Raises
+    ------
+    socket.timeout - The deadline has passed
+    """
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise socket.timeout('timed out')
+    return remaining
+
+
+def _connect(address, port, deadline):
+    """
+    Connect a new socket to an address with a non-blocking connect that gives up at the deadline
+
+    Returns
+    -------
+    tuple
+        The socket and the errno of the connect, 0 if the socket connected
+    """
+    network_socket = socket.socket(address[0], socket.SOCK_STREAM)
+    network_socket.setblocking(False)
+    error = network_socket.connect_ex(_sockaddr(address, port))
+    if error in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+        with selectors.DefaultSelector() as selector:
+            selector.register(network_socket, selectors.EVENT_WRITE)
+            wait = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if selector.select(wait):
+                error = network_socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            else:
+                error = errno.ETIMEDOUT
+    return network_socket, error
+
+
+def _timed_connect(address, port, deadline, result, starts, ends):
+    """
+    Connect a new socket to an address, timing the connect and setting the failure reason of
+    the result if it fails
+
+    Returns
+    -------
+    socket.socket
+        The connected socket, None if the connect failed
+    """
+    starts['connect'] = time.perf_counter_ns()
+    network_socket, error = _connect(address, port, deadline)
+    ends['connect'] = time.perf_counter_ns()
+    if error:
+        network_socket.close()
+        result['reason'] = error_reason(error)
+        return None
+    return network_socket
+
+
+def _tls_handshake(network_socket, host, port, verify, tls_sessions, deadline, timeout, result, starts, ends):
+    """
+    Do the timed ssl handshake of a connected socket, resuming the cached session of the host
+    and port if there is one, and add the ssl version to the result
+
+    Returns
+    -------
+    ssl.SSLSocket
+        The ssl socket
+
+    Raises
+    ------
+    ScanFailed - The handshake failed or timed out, the socket is closed
+    """
+    starts['ssl'] = time.perf_counter_ns()
+    context = get_context(host, verify)
+    session = tls_sessions.get(host, port, verify, context) if tls_sessions is not None else None
+    try:
+        network_socket.settimeout(_remaining(deadline))
+        network_socket = context.wrap_socket(network_socket, server_hostname=host, session=session)
+    except socket.timeout:
+        network_socket.close()
+        raise _failure(result, 'timeout', f'SSL socket timeout ({timeout} seconds)')
+    except ssl.SSLError as error:
+        network_socket.close()
+        raise _failure(result, 'ssl_error', f'SSL error: {error}')
+    except OSError as error:
+        network_socket.close()
+        raise _failure(result, error_reason(error.errno), f'SSL connection error: {error}')
+    ends['ssl'] = time.perf_counter_ns()
+    result['ssl_version'] = network_socket.version()
+    result['ssl_resumed'] = network_socket.session_reused
+    return network_socket
+
+
+def scan(
+        host, port=80, url=None, https=False, timeout=1.0, max_size=65535, dns_cache=None, address_mode='first',
+        verify=False, tls_sessions=None, keep_response=True, pool=None
+):
     """
     Scan a network port
 
@@ -41,7 +213,38 @@ def scan(host, port=80, url=None, https=False, timeout=1.0, max_size=65535):
         Perform ssl connection on the socket, default=False
 
     timeout : float
-        Timeout for network operations, default=1
+        Number of seconds the whole scan, from the dns lookup to the end of the response, can
+        take before it times out, default=1
+
+    max_size : int, optional
+        The max size of the response kept in the result, 0 keeps the whole response.  The whole
+        response is always read and timed, default=65535
+
+    dns_cache : serviceping.resolver.DNSCache, optional
+        Cache to resolve the host with, the host is resolved on every scan if not provided
+
+    address_mode : str, optional
+        How to handle a host with multiple addresses, default="first"
+            first - Scan the first address returned by the resolver
+            all - Scan every address in parallel, the fastest open address is reported
+            race - Race connections to the addresses as described in RFC 8305 (happy eyeballs)
+            and scan the address that connects first
+
+    verify : bool, optional
+        Verify the server certificate and host name of ssl connections, default=False
+
+    tls_sessions : serviceping.tls.TLSSessionCache, optional
+        Cache of ssl sessions, when provided the ssl handshake resumes the session of the
+        previous connection to the host and port
+
+    keep_response : bool, optional
+        Decode the response of url requests and return it in the result, default=True
+
+    pool : serviceping.pool.ConnectionPool, optional
+        Pool of idle connections, when provided url requests are sent as HTTP/1.1 keep-alive
+        requests over an idle connection to the address if there is one, and the connection
+        is returned to the pool afterwards.  Requests over a pooled connection have no
+        connect or ssl duration.
 
     Returns
     -------
@@ -50,81 +253,411 @@ def scan(host, port=80, url=None, https=False, timeout=1.0, max_size=65535):
             host - The host or IP address that was scanned
             port - The port number that was scanned
             state - The state of the port, will be either "open" or "closed"
-            durations - An ordered dictionary with floating point value of the
-            time elapsed for each connection operation
+            reason - Why the port is closed or the scan failed, "refused", "timeout",
+            "unreachable", "reset", "prohibited", "dns", "ssl_error", "eof",
+            "invalid_response" or "error"
+            durations_ns - A dictionary with the time elapsed for each connection
+            operation in integer nanoseconds, in the order the operations were done.
+            Url requests add the ttfb (time to first byte) and headers durations, measured
+            from the start of the request, and the body duration from the end of the
+            headers to the end of the response.
+            durations - The durations_ns as timedelta objects, kept for compatibility
+            response - The decoded response of the url request, unless keep_response is False
+            addresses - When the address_mode is "all" or "race", a list with the ip, family,
+            state and durations_ns of each address that was tried
+            ssl_resumed - True if the ssl handshake resumed a previous session
 
     Raises
     ------
     ScanFailed - The scan operation failed
     """
-    starts = OrderedDict()
-    ends = OrderedDict()
+    try:
+        result = _scan(
+            host, port, url, https, timeout, max_size, dns_cache, address_mode, verify, tls_sessions, keep_response,
+            pool
+        )
+    except ScanFailed as failure:
+        failure.result['durations'] = timedelta_durations(failure.result.get('durations_ns'))
+        raise
+    if 'response' in result:
+        result['response'] = result['response'].decode('ascii', errors='ignore')
+    result['durations'] = timedelta_durations(result['durations_ns'])
+    return result
+
+
+def _scan(host, port, url, https, timeout, max_size, dns_cache, address_mode, verify, tls_sessions, keep_response, pool):
+    """
+    Scan a network port, the same as scan() except the response is returned undecoded as bytes
+    """
+    if address_mode not in ADDRESS_MODES:
+        raise ValueError(f'Invalid address mode {address_mode!r}')
+    starts = {}
+    ends = {}
     port = int(port)
     result = dict(
-        host=host, port=port, state='closed', durations=OrderedDict(), ssl_version=''
+        host=host, port=port, state='closed', durations_ns={}, ssl_version=''
     )
     if url:
         result['code'] = None
 
-    starts['all'] = starts['dns'] = datetime.datetime.now()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    starts['all'] = starts['dns'] = time.perf_counter_ns()
 
     # DNS Lookup
     try:
-        hostip = socket.gethostbyname(host)
-        result['ip'] = hostip
-        ends['dns'] = datetime.datetime.now()
+        addresses = dns_cache.resolve(host) if dns_cache is not None else getaddresses(host)
+        result['ip'] = addresses[0][1][0]
+        ends['dns'] = time.perf_counter_ns()
     except socket.gaierror:
-        raise ScanFailed('DNS Lookup failed', result=result)
+        raise _failure(result, 'dns', 'DNS Lookup failed')
 
-    # TCP Connect
-    starts['connect'] = datetime.datetime.now()
-    network_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    network_socket.settimeout(timeout)
-    result_connection = network_socket.connect_ex((hostip, port))
-    ends['connect'] = datetime.datetime.now()
-
-    # SSL
-    if https:
-        starts['ssl'] = datetime.datetime.now()
-        try:
-            network_socket = ssl.wrap_socket(network_socket)  # nosec
-        except socket.timeout:
-            raise ScanFailed(f'SSL socket timeout ({timeout} seconds)', result=result)
-        ends['ssl'] = datetime.datetime.now()
-        result['ssl_version'] = network_socket.version()
-
-    # Get request
-    if result_connection == 0 and url:
-        starts['request'] = datetime.datetime.now()
-        network_socket.send(
-            "GET {0} HTTP/1.0\r\nHost: {1}\r\n\r\n".format(
-                url, host
-            ).encode('ascii'))
-        if max_size:
-            try:
-                data = network_socket.recv(max_size)
-            except socket.timeout:
-                raise ScanFailed(f'TCP socket timeout ({timeout} seconds)', result=result)
+    settings = _ProbeSettings(
+        host, port, url, https, timeout, max_size, verify, tls_sessions, keep_response, pool, deadline
+    )
+    best = None
+    if address_mode == 'all':
+        best = _scan_all(settings, addresses, result)
+    elif address_mode == 'race':
+        starts['connect'] = time.perf_counter_ns()
+        network_socket, address, result['addresses'] = _race_connect(addresses, port, deadline)
+        ends['connect'] = time.perf_counter_ns()
+        if network_socket:
+            result['ip'] = address[1][0]
+            _scan_address(settings, address, result, starts, ends, network_socket)
         else:
-            data = network_socket.recv()
-        result['length'] = len(data)
-        data = data.decode('ascii', errors='ignore')
-        result['response'] = (data)
-        try:
-            result['code'] = int(data.split('\n')[0].split()[1])
-        except IndexError:
-            pass
-        ends['request'] = datetime.datetime.now()
-    network_socket.close()
+            result['reason'] = result['addresses'][0].get('reason', 'timeout') if result['addresses'] else 'timeout'
+    else:
+        _scan_address(settings, addresses[0], result, starts, ends)
 
     # Calculate durations
-    ends['all'] = datetime.datetime.now()
+    ends['all'] = time.perf_counter_ns()
+    calculate_durations(result, starts, ends)
+    if best:
+        for key, value in best['durations_ns'].items():
+            if key != 'all':
+                result['durations_ns'][key] = value
+    return result
+
+
+def _sockaddr(address, port):
+    """
+    Get the socket address to connect to for a resolved (family, sockaddr) address and port
+    """
+    return (address[1][0], port) + tuple(address[1][2:])
+
+
+def _scan_address(settings, address, result, starts, ends, network_socket=None):
+    """
+    Scan a single address of a host, updating the result and the operation start and end times
+
+    If a network_socket is passed it must already be connected to the address, otherwise an
+    idle connection is taken from the pool or a new connection is made and timed.  Every
+    operation is limited to the time left before the deadline of the scan.
+    """
+    host, port, url, https, timeout, max_size = settings[:6]
+    deadline = settings.deadline
+    pool = settings.pool if url else None
+    if pool is not None and not network_socket:
+        pooled = pool.checkout(address[1][0], port, https)
+        if pooled:
+            if https:
+                result['ssl_version'] = pooled.version()
+            try:
+                _keep_alive_request(settings, address, result, starts, ends, pooled)
+                return
+            except ConnectionClosed:
+                # The server closed the connection after the health check, use a new connection
+                pass
+
+    # TCP Connect
+    if not network_socket:
+        network_socket = _timed_connect(address, port, deadline, result, starts, ends)
+        if not network_socket:
+            return
+
+    try:
+        # SSL
+        if https:
+            network_socket = _tls_handshake(
+                network_socket, host, port, settings.verify, settings.tls_sessions, deadline, timeout, result, starts,
+                ends
+            )
+
+        # Get request
+        if url and pool is not None:
+            pooled, network_socket = network_socket, None
+            try:
+                _keep_alive_request(settings, address, result, starts, ends, pooled)
+            except ConnectionClosed as error:
+                raise _request_failure(result, error, timeout)
+        elif url:
+            starts['request'] = time.perf_counter_ns()
+            try:
+                network_socket.settimeout(_remaining(deadline))
+                network_socket.sendall(
+                    "GET {0} HTTP/1.0\r\nHost: {1}\r\n\r\n".format(
+                        url, host
+                    ).encode('ascii'))
+                response = read_response(network_socket, max_size, settings.keep_response, deadline)
+            except (OSError, ValueError, ConnectionClosed) as error:
+                raise _request_failure(result, error, timeout)
+            _record_response(result, starts, ends, response)
+        # TLS 1.3 servers send the session ticket after the handshake, so the session is
+        # only complete once data has been read from the connection.
+        if https and network_socket is not None and settings.tls_sessions is not None:
+            settings.tls_sessions.store(host, port, network_socket.session, settings.verify, network_socket.context)
+    finally:
+        if network_socket is not None:
+            network_socket.close()
+
+    result['state'] = 'open'
+
+
+def _keep_alive_request(settings, address, result, starts, ends, network_socket):
+    """
+    Send a HTTP/1.1 keep-alive request over a connection and return the connection to the pool
+
+    The connection is closed instead of returned to the pool if the server does not keep it
+    open or the request fails.
+
+    Raises
+    ------
+    ConnectionClosed - The server closed the connection before responding
+    """
+    host, port = settings.host, settings.port
+    keep_alive = False
+    starts['request'] = time.perf_counter_ns()
+    try:
+        network_socket.settimeout(_remaining(settings.deadline))
+        network_socket.sendall(
+            "GET {0} HTTP/1.1\r\nHost: {1}\r\nConnection: keep-alive\r\n\r\n".format(settings.url, host).encode('ascii')
+        )
+        response = read_response(network_socket, settings.max_size, settings.keep_response, settings.deadline)
+        keep_alive = response.keep_alive
+        # The session is only complete once data has been read, store it before the
+        # connection is closed
+        if settings.https and settings.tls_sessions is not None:
+            settings.tls_sessions.store(host, port, network_socket.session, settings.verify, network_socket.context)
+    except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError):
+        raise ConnectionClosed()
+    except (OSError, ValueError) as error:
+        raise _request_failure(result, error, settings.timeout)
+    finally:
+        if not keep_alive:
+            network_socket.close()
+    _record_response(result, starts, ends, response)
+    result['state'] = 'open'
+    if keep_alive:
+        settings.pool.checkin(address[1][0], port, settings.https, network_socket)
+
+
+def _record_response(result, starts, ends, response):
+    """
+    Add the code, length, response and response timings of a http response to a scan result
+
+    The ttfb (time to first byte) and headers durations are measured from the start of the
+    request, the body duration from the end of the headers to the end of the response.
+    """
+    ends['request'] = response.done_ns
+    starts['ttfb'] = starts['headers'] = starts['request']
+    ends['ttfb'] = response.first_byte_ns
+    ends['headers'] = starts['body'] = response.headers_ns
+    ends['body'] = response.done_ns
+    result['code'] = response.code
+    result['length'] = response.length
+    if response.kept is not None:
+        result['response'] = response.kept
+
+
+def _scan_one(settings, address):
+    """
+    Scan a single address of a host and return the result of the address
+    """
+    starts = {}
+    ends = {}
+    result = dict(ip=address[1][0], family=address[0], state='closed', durations_ns={}, ssl_version='')
+    if settings.url:
+        result['code'] = None
+    starts['all'] = time.perf_counter_ns()
+    try:
+        _scan_address(settings, address, result, starts, ends)
+    except ScanFailed as failure:
+        result['error'] = True
+        result['error_message'] = str(failure)
+    ends['all'] = time.perf_counter_ns()
+    calculate_durations(result, starts, ends)
+    return result
+
+
+def _scan_all(settings, addresses, result):
+    """
+    Scan all the addresses of a host in parallel
+
+    The fastest open address, or the first address if none are open, is reported in the result
+    and the result of every address is added to the result addresses list.
+
+    Returns
+    -------
+    dict
+        The result of the reported address
+    """
+    with ThreadPoolExecutor(max_workers=len(addresses)) as executor:
+        results = list(executor.map(
+            lambda address: _scan_one(settings, address), addresses
+        ))
+    result['addresses'] = results
+    open_results = [address_result for address_result in results if address_result['state'] == 'open']
+    best = min(open_results, key=lambda address_result: address_result['durations_ns']['all']) if open_results else results[0]
+    for key, value in best.items():
+        if key not in ['durations_ns', 'family']:
+            result[key] = value
+    for address_result in results:
+        address_result.pop('response', None)
+    if best.get('error'):
+        raise ScanFailed(best['error_message'], result=result)
+    return best
+
+
+def _interleave_families(addresses):
+    """
+    Order addresses so the address families alternate, starting with the family of the first address
+    """
+    by_family = OrderedDict()
+    for address in addresses:
+        by_family.setdefault(address[0], []).append(address)
+    ordered = []
+    while any(by_family.values()):
+        for family_addresses in by_family.values():
+            if family_addresses:
+                ordered.append(family_addresses.pop(0))
+    return ordered
+
+
+def _race_connect(addresses, port, deadline, attempt_delay=CONNECTION_ATTEMPT_DELAY):
+    """
+    Race non-blocking connections to the addresses as described in RFC 8305
+
+    A new connection attempt is started every attempt_delay seconds, or as soon as an attempt
+    fails, until one of the attempts connects or the time.monotonic() deadline passes.
+
+    Returns
+    -------
+    tuple
+        The connected socket (or None), the address it is connected to (or the first address)
+        and a list of dictionaries with the ip, family, state, reason and durations_ns of each
+        attempt
+    """
+    pending = _interleave_families(addresses)
+    attempts = []
+    selector = selectors.DefaultSelector()
+    if deadline is None:
+        deadline = float('inf')
+    next_attempt = time.monotonic()
+    winner = None
+    try:
+        while not winner:
+            now = time.monotonic()
+            if now >= deadline or not (pending or selector.get_map()):
+                break
+            if pending and (now >= next_attempt or not selector.get_map()):
+                address = pending.pop(0)
+                attempt = dict(ip=address[1][0], family=address[0], state='closed', durations_ns={})
+                attempts.append(attempt)
+                network_socket = socket.socket(address[0], socket.SOCK_STREAM)
+                network_socket.setblocking(False)
+                attempt['start'] = time.perf_counter_ns()
+                error = network_socket.connect_ex(_sockaddr(address, port))
+                if error in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                    selector.register(network_socket, selectors.EVENT_WRITE, (address, attempt))
+                    next_attempt = now + attempt_delay
+                else:
+                    attempt['durations_ns']['connect'] = time.perf_counter_ns() - attempt.pop('start')
+                    attempt['reason'] = error_reason(error)
+                    network_socket.close()
+                continue
+            wait = deadline - now
+            if pending:
+                wait = min(wait, next_attempt - now)
+            for key, _ in selector.select(max(wait, 0)):
+                network_socket = key.fileobj
+                address, attempt = key.data
+                selector.unregister(network_socket)
+                attempt['durations_ns']['connect'] = time.perf_counter_ns() - attempt.pop('start')
+                error = network_socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if not winner and error == 0:
+                    attempt['state'] = 'open'
+                    network_socket.setblocking(True)
+                    winner = (network_socket, address)
+                else:
+                    attempt['reason'] = error_reason(error)
+                    network_socket.close()
+                    next_attempt = time.monotonic()
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+            attempt = key.data[1]
+            attempt['state'] = 'cancelled'
+            attempt['reason'] = 'timeout'
+            attempt.pop('start')
+        selector.close()
+    if winner:
+        return winner[0], winner[1], attempts
+    return None, addresses[0], attempts
+
+
+def calculate_durations(result, starts, ends):
+    """
+    Populate the durations of a scan result from the operation start and end times
+
+    Parameters
+    ----------
+    result : dict
+        The scan result dictionary to update
+
+    starts : dict
+        The time.perf_counter_ns() start time of each operation
+
+    ends : dict
+        The time.perf_counter_ns() end time of each operation, operations that did not
+        finish are skipped
+    """
     for duration in starts.keys():
         if duration in ends.keys():
-            result['durations'][duration] = ends[duration] - starts[duration]
-    if result_connection == 0:
-        result['state'] = 'open'
-    return result
+            result['durations_ns'][duration] = ends[duration] - starts[duration]
+
+
+def timedelta_from_ns(nanoseconds):
+    """
+    Convert an integer nanosecond duration to a timedelta
+
+    Parameters
+    ----------
+    nanoseconds : int
+        The duration in nanoseconds
+
+    Returns
+    -------
+    datetime.timedelta
+        The duration, rounded to the microsecond resolution of timedelta
+    """
+    return datetime.timedelta(microseconds=nanoseconds / 1000)
+
+
+def timedelta_durations(durations_ns):
+    """
+    Convert the integer nanosecond durations of a scan result to timedelta objects
+
+    Parameters
+    ----------
+    durations_ns : dict
+        The duration of each operation in nanoseconds, may be None
+
+    Returns
+    -------
+    OrderedDict
+        The duration of each operation as a timedelta, in the same order
+    """
+    return OrderedDict((key, timedelta_from_ns(value)) for key, value in (durations_ns or {}).items())
 
 
 class PingResponse(object):
@@ -148,19 +681,43 @@ class PingResponse(object):
     timeout : bool
         True if ping timed out
 
-    start : float
-        Time started
+    reason : str
+        Why the ping failed, "refused", "timeout", "unreachable", "reset", "prohibited", "dns",
+        "ssl_error", "eof", "invalid_response" or "error", None if the ping succeeded
+
+    start : int
+        Time started, from time.perf_counter_ns()
+
+    end : int
+        Time ended, from time.perf_counter_ns()
 
-    end : float
-        Time ended
+    duration_ns: int
+        The duration of the ping operation in nanoseconds
 
-    duration: float
-        The duration of the ping operation
+    durations_ns: dict
+        The duration of each connection operation in integer nanoseconds
+
+    ssl_resumed: bool
+        True if the ssl handshake resumed a previous session
+
+    addresses: list
+        The ip, family, state and durations_ns of each address tried when pinging
+        multiple addresses of the host
+
+    response: str
+        The decoded response of url pings, None if the response was not kept.  The response
+        may be passed as bytes, it is only decoded when it is read.
     """
+    __slots__ = (
+        'host', 'port', 'ip', 'responding', 'data_mismatch', 'timeout', 'code', 'state', 'length', 'start', 'end',
+        'error', 'error_message', 'durations_ns', '_response', 'sequence', 'ssl_version', 'ssl_resumed', 'addresses',
+        'reason'
+    )
+
     def __init__(
             self, host=None, port=0, ip=None, responding=False, data_mismatch=False, timeout=False, code=None,
             state=None, length=0, start=None, end=None, error=False, error_message=None, durations=None, response=None,
-            sequence=0, ssl_version=''
+            sequence=0, ssl_version='', addresses=None, ssl_resumed=False, durations_ns=None, reason=None
     ):
         self.host = host
         self.port = int(port)
@@ -171,32 +728,41 @@ class PingResponse(object):
         self.code = code
         self.state = state
         self.length = length
-        self.durations = durations
+        if durations_ns is None and durations is not None:
+            durations_ns = {
+                key: value // datetime.timedelta(microseconds=1) * 1000 for key, value in durations.items()
+            }
+        self.durations_ns = durations_ns
         self.sequence = sequence
         self.ssl_version = ssl_version
-        if start:
-            self.start = start
-        else:
-            self.start = datetime.datetime.now()
-        self.end = end
+        self.ssl_resumed = ssl_resumed
+        self.addresses = addresses
         self.error = error
         self.error_message = error_message
+        self.reason = reason
         self.response = response
-        self.start_timer()
+        if start is not None:
+            self.start = start
+            self.end = end
+        else:
+            self.start_timer()
 
     def start_timer(self):
-        self.start = datetime.datetime.now()
+        self.start = time.perf_counter_ns()
         self.end = None
 
     def stop_timer(self):
-        self.end = datetime.datetime.now()
+        self.end = time.perf_counter_ns()
 
     def __repr__(self):
         return f'PingResponse(host={self.host!r}, port={self.port!r}, ip={self.ip!r}, sequence={self.sequence!r}, ' \
                f'responding={self.responding!r}, data_mismatch={self.data_mismatch!r}, timeout={self.timeout!r}, ' \
                f'code={self.code!r}, state={self.state!r}, length={self.length!r}, start={self.start!r}, ' \
                f'end={self.end!r}, error={self.error!r}, error_message={self.error_message!r}, ' \
-               f'durations={self.durations!r}, ssl_version={self.ssl_version!r}, response={self.response!r})'
+               f'reason={self.reason!r}, ' \
+               f'durations_ns={self.durations_ns!r}, ssl_version={self.ssl_version!r}, ' \
+               f'ssl_resumed={self.ssl_resumed!r}, addresses={self.addresses!r}, ' \
+               f'response={self.response!r})'
 
     def __str__(self):
         return f'ip={self.host}({self.ip}):port={self.port}:responding={self.responding}' \
@@ -204,6 +770,39 @@ class PingResponse(object):
                f':data_mismatch={self.data_mismatch}' \
                f':timeout={self.timeout}:ssl_version={self.ssl_version}:duration={self.duration}'
 
+    @property
+    def response(self):
+        """
+        The decoded response of the ping, or None if the response was not kept
+        """
+        if isinstance(self._response, (bytes, bytearray)):
+            self._response = self._response.decode('ascii', errors='ignore')
+        return self._response
+
+    @response.setter
+    def response(self, value):
+        self._response = value
+
+    @property
+    def durations(self):
+        """
+        The duration of each connection operation as timedelta objects
+
+        This is a compatibility view of durations_ns, which has nanosecond resolution.
+        """
+        if self.durations_ns is None:
+            return None
+        return timedelta_durations(self.durations_ns)
+
+    @property
+    def duration_ns(self):
+        """
+        Get the duration in nanoseconds based on the timer, or None no timing has been done
+        """
+        if not self.end:
+            return None
+        return self.end - self.start
+
     @property
     def duration(self):
         """
@@ -211,10 +810,13 @@ class PingResponse(object):
         """
         if not self.end:
             return None
-        return self.end - self.start
+        return timedelta_from_ns(self.duration_ns)
 
 
-def ping(host, port=80, url=None, https=False, timeout=1.0, max_size=65535, sequence=0):
+def ping(
+        host, port=80, url=None, https=False, timeout=1.0, max_size=65535, sequence=0, dns_cache=None,
+        address_mode='first', verify=False, tls_sessions=None, keep_response=True, pool=None
+):
     """
     Ping a host
 
@@ -236,38 +838,234 @@ def ping(host, port=80, url=None, https=False, timeout=1.0, max_size=65535, sequ
         Number of seconds to wait for a response before timing out, default=1 second
 
     max_size: int, optional
-        The max size of response that can be retrieved.  This should be a power of 2
+        The max size of the response kept in the ping response, 0 keeps the whole response,
         default=65535.
 
     sequence: int, optional
         Sequence number for the ping request
 
+    dns_cache: serviceping.resolver.DNSCache, optional
+        Cache to resolve the host with, the host is resolved on every ping if not provided
+
+    address_mode: str, optional
+        How to handle a host with multiple addresses, one of "first", "all" or "race", see
+        scan() for details, default="first"
+
+    verify: bool, optional
+        Verify the server certificate and host name of ssl connections, default=False
+
+    tls_sessions: serviceping.tls.TLSSessionCache, optional
+        Cache of ssl sessions used to resume the ssl handshake of later pings
+
+    keep_response: bool, optional
+        Keep the decoded response of url pings in the ping response, default=True.  Disable
+        to save memory when many ping responses are kept.
+
+    pool: serviceping.pool.ConnectionPool, optional
+        Pool of idle connections reused by url pings to the same address, see scan() for details
+
     Returns
     -------
     PingResponse:
         The ping response object
     """
     try:
-        result = scan(host=host, port=port, url=url, https=https, timeout=timeout, max_size=max_size)
+        result = _scan(
+            host, port, url, https, timeout, max_size, dns_cache, address_mode, verify, tls_sessions, keep_response,
+            pool
+        )
     except ScanFailed as failure:
         result = failure.result
         result['error'] = True
         result['error_message'] = str(failure)
-    result_obj = PingResponse(
+    return result_to_response(result, host=host, port=port, sequence=sequence)
+
+
+class TokenBucket(object):
+    """
+    Token bucket rate limiter
+
+    The bucket holds up to burst tokens and is refilled with rate tokens per second.  Each
+    operation takes a token, reserving a token from an empty bucket returns how long to wait
+    until the token is available so operations are spread out at the rate.
+
+    Parameters
+    ----------
+    rate : float
+        Number of tokens added per second
+
+    burst : float, optional
+        Maximum number of tokens in the bucket, default=1
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, now=None):
+        """
+        Take a token from the bucket
+
+        Parameters
+        ----------
+        now : float, optional
+            The current time.monotonic() time
+
+        Returns
+        -------
+        float
+            Number of seconds to wait before the operation using the token can start, 0 if it
+            can start now
+        """
+        if now is None:
+            now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+def _ping_arguments(target, defaults):
+    """
+    Get the ping() keyword arguments of a ping_many() target
+    """
+    if isinstance(target, dict):
+        arguments = dict(defaults, **target)
+    else:
+        arguments = dict(defaults, host=target[0], port=target[1] if len(target) > 1 else 80)
+    arguments['port'] = int(arguments.get('port', 80))
+    return arguments
+
+
+def ping_many(targets, workers=8, max_pending=None, rate=None, burst=1, **kwargs):
+    """
+    Ping many targets from a pool of threads, yielding the responses as they complete
+
+    The targets are read from the iterable as slots become free, so at most max_pending pings
+    are queued or in flight at once no matter how many targets there are.  A target can
+    appear more than once to ping it repeatedly, the sequence of the pings of each target
+    counts up from 0 and with a rate the pings of each target are spread out to at most rate
+    pings per second, without holding up the pings of other targets.
+
+    Closing the generator cancels the pings that have not started and waits for the running
+    pings to finish.
+
+    Parameters
+    ----------
+    targets : iterable
+        The targets to ping, each a (host, port) tuple or a dictionary of ping() keyword
+        arguments
+
+    workers : int, optional
+        Number of threads pinging at once, default=8
+
+    max_pending : int, optional
+        Maximum number of pings queued or in flight at once, default is twice the workers
+
+    rate : float, optional
+        Maximum number of pings per second to each host and port, default is no limit
+
+    burst : int, optional
+        Number of pings to a host and port that can be sent at once before the rate limit
+        applies, default=1
+
+    **kwargs
+        ping() keyword arguments used for every target, a target dictionary overrides them
+
+    Yields
+    ------
+    PingResponse:
+        The ping response of each target, in the order the pings complete
+    """
+    max_pending = max_pending or workers * 2
+    targets = iter(targets)
+    buckets = {}
+    sequences = {}
+    delayed = []
+    order = itertools.count()
+    futures = set()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        exhausted = False
+        while True:
+            now = time.monotonic()
+            while not exhausted and len(futures) + len(delayed) < max_pending:
+                target = next(targets, None)
+                if target is None:
+                    exhausted = True
+                    break
+                arguments = _ping_arguments(target, kwargs)
+                key = (arguments['host'], arguments['port'])
+                if 'sequence' not in arguments:
+                    arguments['sequence'] = sequences.get(key, 0)
+                sequences[key] = arguments['sequence'] + 1
+                delay = 0
+                if rate:
+                    bucket = buckets.get(key)
+                    if bucket is None:
+                        bucket = buckets[key] = TokenBucket(rate, burst)
+                    delay = bucket.reserve(now)
+                heapq.heappush(delayed, (now + delay, next(order), arguments))
+            while delayed and delayed[0][0] <= now:
+                futures.add(executor.submit(ping, **heapq.heappop(delayed)[2]))
+            if not futures and not delayed:
+                break
+            timeout = delayed[0][0] - now if delayed else None
+            if futures:
+                done, futures = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            else:
+                time.sleep(timeout)
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def result_to_response(result, host, port, sequence=0):
+    """
+    Convert a scan result dictionary into a PingResponse object
+
+    Parameters
+    ----------
+    result: dict
+        The result dictionary returned by a scan
+
+    host: str
+        The host or ip address that was pinged
+
+    port: int
+        The port that was pinged
+
+    sequence: int, optional
+        Sequence number for the ping request
+
+    Returns
+    -------
+    PingResponse:
+        The ping response object
+    """
+    end = time.perf_counter_ns()
+    return PingResponse(
         host=host, port=port, ip=result.get('ip', None), sequence=sequence,
-        durations=result.get('durations', None),
+        durations_ns=result.get('durations_ns', None),
         code=result.get('code', None),
         state=result.get('state', 'unknown'),
         length=result.get('length', 0),
         ssl_version=result.get('ssl_version', ''),
+        ssl_resumed=result.get('ssl_resumed', False),
+        addresses=result.get('addresses', None),
         response=result.get('response', None),
         error=result.get('error', False),
         error_message=result.get('error_message', None),
+        reason=result.get('reason', None),
+        timeout=result.get('reason', None) == 'timeout',
         responding=True if result.get('state', 'unknown') in ['open'] else False,
-        start=datetime.datetime.now(),
-        end=datetime.datetime.now() + result['durations'].get('all', datetime.timedelta(0)) if result.get('durations', None) else None
+        start=end - result['durations_ns'].get('all', 0) if result.get('durations_ns', None) else None,
+        end=end if result.get('durations_ns', None) else None
     )
-    return result_obj
 
 
 if __name__ == '__main__':
@@ -0,0 +1,337 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Machine readable output of ping responses
+"""
+import csv
+import io
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from .results import PHASES
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+
+FORMATS = ('text', 'jsonl', 'csv', 'msgpack')
+
+# Markers put on the queue of a BackgroundWriter
+_FLUSH = object()
+_CLOSE = object()
+
+RECORD_FIELDS = (
+    'timestamp_ns', 'host', 'port', 'ip', 'sequence', 'responding', 'state', 'reason', 'code', 'length',
+    'ssl_version', 'ssl_resumed', 'error', 'error_message'
+)
+
+
+def response_record(ping_response, response_body=True):
+    """
+    Get the record of a ping response written by the machine readable formats
+
+    Parameters
+    ----------
+    ping_response : PingResponse
+        The ping response
+
+    response_body : bool, optional
+        Include the response of url pings, default=True
+
+    Returns
+    -------
+    OrderedDict
+        The RECORD_FIELDS of the response, timestamp_ns is the time.time_ns() time the record
+        was made, followed by the durations_ns in integer nanoseconds and the response if
+        response_body is set
+    """
+    record = OrderedDict(timestamp_ns=time.time_ns())
+    for field in RECORD_FIELDS[1:]:
+        record[field] = getattr(ping_response, field)
+    record['durations_ns'] = dict(ping_response.durations_ns or {})
+    if response_body:
+        record['response'] = ping_response.response
+    return record
+
+
+class BackgroundWriter(object):
+    """
+    File like object that writes to a stream from a background thread
+
+    write() only puts the data on a queue, so printing the result of a ping never waits on a
+    slow terminal or pipe.  The writer thread collects the queued data into one buffer and
+    writes it to the stream once buffer_size characters or bytes are collected or
+    flush_interval seconds after the first of them was queued, so high ping rates do not make
+    a system call for every line.  Use it as a context manager, or call close(), to write the
+    remaining data and stop the thread.
+
+    Parameters
+    ----------
+    stream : file
+        The text or binary stream to write to, only written from the writer thread
+
+    buffer_size : int, optional
+        Number of characters or bytes collected before they are written, default=65536
+
+    flush_interval : float, optional
+        Maximum number of seconds data is held before it is written, default=0.1
+
+    Attributes
+    ----------
+    error : OSError
+        The error writing to the stream, such as a closed pipe, None if there was no error.
+        Data written after an error is discarded.
+    """
+    def __init__(self, stream, buffer_size=65536, flush_interval=0.1):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.error = None
+        self.closed = False
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='serviceping-output', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, data):
+        """
+        Queue data to be written, never blocks
+
+        Parameters
+        ----------
+        data : str or bytes
+            The data, str for a text stream or bytes for a binary stream
+
+        Returns
+        -------
+        int
+            The length of the data
+        """
+        self._queue.put(data)
+        return len(data)
+
+    def flush(self):
+        """
+        Have the writer thread write the queued data now, does not wait for the write
+        """
+        self._queue.put(_FLUSH)
+
+    def close(self):
+        """
+        Write the queued data and stop the writer thread, the stream is not closed
+        """
+        if not self.closed:
+            self.closed = True
+            self._queue.put(_CLOSE)
+            self._thread.join()
+
+    def _run(self):
+        pending = []
+        size = 0
+        deadline = None
+        while True:
+            try:
+                data = self._queue.get(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                data = _FLUSH
+            if data is not _FLUSH and data is not _CLOSE:
+                pending.append(data)
+                size += len(data)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if size < self.buffer_size:
+                    continue
+            if pending and self.error is None:
+                try:
+                    self.stream.write(pending[0][:0].join(pending))
+                    self.stream.flush()
+                except OSError as error:
+                    self.error = error
+            pending.clear()
+            size = 0
+            deadline = None
+            if data is _CLOSE:
+                return
+
+
+class ResponseWriter(object):
+    """
+    Buffered writer of ping response records
+
+    The encoded records are collected in memory and written to the stream in one write once
+    batch_size records are buffered or flush_interval seconds have passed since the last
+    write, so high ping rates do not make a system call for every response.
+
+    Parameters
+    ----------
+    stream : binary file
+        The stream to write to
+
+    response_body : bool, optional
+        Include the response of url pings in the records, default=True
+
+    batch_size : int, optional
+        Number of records buffered before they are written, default=100
+
+    flush_interval : float, optional
+        Maximum number of seconds a record is buffered for, default=1
+    """
+    def __init__(self, stream, response_body=True, batch_size=100, flush_interval=1.0):
+        self.stream = stream
+        self.response_body = response_body
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.count = 0
+        self._buffer = bytearray()
+        self._buffered = 0
+        self._flushed = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def encode(self, record):
+        """
+        Encode a record, implemented by each format
+        """
+        raise NotImplementedError()
+
+    def write(self, ping_response):
+        """
+        Write the record of a ping response
+
+        Parameters
+        ----------
+        ping_response : PingResponse
+            The ping response to write
+        """
+        self._buffer += self.encode(response_record(ping_response, self.response_body))
+        self._buffered += 1
+        self.count += 1
+        if self._buffered >= self.batch_size or time.monotonic() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered records to the stream
+        """
+        if self._buffer:
+            # The buffer is reused, so the stream gets a copy in case it holds on to the data
+            self.stream.write(bytes(self._buffer))
+            self._buffer.clear()
+            self._buffered = 0
+        self.stream.flush()
+        self._flushed = time.monotonic()
+
+    def close(self):
+        """
+        Write the buffered records, the stream is not closed
+        """
+        self.flush()
+
+
+class JSONLinesWriter(ResponseWriter):
+    """
+    Write each ping response as a line of JSON
+    """
+    def encode(self, record):
+        return json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class CSVWriter(ResponseWriter):
+    """
+    Write each ping response as a CSV row, with a header row before the first response
+
+    The durations are in a <phase>_ns column for each phase, empty if the phase was not done.
+    """
+    def __init__(self, stream, response_body=True, batch_size=100, flush_interval=1.0):
+        super().__init__(stream, response_body, batch_size, flush_interval)
+        self.fields = list(RECORD_FIELDS) + ['%s_ns' % phase for phase in PHASES]
+        if response_body:
+            self.fields.append('response')
+        self._text = io.StringIO()
+        self._writer = csv.writer(self._text, lineterminator='\n')
+        self._writer.writerow(self.fields)
+
+    def encode(self, record):
+        durations_ns = record['durations_ns']
+        row = [record[field] for field in RECORD_FIELDS] + [durations_ns.get(phase) for phase in PHASES]
+        if self.response_body:
+            row.append(record['response'])
+        self._writer.writerow(['' if value is None else value for value in row])
+        data = self._text.getvalue().encode('utf-8')
+        self._text.seek(0)
+        self._text.truncate()
+        return data
+
+
+class MsgpackWriter(ResponseWriter):
+    """
+    Write each ping response as a MessagePack map, requires the msgpack package
+
+    Raises
+    ------
+    RuntimeError - The msgpack package is not installed
+    """
+    def __init__(self, stream, response_body=True, batch_size=100, flush_interval=1.0):
+        if msgpack is None:  # pragma: no cover
+            raise RuntimeError('The msgpack output format requires the msgpack package')
+        super().__init__(stream, response_body, batch_size, flush_interval)
+        self._packer = msgpack.Packer()
+
+    def encode(self, record):
+        return self._packer.pack(record)
+
+
+WRITERS = {
+    'jsonl': JSONLinesWriter,
+    'csv': CSVWriter,
+    'msgpack': MsgpackWriter,
+}
+
+
+def get_writer(output_format, stream, response_body=True, **kwargs):
+    """
+    Get the writer of an output format
+
+    Parameters
+    ----------
+    output_format : str
+        The format, one of "jsonl", "csv" or "msgpack"
+
+    stream : binary file
+        The stream to write to
+
+    response_body : bool, optional
+        Include the response of url pings in the records, default=True
+
+    **kwargs
+        The batch_size and flush_interval of the writer
+
+    Returns
+    -------
+    ResponseWriter
+        The writer
+
+    Raises
+    ------
+    ValueError - The format is not a machine readable format
+    """
+    try:
+        writer_class = WRITERS[output_format]
+    except KeyError:
+        raise ValueError(f'Invalid output format {output_format!r}')
+    return writer_class(stream, response_body=response_body, **kwargs)
@@ -0,0 +1,163 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Pool of idle keep-alive connections
+"""
+import socket
+import ssl
+import threading
+import time
+import weakref
+from collections import deque
+
+
+def _healthy(network_socket):
+    """
+    Check that an idle connection is still open and has no unread data
+
+    The socket is peeked without blocking, for ssl sockets the raw bytes are peeked, so the
+    check does not consume anything from the connection.
+    """
+    if network_socket.fileno() < 0:
+        return False
+    if isinstance(network_socket, ssl.SSLSocket) and network_socket.pending():
+        return False
+    timeout = network_socket.gettimeout()
+    network_socket.settimeout(0)
+    try:
+        socket.socket.recv(network_socket, 1, socket.MSG_PEEK)
+    except (BlockingIOError, InterruptedError):
+        return True
+    except OSError:
+        return False
+    finally:
+        network_socket.settimeout(timeout)
+    # The server closed the connection or sent data nobody asked for
+    return False
+
+
+class ConnectionPool(object):
+    """
+    A pool of idle keep-alive connections, keyed by ip address, port and ssl
+
+    Passing a pool to :func:`serviceping.network.scan` or :func:`serviceping.network.ping`
+    makes url requests reuse an idle connection to the same address when there is one, so
+    repeated probes measure the request latency without a new connect and ssl handshake
+    for every probe.
+
+    Connections are health checked when they are checked out and are closed instead of
+    reused once they are older than ``max_age`` seconds or have been idle for more than
+    ``idle_timeout`` seconds.
+
+    Parameters
+    ----------
+    max_idle : int, optional
+        Maximum number of idle connections kept for each address, default=4
+
+    max_age : float, optional
+        Number of seconds a connection is reused for after it was opened, default=60
+
+    idle_timeout : float, optional
+        Number of seconds a connection can be idle before it is closed, default=30
+    """
+    def __init__(self, max_idle=4, max_age=60.0, idle_timeout=30.0):
+        self.max_idle = max_idle
+        self.max_age = max_age
+        self.idle_timeout = idle_timeout
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self._idle = {}
+        self._opened = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(connections) for connections in self._idle.values())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close all the idle connections
+        """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for _, _, network_socket in connections:
+                network_socket.close()
+
+    def checkout(self, ip, port, tls=False):
+        """
+        Take an idle connection to an address out of the pool
+
+        Parameters
+        ----------
+        ip : str
+            The ip address of the connection
+
+        port : int
+            The port of the connection
+
+        tls : bool, optional
+            True for ssl connections, default=False
+
+        Returns
+        -------
+        socket.socket
+            A healthy idle connection, or None if there is no idle connection to the address
+        """
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                try:
+                    opened, returned, network_socket = self._idle[(ip, port, tls)].pop()
+                except (KeyError, IndexError):
+                    self.misses += 1
+                    return None
+            if now - opened < self.max_age and now - returned < self.idle_timeout and _healthy(network_socket):
+                with self._lock:
+                    self.hits += 1
+                    self._opened[network_socket] = opened
+                return network_socket
+            network_socket.close()
+            with self._lock:
+                self.discarded += 1
+
+    def checkin(self, ip, port, tls, network_socket):
+        """
+        Return a connection to the pool after a complete request and response
+
+        Parameters
+        ----------
+        ip : str
+            The ip address of the connection
+
+        port : int
+            The port of the connection
+
+        tls : bool
+            True for ssl connections
+
+        network_socket : socket.socket
+            The connection, a connection that was not checked out of the pool is treated as
+            opened now
+        """
+        now = time.monotonic()
+        with self._lock:
+            opened = self._opened.pop(network_socket, now)
+            if now - opened >= self.max_age:
+                discard = network_socket
+            else:
+                connections = self._idle.setdefault((ip, port, tls), deque())
+                connections.append((opened, now, network_socket))
+                discard = connections.popleft()[2] if len(connections) > self.max_idle else None
+            if discard:
+                self.discarded += 1
+        if discard:
+            discard.close()
@@ -0,0 +1,345 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Compact binary recordings of ping results
+
+A recording is an append-only file of fixed width little-endian records, one per ping,
+after a 16 byte header.  The targets of the records are stored by index, the host and port
+of each index are kept in a text file next to the recording with a ".targets" suffix.
+
+Because every record has the same size and each field is aligned to its own size, a field
+of every record can be read straight from a memory map of the file as a strided memoryview,
+without unpacking the records, and passed to :func:`serviceping.serviceping.batch_statistics`.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from .network import PingResponse
+from .output import BackgroundWriter, ResponseWriter
+from .results import FLAG_ERROR, FLAG_RESPONDING, FLAG_SSL_RESUMED, FLAG_TIMEOUT, PHASES, REASON_IDS, REASONS
+from .serviceping import DEFAULT_PERCENTILES, batch_statistics
+
+
+MAGIC = b'SVCPING\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sII')
+
+# timestamp, durations of each phase, target index, http code, flags, reason
+RECORD = struct.Struct('<q%dqIHBB' % len(PHASES))
+
+# The struct format, offset and size of each field of a record
+FIELDS = {'timestamp_ns': ('q', 0, 8)}
+FIELDS.update((phase, ('q', 8 + index * 8, 8)) for index, phase in enumerate(PHASES))
+_offset = 8 + len(PHASES) * 8
+FIELDS.update([
+    ('target', ('I', _offset, 4)), ('code', ('H', _offset + 4, 2)), ('flags', ('B', _offset + 6, 1)),
+    ('reason', ('B', _offset + 7, 1)),
+])
+del _offset
+
+
+def _targets_path(path):
+    return path + '.targets'
+
+
+def _read_targets(path):
+    """
+    Read the target table of a recording, empty if it does not exist yet
+    """
+    try:
+        with open(_targets_path(path)) as file_handle:
+            return [(host, int(port)) for host, port in (line.rstrip('\n').rsplit('\t', 1) for line in file_handle)]
+    except FileNotFoundError:
+        return []
+
+
+class RecordingWriter(ResponseWriter):
+    """
+    Append ping responses to a recording
+
+    The file is created if it does not exist, otherwise the records are added to the end of
+    it and the targets already in it keep their index.  A partial record left at the end of
+    the file by an interrupted write is removed.  The records are written in batches from a
+    background thread, so recording does not delay the pings.
+
+    The durations of the pings that did not respond are recorded as -1, so the columns of the
+    recording only hold the times of the responding pings.
+
+    Parameters
+    ----------
+    path : str
+        The file name of the recording
+
+    batch_size : int, optional
+        Number of records buffered before they are written, default=100
+
+    flush_interval : float, optional
+        Maximum number of seconds a record is buffered for, default=1
+
+    Raises
+    ------
+    ValueError - The file is not a recording of this version
+    """
+    def __init__(self, path, batch_size=100, flush_interval=1.0):
+        self.path = path
+        self.file = open(path, 'ab+')
+        try:
+            size = self.file.seek(0, os.SEEK_END)
+            if size:
+                self.file.seek(0)
+                _check_header(self.file.read(HEADER.size))
+                partial = (size - HEADER.size) % RECORD.size
+                if partial:
+                    self.file.truncate(size - partial)
+            else:
+                self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+                self.file.flush()
+        except Exception:
+            self.file.close()
+            raise
+        self.targets = _read_targets(path)
+        self._target_ids = {target: index for index, target in enumerate(self.targets)}
+        self._background = BackgroundWriter(self.file)
+        super().__init__(self._background, response_body=False, batch_size=batch_size, flush_interval=flush_interval)
+
+    def target_id(self, host, port):
+        """
+        Get the index of a target, adding it to the target table if it is new
+
+        Parameters
+        ----------
+        host : str
+            The host of the target
+
+        port : int
+            The port of the target
+
+        Returns
+        -------
+        int
+            The index of the target
+        """
+        key = (host, int(port))
+        try:
+            return self._target_ids[key]
+        except KeyError:
+            pass
+        # The target table is written before any record refers to the target
+        with open(_targets_path(self.path), 'a') as file_handle:
+            file_handle.write('%s\t%d\n' % key)
+        self.targets.append(key)
+        return self._target_ids.setdefault(key, len(self.targets) - 1)
+
+    def encode(self, record):
+        flags = 0
+        for name, flag in (('responding', FLAG_RESPONDING), ('error', FLAG_ERROR), ('ssl_resumed', FLAG_SSL_RESUMED)):
+            if record[name]:
+                flags |= flag
+        if record['reason'] == 'timeout':
+            flags |= FLAG_TIMEOUT
+        durations_ns = record['durations_ns'] if record['responding'] else {}
+        return RECORD.pack(
+            record['timestamp_ns'], *[durations_ns.get(phase, -1) for phase in PHASES],
+            self.target_id(record['host'], record['port']), record['code'] or 0, flags,
+            REASON_IDS.get(record['reason'], REASON_IDS['error'])
+        )
+
+    def close(self):
+        """
+        Write the buffered records and close the recording
+        """
+        super().close()
+        self._background.close()
+        self.file.close()
+
+
+def _check_header(header):
+    if len(header) < HEADER.size:
+        raise ValueError('The file is not a serviceping recording')
+    magic, version, record_size = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError('The file is not a serviceping recording')
+    if version != VERSION or record_size != RECORD.size:
+        raise ValueError('Unsupported serviceping recording version %d' % version)
+
+
+class Recording(object):
+    """
+    Read only memory map of a recording
+
+    The records written up to the time the recording is opened are mapped, a partial record
+    at the end of the file is ignored.  The columns returned by column() and series() are
+    views of the memory map and can only be used while the recording is open.
+
+    Parameters
+    ----------
+    path : str
+        The file name of the recording
+
+    Raises
+    ------
+    ValueError - The file is not a recording of this version
+    """
+    def __init__(self, path):
+        self.path = path
+        self.targets = _read_targets(path)
+        self._target_ids = {target: index for index, target in enumerate(self.targets)}
+        with open(path, 'rb') as file_handle:
+            _check_header(file_handle.read(HEADER.size))
+            self._map = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = (len(self._map) - HEADER.size) // RECORD.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('recording index out of range')
+        timestamp_ns, *durations, target, code, flags, reason = RECORD.unpack_from(
+            self._map, HEADER.size + index * RECORD.size
+        )
+        host, port = self.targets[target] if target < len(self.targets) else (None, None)
+        durations_ns = {phase: duration for phase, duration in zip(PHASES, durations) if duration >= 0}
+        return PingResponse(
+            host=host, port=port, sequence=index, responding=bool(flags & FLAG_RESPONDING),
+            error=bool(flags & FLAG_ERROR), timeout=bool(flags & FLAG_TIMEOUT),
+            ssl_resumed=bool(flags & FLAG_SSL_RESUMED), reason=REASONS[reason],
+            state='open' if flags & FLAG_RESPONDING else 'closed', code=code or None,
+            durations_ns=durations_ns or None, start=timestamp_ns
+        )
+
+    def close(self):
+        """
+        Close the memory map, it stays open until the columns still in use are released
+        """
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+
+    def column(self, field):
+        """
+        Get a field of every record
+
+        Parameters
+        ----------
+        field : str
+            The field, "timestamp_ns", "target", "code", "flags", "reason" or the name of a phase
+            for its durations in nanoseconds
+
+        Returns
+        -------
+        memoryview
+            A read only view of the field in the memory map, without copying the records.  On
+            big endian systems the values are copied into an array instead.
+        """
+        typecode, offset, size = FIELDS[field]
+        if not self._count:
+            return array(typecode)
+        start = HEADER.size + offset
+        view = memoryview(self._map)[start:start + (self._count - 1) * RECORD.size + size].cast(typecode)
+        view = view[::RECORD.size // size]
+        if sys.byteorder != 'little':  # pragma: no cover
+            view = array(typecode, view)
+            view.byteswap()
+        return view
+
+    def window(self, start_ns=None, end_ns=None):
+        """
+        Get the range of the records made in a time window, the records must be in time order
+
+        Parameters
+        ----------
+        start_ns : int, optional
+            The time.time_ns() start of the window, default is the first record
+
+        end_ns : int, optional
+            The time.time_ns() end of the window, excluded, default is after the last record
+
+        Returns
+        -------
+        slice
+            The indexes of the records in the window
+        """
+        timestamps = self.column('timestamp_ns')
+        start = 0 if start_ns is None else bisect_left(timestamps, start_ns)
+        end = self._count if end_ns is None else bisect_left(timestamps, end_ns, start)
+        return slice(start, end)
+
+    def series(self, phase='all', host=None, port=None, start_ns=None, end_ns=None):
+        """
+        Get the durations of one operation of the recorded pings
+
+        Parameters
+        ----------
+        phase : str, optional
+            The operation, one of "dns", "connect", "ssl", "request", "ttfb", "headers", "body" or
+            "all", default="all"
+
+        host : str, optional
+            Only get the durations of the pings of this host, default is every host
+
+        port : int, optional
+            The port of the host, required if a host is given
+
+        start_ns : int, optional
+            Only get the durations of the pings recorded from this time.time_ns() time on
+
+        end_ns : int, optional
+            Only get the durations of the pings recorded before this time.time_ns() time
+
+        Returns
+        -------
+        memoryview or array.array
+            The durations in nanoseconds, -1 for pings that did not respond or did not do the
+            operation.  A view of the memory map if every host is used, otherwise a copy.
+        """
+        records = self.window(start_ns, end_ns) if start_ns is not None or end_ns is not None else slice(None)
+        durations = self.column(phase)[records]
+        if host is None:
+            return durations
+        target_id = self._target_ids.get((host, int(port)))
+        return array('q', (
+            duration for target, duration in zip(self.column('target')[records], durations) if target == target_id
+        ))
+
+    def statistics(self, host=None, port=None, start_ns=None, end_ns=None, percentiles=DEFAULT_PERCENTILES):
+        """
+        Calculate the statistics of the recorded pings
+
+        Parameters
+        ----------
+        host : str, optional
+            Only use the pings of this host, default is every host
+
+        port : int, optional
+            The port of the host, required if a host is given
+
+        start_ns : int, optional
+            Only use the pings recorded from this time.time_ns() time on
+
+        end_ns : int, optional
+            Only use the pings recorded before this time.time_ns() time
+
+        percentiles : iterable of float, optional
+            The percentiles to calculate, default=(50, 90, 99, 99.9)
+
+        Returns
+        -------
+        dict
+            The statistics returned by :func:`serviceping.serviceping.batch_statistics`
+        """
+        return batch_statistics(self.series('all', host, port, start_ns, end_ns), percentiles=percentiles)
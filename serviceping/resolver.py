@@ -0,0 +1,201 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Host name resolution cache
+"""
+import asyncio
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+
+def getaddresses(host):
+    """
+    Resolve a host to all of its ipv6 and ipv4 addresses
+
+    Parameters
+    ----------
+    host : str
+        The host name to resolve
+
+    Returns
+    -------
+    list
+        List of (family, sockaddr) tuples in the order returned by getaddrinfo, the sockaddr
+        port is always 0
+
+    Raises
+    ------
+    socket.gaierror - The lookup failed
+    """
+    addresses = []
+    for family, _, _, _, sockaddr in socket.getaddrinfo(host, None, socket.AF_UNSPEC, socket.SOCK_STREAM):
+        if family in (socket.AF_INET, socket.AF_INET6) and (family, sockaddr) not in addresses:
+            addresses.append((family, sockaddr))
+    if not addresses:
+        raise socket.gaierror(socket.EAI_NONAME, 'No ipv4 or ipv6 addresses found')
+    return addresses
+
+
+class DNSCache(object):
+    """
+    A bounded cache of host name lookups with time to live expiration
+
+    Successful lookups are kept for ``ttl`` seconds and failed lookups are kept for
+    ``negative_ttl`` seconds.  When more than ``max_size`` host names are cached the
+    least recently used entry is evicted.
+
+    Parameters
+    ----------
+    ttl : float, optional
+        Number of seconds a successful lookup is cached, default=60
+
+    negative_ttl : float, optional
+        Number of seconds a failed lookup is cached, default=5
+
+    max_size : int, optional
+        Maximum number of host names to cache, default=1024
+
+    resolver : callable, optional
+        Function called with the host name to do the lookup, default=getaddresses
+    """
+    def __init__(self, ttl=60.0, negative_ttl=5.0, max_size=1024, resolver=getaddresses):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.resolver = resolver
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """
+        Remove all the cached entries
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def lookup(self, host):
+        """
+        Get the cached lookup result for a host
+
+        Parameters
+        ----------
+        host : str
+            The host name to look up
+
+        Returns
+        -------
+        object
+            The cached value returned by the resolver
+
+        Raises
+        ------
+        KeyError - The host is not cached or the cached entry has expired
+
+        socket.gaierror - The cached lookup failed
+        """
+        with self._lock:
+            try:
+                expires, value, error = self._entries[host]
+            except KeyError:
+                self.misses += 1
+                raise
+            if expires <= time.monotonic():
+                del self._entries[host]
+                self.misses += 1
+                raise KeyError(host)
+            self._entries.move_to_end(host)
+            self.hits += 1
+        if error:
+            # A new exception for every hit, raising the cached one would grow its traceback
+            raise type(error)(*error.args)
+        return value
+
+    def store(self, host, value=None, error=None):
+        """
+        Cache the lookup result for a host
+
+        Parameters
+        ----------
+        host : str
+            The host name that was looked up
+
+        value : object, optional
+            The value returned by the resolver
+
+        error : socket.gaierror, optional
+            The error raised by the resolver if the lookup failed
+        """
+        ttl = self.negative_ttl if error else self.ttl
+        with self._lock:
+            self._entries[host] = (time.monotonic() + ttl, value, error)
+            self._entries.move_to_end(host)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def resolve(self, host):
+        """
+        Resolve a host, using the cached result if there is one
+
+        Parameters
+        ----------
+        host : str
+            The host name to resolve
+
+        Returns
+        -------
+        object
+            The value returned by the resolver
+
+        Raises
+        ------
+        socket.gaierror - The lookup failed
+        """
+        try:
+            return self.lookup(host)
+        except KeyError:
+            pass
+        try:
+            value = self.resolver(host)
+        except socket.gaierror as error:
+            self.store(host, error=error)
+            raise
+        self.store(host, value)
+        return value
+
+    async def async_resolve(self, host):
+        """
+        Resolve a host without blocking the event loop, using the cached result if there is one
+
+        Parameters
+        ----------
+        host : str
+            The host name to resolve
+
+        Returns
+        -------
+        object
+            The value returned by the resolver
+
+        Raises
+        ------
+        socket.gaierror - The lookup failed
+        """
+        try:
+            return self.lookup(host)
+        except KeyError:
+            pass
+        try:
+            value = await asyncio.get_running_loop().run_in_executor(None, self.resolver, host)
+        except socket.gaierror as error:
+            self.store(host, error=error)
+            raise
+        self.store(host, value)
+        return value
@@ -0,0 +1,241 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Compact storage of ping responses
+"""
+from array import array
+
+from .network import PingResponse
+from .serviceping import DEFAULT_PERCENTILES, batch_statistics
+
+
+PHASES = ('dns', 'connect', 'ssl', 'request', 'ttfb', 'headers', 'body', 'all')
+
+FLAG_RESPONDING = 1
+FLAG_ERROR = 2
+FLAG_TIMEOUT = 4
+FLAG_DATA_MISMATCH = 8
+FLAG_SSL_RESUMED = 16
+
+# The failure reasons of ping responses, binary records store the index of the reason
+REASONS = (
+    None, 'refused', 'timeout', 'unreachable', 'reset', 'prohibited', 'dns', 'ssl_error', 'eof', 'invalid_response',
+    'error'
+)
+REASON_IDS = {reason: index for index, reason in enumerate(REASONS)}
+
+_FLAGS = (
+    ('responding', FLAG_RESPONDING),
+    ('error', FLAG_ERROR),
+    ('timeout', FLAG_TIMEOUT),
+    ('data_mismatch', FLAG_DATA_MISMATCH),
+    ('ssl_resumed', FLAG_SSL_RESUMED),
+)
+
+
+class PingResultBuffer(object):
+    """
+    Columnar storage for a large number of ping responses
+
+    Each field of the ping responses is stored in its own array of packed integers, so a
+    response takes 119 bytes no matter how many are stored, 55 bytes for the fixed fields and
+    8 bytes for the duration of each of the 8 phases, plus the spare capacity of the arrays
+    as they grow.  The host and port of each response are stored as an index into a table of
+    targets, and the ip address, state, failure reason, ssl version and error message as an
+    index into a table of strings.
+    Durations are stored in nanoseconds, -1 if the operation was not done.
+
+    The response body and the addresses of multi address pings are not stored.
+    """
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self.target)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('ping result index out of range')
+        host, port = self._targets[self.target[index]]
+        flags = self.flags[index]
+        durations_ns = {}
+        for phase in PHASES:
+            duration = self.durations[phase][index]
+            if duration >= 0:
+                durations_ns[phase] = duration
+        code = self.code[index]
+        start, end = self.start[index], self.end[index]
+        return PingResponse(
+            host=host, port=port, ip=self._strings[self.ip[index]], sequence=self.sequence[index],
+            durations_ns=durations_ns or None, code=code if code else None, state=self._strings[self.state[index]],
+            length=self.length[index], ssl_version=self._strings[self.ssl_version[index]] or '',
+            error_message=self._strings[self.error_message[index]], reason=self._strings[self.reason[index]],
+            start=start, end=end if end >= 0 else None,
+            **{name: bool(flags & flag) for name, flag in _FLAGS}
+        )
+
+    @property
+    def targets(self):
+        """
+        The (host, port) of each target, in the order the targets were added
+        """
+        return list(self._targets)
+
+    def clear(self):
+        """
+        Remove all the stored responses and targets
+        """
+        self._targets = []
+        self._target_ids = {}
+        self._strings = [None]
+        self._string_ids = {None: 0}
+        self.target = array('I')
+        self.sequence = array('Q')
+        self.start = array('q')
+        self.end = array('q')
+        self.flags = array('B')
+        self.code = array('H')
+        self.length = array('I')
+        self.ip = array('I')
+        self.state = array('I')
+        self.reason = array('I')
+        self.ssl_version = array('I')
+        self.error_message = array('I')
+        self.durations = {phase: array('q') for phase in PHASES}
+
+    def target_id(self, host, port):
+        """
+        Get the index of a target in the target table, adding the target if it is new
+
+        Parameters
+        ----------
+        host : str
+            The host of the target
+
+        port : int
+            The port of the target
+
+        Returns
+        -------
+        int
+            The index of the target
+        """
+        key = (host, int(port))
+        try:
+            return self._target_ids[key]
+        except KeyError:
+            self._targets.append(key)
+            return self._target_ids.setdefault(key, len(self._targets) - 1)
+
+    def _string_id(self, value):
+        try:
+            return self._string_ids[value]
+        except KeyError:
+            self._strings.append(value)
+            return self._string_ids.setdefault(value, len(self._strings) - 1)
+
+    def append(self, ping_response):
+        """
+        Store a ping response
+
+        Parameters
+        ----------
+        ping_response : PingResponse
+            The ping response to store
+        """
+        durations_ns = ping_response.durations_ns or {}
+        flags = 0
+        for name, flag in _FLAGS:
+            if getattr(ping_response, name):
+                flags |= flag
+        self.target.append(self.target_id(ping_response.host, ping_response.port))
+        self.sequence.append(ping_response.sequence)
+        self.start.append(ping_response.start)
+        self.end.append(ping_response.end if ping_response.end is not None else -1)
+        self.flags.append(flags)
+        self.code.append(ping_response.code or 0)
+        self.length.append(ping_response.length or 0)
+        self.ip.append(self._string_id(ping_response.ip))
+        self.state.append(self._string_id(ping_response.state))
+        self.reason.append(self._string_id(ping_response.reason))
+        self.ssl_version.append(self._string_id(ping_response.ssl_version or None))
+        self.error_message.append(self._string_id(ping_response.error_message))
+        for phase in PHASES:
+            self.durations[phase].append(durations_ns.get(phase, -1))
+
+    def extend(self, ping_responses):
+        """
+        Store multiple ping responses
+
+        Parameters
+        ----------
+        ping_responses : iterable of PingResponse
+            The ping responses to store
+        """
+        for ping_response in ping_responses:
+            self.append(ping_response)
+
+    def series(self, phase='all', host=None, port=None):
+        """
+        Get the durations of one operation of the stored responses
+
+        Parameters
+        ----------
+        phase : str, optional
+            The operation, one of "dns", "connect", "ssl", "request", "ttfb", "headers", "body" or
+            "all", default="all"
+
+        host : str, optional
+            Only get the durations of the responses from this host, default is every host
+
+        port : int, optional
+            The port of the host, required if a host is given
+
+        Returns
+        -------
+        array.array
+            The durations in nanoseconds, -1 for responses that did not respond or did not do
+            the operation
+        """
+        durations = self.durations[phase]
+        if host is None:
+            return array('q', (
+                duration if flags & FLAG_RESPONDING else -1 for duration, flags in zip(durations, self.flags)
+            ))
+        try:
+            target_id = self._target_ids[(host, int(port))]
+        except KeyError:
+            return array('q')
+        return array('q', (
+            duration if flags & FLAG_RESPONDING else -1
+            for target, duration, flags in zip(self.target, durations, self.flags) if target == target_id
+        ))
+
+    def statistics(self, host=None, port=None, percentiles=DEFAULT_PERCENTILES):
+        """
+        Calculate the statistics of the stored responses
+
+        Parameters
+        ----------
+        host : str, optional
+            Only use the responses from this host, default is every host
+
+        port : int, optional
+            The port of the host, required if a host is given
+
+        percentiles : iterable of float, optional
+            The percentiles to calculate, default=(50, 90, 99, 99.9)
+
+        Returns
+        -------
+        dict
+            The statistics returned by :func:`serviceping.serviceping.batch_statistics`
+        """
+        return batch_statistics(self.series('all', host, port), percentiles=percentiles)
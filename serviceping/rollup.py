@@ -0,0 +1,450 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Time windowed rollups of ping times
+
+Instead of keeping every ping, the pings of each target are summarized into fixed width time
+buckets at several resolutions, 10 second buckets for the last hour, 1 minute buckets for the
+last day and 1 hour buckets for the last week by default.  Each bucket is a StatsList, so it
+holds the count, min, max, mean and a LogHistogram quantile sketch of the ping times in
+constant memory, and the number of pings sent for the loss.  Buckets older than the retention
+of their resolution are dropped as new buckets are started, so the memory used only depends
+on the number of targets and not on how long the pings run.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .serviceping import DEFAULT_PERCENTILES, StatsList
+
+
+# The (bucket width in seconds, number of buckets kept) of each resolution
+DEFAULT_RESOLUTIONS = ((10, 360), (60, 1440), (3600, 168))
+
+
+class RollupBucket(object):
+    """
+    The summary of the pings of a target during one time bucket
+
+    Parameters
+    ----------
+    start : float
+        The time.time() start of the bucket
+
+    width : float
+        The width of the bucket in seconds
+
+    relative_error : float, optional
+        The relative accuracy of the percentile estimates, default=0.01
+
+    Attributes
+    ----------
+    sent : int
+        Number of pings sent
+
+    stats : StatsList
+        The times of the pings that responded in milliseconds
+    """
+    __slots__ = ('start', 'width', 'sent', 'stats')
+
+    def __init__(self, start, width, relative_error=0.01):
+        self.start = start
+        self.width = width
+        self.sent = 0
+        self.stats = StatsList(relative_error=relative_error)
+
+    def __repr__(self):
+        return 'RollupBucket(start=%r, width=%r, sent=%d, received=%d)' % (
+            self.start, self.width, self.sent, self.received
+        )
+
+    @property
+    def end(self):
+        """
+        The time.time() end of the bucket, excluded from the bucket
+        """
+        return self.start + self.width
+
+    @property
+    def received(self):
+        """
+        Number of pings that responded
+        """
+        return self.stats.count
+
+    @property
+    def loss(self):
+        """
+        The percentage of the pings that did not respond, 0 if no pings were sent
+        """
+        if not self.sent:
+            return 0.0
+        return 100.0 - self.received * 100.0 / self.sent
+
+    def add(self, value):
+        """
+        Add a ping to the bucket
+
+        Parameters
+        ----------
+        value : float
+            The time of the ping in milliseconds, None if the ping did not respond
+        """
+        self.sent += 1
+        if value is not None:
+            self.stats.append(value)
+
+    def merge(self, other):
+        """
+        Add the pings of another bucket to this bucket
+
+        Parameters
+        ----------
+        other : RollupBucket
+            The bucket to merge, its percentile estimates must have the same relative error
+        """
+        self.sent += other.sent
+        self.stats.merge(other.stats)
+
+    def as_dict(self, percentiles=DEFAULT_PERCENTILES):
+        """
+        Get the summary of the bucket
+
+        Parameters
+        ----------
+        percentiles : iterable of float, optional
+            The percentiles to estimate, default=(50, 90, 99, 99.9)
+
+        Returns
+        -------
+        dict
+            The start, width, sent, received, loss, min_time, avg_time, max_time, deviation and
+            percentiles of the bucket, the times are in milliseconds and None if no ping
+            responded
+        """
+        responded = bool(self.received)
+        return dict(
+            start=self.start,
+            width=self.width,
+            sent=self.sent,
+            received=self.received,
+            loss=self.loss,
+            min_time=self.stats.min,
+            avg_time=self.stats.mean() if responded else None,
+            max_time=self.stats.max,
+            deviation=self.stats.standard_deviation() if responded else None,
+            percentiles=self.stats.percentiles(percentiles) if responded else OrderedDict(),
+        )
+
+
+class RollupSeries(object):
+    """
+    The buckets of one resolution of a target
+
+    A new bucket is started when a ping arrives after the end of the newest bucket, and the
+    buckets that start more than retention widths before the newest bucket are dropped.
+    Buckets are only kept for the time slots that had pings.  Pings that arrive late are
+    added to the bucket of their time, unless it has already been dropped.
+
+    Parameters
+    ----------
+    width : float
+        The width of the buckets in seconds
+
+    retention : int
+        The number of bucket widths kept
+
+    relative_error : float, optional
+        The relative accuracy of the percentile estimates, default=0.01
+
+    Attributes
+    ----------
+    dropped : int
+        Number of pings that arrived too late to be added to a bucket
+    """
+    def __init__(self, width, retention, relative_error=0.01):
+        if width <= 0 or retention < 1:
+            raise ValueError('The width must be greater than 0 and the retention at least 1')
+        self.width = width
+        self.retention = retention
+        self.relative_error = relative_error
+        self.buckets = deque()
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.buckets)
+
+    @property
+    def oldest(self):
+        """
+        The time.time() start of the oldest time kept, None if there are no buckets
+        """
+        if not self.buckets:
+            return None
+        return self.buckets[-1].start - (self.retention - 1) * self.width
+
+    def _bucket(self, timestamp):
+        """
+        Get the bucket of a time, starting a new bucket if needed, None if it was dropped
+        """
+        start = timestamp - timestamp % self.width
+        buckets = self.buckets
+        if not buckets or start > buckets[-1].start:
+            buckets.append(RollupBucket(start, self.width, self.relative_error))
+            oldest = self.oldest
+            while buckets[0].start < oldest:
+                buckets.popleft()
+            return buckets[-1]
+        if start < self.oldest:
+            return None
+        # A late ping, search back from the newest bucket
+        for index in range(len(buckets) - 1, -1, -1):
+            if buckets[index].start == start:
+                return buckets[index]
+            if buckets[index].start < start:
+                break
+        else:
+            index = -1
+        bucket = RollupBucket(start, self.width, self.relative_error)
+        buckets.insert(index + 1, bucket)
+        return bucket
+
+    def add(self, timestamp, value):
+        """
+        Add a ping
+
+        Parameters
+        ----------
+        timestamp : float
+            The time.time() time of the ping
+
+        value : float
+            The time of the ping in milliseconds, None if the ping did not respond
+        """
+        bucket = self._bucket(timestamp)
+        if bucket is None:
+            self.dropped += 1
+            return
+        bucket.add(value)
+
+    def query(self, start=None, end=None):
+        """
+        Get the buckets in a time range
+
+        Parameters
+        ----------
+        start : float, optional
+            The time.time() start of the range, default is the oldest bucket
+
+        end : float, optional
+            The time.time() end of the range, excluded, default is after the newest bucket
+
+        Returns
+        -------
+        list of RollupBucket
+            The buckets that overlap the range, oldest first
+        """
+        return [
+            bucket for bucket in self.buckets
+            if (start is None or bucket.end > start) and (end is None or bucket.start < end)
+        ]
+
+
+class Rollups(object):
+    """
+    Time windowed rollups of the pings of a set of targets
+
+    The rollups can be updated and queried from different threads.
+
+    Parameters
+    ----------
+    resolutions : iterable of tuple, optional
+        The (bucket width in seconds, number of buckets kept) of each resolution,
+        default=DEFAULT_RESOLUTIONS
+
+    relative_error : float, optional
+        The relative accuracy of the percentile estimates, default=0.01
+
+    clock : callable, optional
+        Function returning the current time of the pings that are added without a time,
+        default=time.time
+    """
+    def __init__(self, resolutions=DEFAULT_RESOLUTIONS, relative_error=0.01, clock=time.time):
+        self.resolutions = tuple(sorted((width, retention) for width, retention in resolutions))
+        if not self.resolutions:
+            raise ValueError('At least one resolution is required')
+        self.relative_error = relative_error
+        self.clock = clock
+        self._targets = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._targets)
+
+    @property
+    def targets(self):
+        """
+        The names of the targets, in the order they were added
+        """
+        with self._lock:
+            return list(self._targets)
+
+    def series(self, target, width):
+        """
+        Get the series of one resolution of a target
+
+        Parameters
+        ----------
+        target : str
+            The name of the target
+
+        width : float
+            The bucket width of the resolution
+
+        Returns
+        -------
+        RollupSeries
+            The series
+
+        Raises
+        ------
+        KeyError - The target has no pings or there is no resolution with the width
+        """
+        with self._lock:
+            return self._targets[target][width]
+
+    def add(self, target, value, timestamp=None):
+        """
+        Add a ping of a target to the bucket of its time in every resolution
+
+        Parameters
+        ----------
+        target : str
+            The name of the target
+
+        value : float
+            The time of the ping in milliseconds, None if the ping did not respond
+
+        timestamp : float, optional
+            The time.time() time of the ping, default is the current time of the clock
+        """
+        if timestamp is None:
+            timestamp = self.clock()
+        with self._lock:
+            series = self._targets.get(target)
+            if series is None:
+                series = self._targets[target] = OrderedDict(
+                    (width, RollupSeries(width, retention, self.relative_error))
+                    for width, retention in self.resolutions
+                )
+            for resolution in series.values():
+                resolution.add(timestamp, value)
+
+    def update(self, target, ping_response, timestamp=None):
+        """
+        Add a ping response of a target
+
+        Parameters
+        ----------
+        target : str
+            The name of the target
+
+        ping_response : PingResponse
+            The ping response, the time of the ping is its "all" duration
+
+        timestamp : float, optional
+            The time.time() time of the ping, default is the current time of the clock
+        """
+        value = None
+        if ping_response.responding and ping_response.durations_ns:
+            value = ping_response.durations_ns['all'] / 1000000.0
+        self.add(target, value, timestamp)
+
+    def remove(self, target):
+        """
+        Remove the rollups of a target
+
+        Parameters
+        ----------
+        target : str
+            The name of the target
+        """
+        with self._lock:
+            self._targets.pop(target, None)
+
+    def query(self, target, start=None, end=None, width=None):
+        """
+        Get the buckets of a target in a time range
+
+        Parameters
+        ----------
+        target : str
+            The name of the target
+
+        start : float, optional
+            The time.time() start of the range, default is the oldest bucket
+
+        end : float, optional
+            The time.time() end of the range, excluded, default is after the newest bucket
+
+        width : float, optional
+            The bucket width of the resolution to use, default is the finest resolution that
+            still has the start of the range, or the coarsest if none does
+
+        Returns
+        -------
+        list of RollupBucket
+            Copies of the buckets that overlap the range, oldest first, empty if the target has
+            no pings
+        """
+        with self._lock:
+            series = self._targets.get(target)
+            if series is None:
+                return []
+            if width is not None:
+                resolution = series[width]
+            else:
+                resolution = list(series.values())[-1]
+                if start is not None:
+                    for candidate in series.values():
+                        if candidate.oldest is not None and candidate.oldest <= start:
+                            resolution = candidate
+                            break
+            buckets = []
+            for bucket in resolution.query(start, end):
+                copy = RollupBucket(bucket.start, bucket.width, self.relative_error)
+                copy.merge(bucket)
+                buckets.append(copy)
+            return buckets
+
+    def summary(self, target, start=None, end=None, width=None):
+        """
+        Get the summary of the pings of a target in a time range
+
+        Parameters
+        ----------
+        target : str
+            The name of the target
+
+        start : float, optional
+            The time.time() start of the range, default is the oldest bucket
+
+        end : float, optional
+            The time.time() end of the range, excluded, default is after the newest bucket
+
+        width : float, optional
+            The bucket width of the resolution to use, see query()
+
+        Returns
+        -------
+        RollupBucket
+            The merged buckets that overlap the range, its start and width cover the buckets
+        """
+        buckets = self.query(target, start, end, width)
+        if not buckets:
+            return RollupBucket(start or 0, 0, self.relative_error)
+        summary = RollupBucket(buckets[0].start, buckets[-1].end - buckets[0].start, self.relative_error)
+        for bucket in buckets:
+            summary.merge(bucket)
+        return summary
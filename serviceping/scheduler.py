@@ -0,0 +1,116 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Drift free ping scheduling
+"""
+import asyncio
+import random
+import time
+
+
+class IntervalScheduler(object):
+    """
+    Schedule pings at a fixed interval on absolute time.monotonic() deadlines
+
+    Ping n is due at start + n * interval, so the time the pings take and the overshoot of
+    each sleep do not add up and the period stays at the interval.  When a ping takes longer
+    than an interval the slots that passed are counted as missed and the next ping starts
+    right away at the next slot, instead of the period silently stretching or a burst of
+    pings catching up.
+
+    Parameters
+    ----------
+    interval : float
+        Number of seconds between pings, may be fractional or below a millisecond
+
+    jitter : float, optional
+        Random delay added to each slot as a fraction of the interval, between 0 and 1, so
+        the pings of many targets started together do not stay in lock step, default=0
+
+    rate : float, optional
+        Maximum number of pings per second, the start of consecutive pings are at least
+        1 / rate seconds apart even when jitter or a late ping would bring them closer.  When
+        1 / rate is longer than the interval the slots are 1 / rate seconds apart, default is
+        no limit
+
+    clock : callable, optional
+        Function returning the current time in seconds, default=time.monotonic
+
+    Attributes
+    ----------
+    period : float
+        Number of seconds between slots, the larger of the interval and 1 / rate
+
+    slots : int
+        Number of slots handed out
+
+    missed : int
+        Number of slots skipped because the previous ping was still running
+    """
+    def __init__(self, interval, jitter=0.0, rate=None, clock=time.monotonic):
+        if interval < 0:
+            raise ValueError('The interval can not be negative')
+        if not 0 <= jitter <= 1:
+            raise ValueError('The jitter must be between 0 and 1')
+        self.interval = interval
+        self.jitter = jitter
+        self.min_spacing = 1.0 / rate if rate else 0
+        self.period = max(interval, self.min_spacing)
+        self.clock = clock
+        self.start = None
+        self.slots = 0
+        self.missed = 0
+        self._last = None
+
+    def delay(self, now=None):
+        """
+        Take the next slot
+
+        Parameters
+        ----------
+        now : float, optional
+            The current time of the clock
+
+        Returns
+        -------
+        float
+            Number of seconds until the slot starts, 0 if it should start now
+        """
+        if now is None:
+            now = self.clock()
+        if self.start is None:
+            self.start = now
+        slot = self.slots + self.missed
+        # The slots are period apart, so slots are only skipped when a ping overran them and
+        # never because of the rate limit
+        if self.interval and self.slots and now >= self.start + (slot + 1) * self.period:
+            # The previous ping ran past this slot and the next one, skip to the current slot
+            skipped = int((now - self.start) / self.period) - slot
+            self.missed += skipped
+            slot += skipped
+        due = self.start + slot * self.period
+        if self.jitter:
+            due += random.random() * self.jitter * self.period
+        if self._last is not None:
+            due = max(due, self._last + self.min_spacing)
+        due = max(due, now)
+        self._last = due
+        self.slots += 1
+        return due - now
+
+    def wait(self):
+        """
+        Sleep until the next slot
+        """
+        delay = self.delay()
+        if delay:
+            time.sleep(delay)
+
+    async def async_wait(self):
+        """
+        Sleep until the next slot without blocking the event loop
+        """
+        delay = self.delay()
+        if delay:
+            await asyncio.sleep(delay)
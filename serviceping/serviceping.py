@@ -6,22 +6,152 @@ ServicePing Utility functioins
 """
 import logging
 import math
+from array import array
+from collections import OrderedDict, deque
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
 
 
 LOG = logging.getLogger(__name__)
 
 
+DEFAULT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LogHistogram(object):
+    """
+    A constant memory histogram with logarithmically sized buckets, used to estimate quantiles
+
+    Each bucket covers values within a fixed relative error of each other, so quantile estimates
+    are accurate to ``relative_error`` of the true value regardless of the magnitude of the values
+    and the number of buckets only grows with the logarithm of the range of the values.  Histograms
+    with the same relative error can be merged.
+
+    Parameters
+    ----------
+    relative_error : float, optional
+        The relative accuracy of the quantile estimates, default=0.01
+    """
+    def __init__(self, relative_error=0.01):
+        if not 0 < relative_error < 1:
+            raise ValueError('The relative error must be between 0 and 1')
+        self.relative_error = relative_error
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def reset(self):
+        """
+        Remove all the values from the histogram
+        """
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value, count=1):
+        """
+        Add a value to the histogram
+
+        Parameters
+        ----------
+        value : float
+            The value to add, values less than or equal to zero are counted as zero
+
+        count : int, optional
+            Number of times to add the value, default=1
+        """
+        self.count += count
+        if value <= 0:
+            self.zero_count += count
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other):
+        """
+        Add the values of another histogram to this histogram
+
+        Parameters
+        ----------
+        other : LogHistogram
+            The histogram to merge, it must have the same relative error
+        """
+        if other.relative_error != self.relative_error:
+            raise ValueError('Only histograms with the same relative error can be merged')
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, quantile):
+        """
+        Estimate a quantile of the values
+
+        Parameters
+        ----------
+        quantile : float
+            The quantile to estimate, between 0 and 1
+
+        Returns
+        -------
+        float
+            The estimated value, or 0.0 if the histogram is empty
+        """
+        if not self.count:
+            return 0.0
+        # Nearest rank, the value that quantile of the values are less than or equal to
+        rank = max(math.ceil(quantile * self.count), 1)
+        seen = self.zero_count
+        if seen >= rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)  # pragma: no cover
+
+    def percentile(self, percentile):
+        """
+        Estimate a percentile of the values
+
+        Parameters
+        ----------
+        percentile : float
+            The percentile to estimate, between 0 and 100
+
+        Returns
+        -------
+        float
+            The estimated value, or 0.0 if the histogram is empty
+        """
+        return self.quantile(percentile / 100.0)
+
+
 class StatsList(object):
     """
     A list object that can do statistics on the values
+
+    The statistics are calculated incrementally, so the values themselves are not kept and
+    the memory used is constant.  Percentiles are estimated with a LogHistogram.
     """
     count = 0
     old_m = 0
     new_m = 0
     old_s = 0
     new_s = 0
+    min = None
+    max = None
 
-    def __init__(self, values=None):
+    def __init__(self, values=None, relative_error=0.01):
+        self.histogram = LogHistogram(relative_error)
         if values:
             for value in values:
                 self.append(value)
@@ -31,6 +161,8 @@ class StatsList(object):
         Reset the counter
         """
         self.count = 0
+        self.min = self.max = None
+        self.histogram.reset()
 
     def append(self, value):
         """
@@ -42,10 +174,15 @@ class StatsList(object):
             The value to add
         """
         self.count += 1
+        self.histogram.add(value)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
 
         if self.count == 1:
             self.old_m = self.new_m = value
-            self.old_s = 0
+            self.old_s = self.new_s = 0
         else:
             self.new_m = self.old_m + (value - self.old_m) / self.count
             self.new_s = self.old_s + (value - self.old_m) * (value - self.new_m)
@@ -53,6 +190,68 @@ class StatsList(object):
             self.old_m = self.new_m
             self.old_s = self.new_s
 
+    def merge(self, other):
+        """
+        Add the values of another stats list to this stats list
+
+        Parameters
+        ----------
+        other : StatsList
+            The stats list to merge, its histogram must have the same relative error
+        """
+        self.histogram.merge(other.histogram)
+        if not other.count:
+            return
+        if not self.count:
+            self.count = other.count
+            self.old_m = self.new_m = other.new_m
+            self.old_s = self.new_s = other.new_s
+            self.min, self.max = other.min, other.max
+            return
+        count = self.count + other.count
+        delta = other.new_m - self.new_m
+        self.new_m = self.new_m + delta * other.count / count
+        self.new_s = self.new_s + other.new_s + delta * delta * self.count * other.count / count
+        self.old_m, self.old_s = self.new_m, self.new_s
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile):
+        """
+        Estimate a percentile of the elements
+
+        Parameters
+        ----------
+        percentile : float
+            The percentile to estimate, between 0 and 100
+
+        Returns
+        -------
+        float
+            The estimated percentile of the list elements, within the min and max of the elements
+        """
+        estimate = self.histogram.percentile(percentile)
+        if not self.count:
+            return estimate
+        return min(max(estimate, self.min), self.max)
+
+    def percentiles(self, percentiles=DEFAULT_PERCENTILES):
+        """
+        Estimate multiple percentiles of the elements
+
+        Parameters
+        ----------
+        percentiles : iterable of float, optional
+            The percentiles to estimate, default=(50, 90, 99, 99.9)
+
+        Returns
+        -------
+        OrderedDict
+            The estimated value of each percentile
+        """
+        return OrderedDict((percentile, self.percentile(percentile)) for percentile in percentiles)
+
     def mean(self):
         """
         Calculate the mean of the elements
@@ -91,6 +290,267 @@ class StatsList(object):
         return math.sqrt(self.variance())
 
 
+class WindowedStatsList(object):
+    """
+    A stats list of only the most recent values
+
+    The values are kept in a fixed size ring buffer and the mean, variance, min and max are
+    updated as each value enters and leaves the window, so appending a value takes constant
+    time no matter how large the window is.
+
+    Parameters
+    ----------
+    size : int
+        The number of most recent values to keep
+
+    values : iterable of float, optional
+        Initial values to append
+    """
+    def __init__(self, size, values=None):
+        if size < 1:
+            raise ValueError('The window size must be at least 1')
+        self.size = size
+        self.reset()
+        if values:
+            for value in values:
+                self.append(value)
+
+    def reset(self):
+        """
+        Reset the counter
+        """
+        self.values = array('d', bytes(8 * self.size))
+        self.count = 0
+        self.total = 0
+        self.m = 0.0
+        self.s = 0.0
+        # Monotonic queues of (total, value), the head is the min/max of the window
+        self._min = deque()
+        self._max = deque()
+
+    @property
+    def min(self):
+        """
+        The smallest value in the window, None if the window is empty
+        """
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self):
+        """
+        The largest value in the window, None if the window is empty
+        """
+        return self._max[0][1] if self._max else None
+
+    def append(self, value):
+        """
+        Append a value to the stats list, dropping the oldest value if the window is full
+
+        Parameters
+        ----------
+        value : float
+            The value to add
+        """
+        index = self.total % self.size
+        if self.count < self.size:
+            self.count += 1
+            old_m = self.m
+            self.m += (value - old_m) / self.count
+            self.s += (value - old_m) * (value - self.m)
+        else:
+            oldest = self.values[index]
+            old_m = self.m
+            self.m += (value - oldest) / self.count
+            self.s += (value - oldest) * (value - self.m + oldest - old_m)
+            if self.s < 0:
+                self.s = 0.0
+        self.values[index] = value
+
+        expired = self.total - self.size
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((self.total, value))
+        if self._min[0][0] <= expired:
+            self._min.popleft()
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((self.total, value))
+        if self._max[0][0] <= expired:
+            self._max.popleft()
+        self.total += 1
+
+    def window(self):
+        """
+        Get the values in the window
+
+        Returns
+        -------
+        list of float
+            The values in the window, oldest first
+        """
+        if self.count < self.size:
+            return list(self.values[:self.count])
+        index = self.total % self.size
+        return list(self.values[index:]) + list(self.values[:index])
+
+    def percentile(self, percentile):
+        """
+        Calculate a percentile of the values in the window
+
+        Parameters
+        ----------
+        percentile : float
+            The percentile to calculate, between 0 and 100
+
+        Returns
+        -------
+        float
+            The nearest rank percentile of the window
+        """
+        return self.percentiles([percentile])[percentile]
+
+    def percentiles(self, percentiles=DEFAULT_PERCENTILES):
+        """
+        Calculate multiple percentiles of the values in the window
+
+        Parameters
+        ----------
+        percentiles : iterable of float, optional
+            The percentiles to calculate, default=(50, 90, 99, 99.9)
+
+        Returns
+        -------
+        OrderedDict
+            The value of each percentile
+        """
+        values = sorted(self.window())
+        if not values:
+            return OrderedDict((percentile, 0.0) for percentile in percentiles)
+        return OrderedDict(
+            (percentile, values[int(round(percentile / 100.0 * (len(values) - 1)))]) for percentile in percentiles
+        )
+
+    def mean(self):
+        """
+        Calculate the mean of the values in the window
+
+        Returns
+        -------
+        float
+            The mean of the window
+        """
+        return self.m if self.count else 0.0
+
+    def variance(self):
+        """
+        Calculate the variance of the values in the window
+
+        Returns
+        -------
+        float
+            The variance of the window
+        """
+        if self.count > 1:
+            return self.s / (self.count - 1)
+        return 0.0
+
+    def standard_deviation(self):
+        """
+        Calculate the standard deviation of the values in the window
+
+        Returns
+        -------
+        float
+            The standard deviation of the window
+        """
+        return math.sqrt(self.variance())
+
+
+def _interpolated_percentile(values, percentile):
+    """
+    Linearly interpolated percentile of sorted values, the same method numpy.percentile uses
+    """
+    position = percentile / 100.0 * (len(values) - 1)
+    lower = int(math.floor(position))
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _numpy_statistics(durations_ns, percentiles):
+    values = numpy.asarray(durations_ns, dtype=numpy.float64)
+    count = values.size
+    values = values[values >= 0]
+    if not values.size:
+        return count, 0, 0, 0.0, 0, 0.0, OrderedDict()
+    stddev = float(values.std(ddof=1)) if values.size > 1 else 0.0
+    estimates = numpy.percentile(values, list(percentiles)) if percentiles else []
+    return (
+        count, int(values.size), int(values.min()), float(values.mean()), int(values.max()), stddev,
+        OrderedDict((percentile, float(value)) for percentile, value in zip(percentiles, estimates))
+    )
+
+
+def _array_statistics(durations_ns, percentiles):
+    values = array('d', durations_ns)
+    count = len(values)
+    values = sorted(value for value in values if value >= 0)
+    if not values:
+        return count, 0, 0, 0.0, 0, 0.0, OrderedDict()
+    mean = math.fsum(values) / len(values)
+    stddev = 0.0
+    if len(values) > 1:
+        stddev = math.sqrt(math.fsum((value - mean) ** 2 for value in values) / (len(values) - 1))
+    return (
+        count, len(values), int(values[0]), mean, int(values[-1]), stddev,
+        OrderedDict((percentile, _interpolated_percentile(values, percentile)) for percentile in percentiles)
+    )
+
+
+def batch_statistics(durations_ns, count_sent=None, percentiles=DEFAULT_PERCENTILES):
+    """
+    Calculate the statistics of a recorded series of ping times in a single pass
+
+    NumPy is used to do the calculations when it is installed, otherwise the durations are
+    copied into an array and calculated in python.  Unlike StatsList the percentiles are
+    exact, linearly interpolated between the closest ping times.
+
+    Parameters
+    ----------
+    durations_ns : iterable of int
+        The ping times in nanoseconds, any sequence, array, memoryview or numpy array of numbers.
+        Negative values mark pings that did not get a response.
+
+    count_sent : int, optional
+        Number of pings sent, default is the number of durations
+
+    percentiles : iterable of float, optional
+        The percentiles to calculate, default=(50, 90, 99, 99.9)
+
+    Returns
+    -------
+    dict
+        The count_sent, count_received, min_time, avg_time, max_time, deviation, percentiles and loss
+        keyword arguments of :func:`serviceping.cli.exit_statistics`.  The min and max times are in
+        nanoseconds, the average, deviation and percentiles are in milliseconds and the loss is a
+        percentage.
+    """
+    percentiles = list(percentiles)
+    calculate = _numpy_statistics if numpy is not None else _array_statistics
+    count, received, min_time, mean, max_time, stddev, estimates = calculate(durations_ns, percentiles)
+    if count_sent is None:
+        count_sent = count
+    return dict(
+        count_sent=count_sent,
+        count_received=received,
+        min_time=min_time,
+        avg_time=mean / 1000000.0,
+        max_time=max_time,
+        deviation=stddev / 1000000.0,
+        percentiles=OrderedDict((percentile, value / 1000000.0) for percentile, value in estimates.items()),
+        loss=100.0 - received * 100.0 / count_sent if count_sent else 100.0
+    )
+
+
 def calc_deviation1(values, average):
     """
     Calculate the standard deviation of a list of values
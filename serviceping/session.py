@@ -0,0 +1,190 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Persistent connection (HTTP keep-alive) pings
+"""
+import socket
+import time
+
+from .httpreader import ConnectionClosed, read_response
+from .network import (
+    ScanFailed, _failure, _record_response, _remaining, _request_failure, _timed_connect, _tls_handshake,
+    calculate_durations, result_to_response
+)
+from .resolver import getaddresses
+
+
+class PingSession(object):
+    """
+    Ping a url over one persistent HTTP/1.1 connection
+
+    The connection is opened by the first ping and reused by the following pings, so after
+    the first ping the durations only contain the request, which is the request latency a
+    client with a warm connection sees.  When the server closes the connection it is
+    reopened by the next ping, the dns, connect and ssl durations of that ping show the cost
+    of the reconnect and the reconnect is counted.
+
+    Parameters
+    ----------
+    host : str
+        Host or ip address to ping
+
+    port : int, optional
+        Port to ping, default=80
+
+    url : str, optional
+        URL to request on the host and port, default="/"
+
+    https : bool, optional
+        Connect via ssl, default=False
+
+    timeout : float, optional
+        Number of seconds each ping, including a reconnect, can take before it times out,
+        default=1 second
+
+    max_size : int, optional
+        The max size of the response kept in the ping responses, default=65535
+
+    dns_cache : serviceping.resolver.DNSCache, optional
+        Cache to resolve the host with, the host is resolved on every connection if not provided
+
+    verify : bool, optional
+        Verify the server certificate and host name of ssl connections, default=False
+
+    tls_sessions : serviceping.tls.TLSSessionCache, optional
+        Cache of ssl sessions used to resume the ssl handshake of reconnects
+
+    keep_response : bool, optional
+        Keep the decoded response in the ping responses, default=True
+    """
+    def __init__(
+            self, host, port=80, url='/', https=False, timeout=1.0, max_size=65535, dns_cache=None, verify=False,
+            tls_sessions=None, keep_response=True
+    ):
+        self.host = host
+        self.port = int(port)
+        self.url = url or '/'
+        self.https = https
+        self.timeout = timeout
+        self.max_size = max_size
+        self.dns_cache = dns_cache
+        self.verify = verify
+        self.tls_sessions = tls_sessions
+        self.keep_response = keep_response
+        self.socket = None
+        self.ip = None
+        self.connections = 0
+        self.requests = 0
+        self._request = "GET {0} HTTP/1.1\r\nHost: {1}\r\nConnection: keep-alive\r\n\r\n".format(
+            self.url, host
+        ).encode('ascii')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def reconnects(self):
+        """
+        The number of times the connection was reopened after the first connection
+        """
+        return max(self.connections - 1, 0)
+
+    def close(self):
+        """
+        Close the connection, the next ping opens a new connection
+        """
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+
+    def _connect(self, result, starts, ends, deadline):
+        """
+        Open the connection, timing the dns lookup, connect and ssl handshake
+
+        Returns
+        -------
+        bool
+            True if the connection was opened
+        """
+        starts['dns'] = time.perf_counter_ns()
+        try:
+            addresses = self.dns_cache.resolve(self.host) if self.dns_cache is not None else getaddresses(self.host)
+        except socket.gaierror:
+            raise _failure(result, 'dns', 'DNS Lookup failed')
+        ends['dns'] = time.perf_counter_ns()
+        address = addresses[0]
+        result['ip'] = self.ip = address[1][0]
+
+        network_socket = _timed_connect(address, self.port, deadline, result, starts, ends)
+        if not network_socket:
+            return False
+
+        if self.https:
+            network_socket = _tls_handshake(
+                network_socket, self.host, self.port, self.verify, self.tls_sessions, deadline, self.timeout, result,
+                starts, ends
+            )
+        self.socket = network_socket
+        self.connections += 1
+        return True
+
+    def ping(self, sequence=0):
+        """
+        Send one request over the connection, opening the connection if it is not open
+
+        Parameters
+        ----------
+        sequence : int, optional
+            Sequence number for the ping request
+
+        Returns
+        -------
+        PingResponse:
+            The ping response object, durations_ns contains dns, connect and ssl only if the
+            connection was opened by this ping
+        """
+        starts = {}
+        ends = {}
+        result = dict(host=self.host, port=self.port, ip=self.ip, state='closed', durations_ns={}, ssl_version='', code=None)
+        if self.https and self.socket:
+            result['ssl_version'] = self.socket.version()
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        starts['all'] = time.perf_counter_ns()
+        try:
+            while True:
+                reused = self.socket is not None
+                if not reused and not self._connect(result, starts, ends, deadline):
+                    break
+                starts['request'] = time.perf_counter_ns()
+                try:
+                    self.socket.settimeout(_remaining(deadline))
+                    self.socket.sendall(self._request)
+                    response = read_response(self.socket, self.max_size, self.keep_response, deadline)
+                except (ConnectionClosed, ConnectionResetError, ConnectionAbortedError, BrokenPipeError) as error:
+                    # A reused connection may have been closed by the server while it was idle,
+                    # reconnect and send the request again.
+                    self.close()
+                    if reused:
+                        continue
+                    raise _request_failure(result, error, self.timeout)
+                except (OSError, ValueError) as error:
+                    raise _request_failure(result, error, self.timeout)
+                _record_response(result, starts, ends, response)
+                self.requests += 1
+                result['state'] = 'open'
+                if self.https and self.tls_sessions is not None:
+                    self.tls_sessions.store(self.host, self.port, self.socket.session, self.verify, self.socket.context)
+                if not response.keep_alive:
+                    self.close()
+                break
+        except ScanFailed as failure:
+            self.close()
+            result['error'] = True
+            result['error_message'] = str(failure)
+        ends['all'] = time.perf_counter_ns()
+        calculate_durations(result, starts, ends)
+        return result_to_response(result, host=self.host, port=self.port, sequence=sequence)
@@ -0,0 +1,294 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Multi-process sharded scans
+
+A single process is limited by the cpu time of the ssl handshakes and response parsing long
+before the network is saturated.  The sharded scanner splits the targets across worker
+processes, each worker pings its shard with an asyncio event loop and streams the results
+back to the parent as packed binary records over a pipe, along with a StatsList of its ping
+times that the parent merges into the summary of the whole scan.
+"""
+import asyncio
+import multiprocessing
+import os
+import socket
+import struct
+from itertools import islice
+from multiprocessing.connection import wait
+
+from .aio import async_ping
+from .network import PingResponse
+from .resolver import DNSCache
+from .results import FLAG_ERROR, FLAG_RESPONDING, FLAG_SSL_RESUMED, FLAG_TIMEOUT, PHASES, REASON_IDS, REASONS
+from .serviceping import StatsList
+
+
+# target index, flags, reason, code, length, address family, packed ip address, durations
+RECORD = struct.Struct('<IBBHIB16s%dq' % len(PHASES))
+
+
+def pack_response(index, ping_response):
+    """
+    Pack a ping response into a binary record
+
+    Parameters
+    ----------
+    index : int
+        The index of the target of the ping
+
+    ping_response : PingResponse
+        The response to pack, the host, port, response and error message are not packed
+
+    Returns
+    -------
+    bytes
+        The RECORD.size byte record
+    """
+    flags = 0
+    for name, flag in (('responding', FLAG_RESPONDING), ('error', FLAG_ERROR), ('timeout', FLAG_TIMEOUT),
+                       ('ssl_resumed', FLAG_SSL_RESUMED)):
+        if getattr(ping_response, name):
+            flags |= flag
+    family, ip = 0, b''
+    if ping_response.ip:
+        family = socket.AF_INET6 if ':' in ping_response.ip else socket.AF_INET
+        ip = socket.inet_pton(family, ping_response.ip)
+    durations_ns = ping_response.durations_ns or {}
+    return RECORD.pack(
+        index, flags, REASON_IDS.get(ping_response.reason, REASON_IDS['error']), ping_response.code or 0,
+        ping_response.length or 0, family, ip, *[durations_ns.get(phase, -1) for phase in PHASES]
+    )
+
+
+def unpack_response(record, targets, offset=0):
+    """
+    Unpack a binary record into a ping response
+
+    Parameters
+    ----------
+    record : bytes
+        The buffer the record is in
+
+    targets : list
+        The (host, port) of each target, used to fill in the host and port of the response
+
+    offset : int, optional
+        The offset of the record in the buffer, default=0
+
+    Returns
+    -------
+    PingResponse
+        The ping response, the sequence is the index of the target
+    """
+    index, flags, reason, code, length, family, ip, *durations = RECORD.unpack_from(record, offset)
+    host, port = targets[index][:2]
+    durations_ns = {phase: duration for phase, duration in zip(PHASES, durations) if duration >= 0}
+    if family:
+        ip = socket.inet_ntop(family, ip[:4] if family == socket.AF_INET else ip)
+    return PingResponse(
+        host=host, port=port, ip=ip if family else None,
+        sequence=index, responding=bool(flags & FLAG_RESPONDING), error=bool(flags & FLAG_ERROR),
+        timeout=bool(flags & FLAG_TIMEOUT), ssl_resumed=bool(flags & FLAG_SSL_RESUMED), reason=REASONS[reason],
+        state='open' if flags & FLAG_RESPONDING else 'closed', code=code or None, length=length,
+        durations_ns=durations_ns
+    )
+
+
+async def _ping_shard(shard, connection, concurrency, batch_size, kwargs):
+    """
+    Ping the targets of a shard, sending the packed results to the parent in batches
+
+    At most concurrency pings are in flight, the next targets are taken from the shard as
+    the pings finish, so the memory used does not grow with the size of the shard.
+
+    Returns
+    -------
+    StatsList
+        The ping times of the responding targets in milliseconds
+    """
+    stats = StatsList()
+    dns_cache = DNSCache()
+    batch = bytearray()
+    targets = iter(shard)
+    in_flight = set()
+
+    async def ping_target(index, host, port):
+        return index, await async_ping(host, port=port, dns_cache=dns_cache, keep_response=False, **kwargs)
+
+    while True:
+        for index, host, port in islice(targets, max(concurrency, 1) - len(in_flight)):
+            in_flight.add(asyncio.ensure_future(ping_target(index, host, port)))
+        if not in_flight:
+            break
+        done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            index, ping_response = task.result()
+            if ping_response.responding:
+                stats.append(ping_response.durations_ns['all'] / 1000000.0)
+            batch += pack_response(index, ping_response)
+        if len(batch) >= batch_size * RECORD.size:
+            connection.send_bytes(batch)
+            batch.clear()
+    if batch:
+        connection.send_bytes(batch)
+    return stats
+
+
+def _shard_worker(shard, connection, concurrency, batch_size, kwargs):
+    """
+    Worker process main, pings a shard and sends an empty message followed by its StatsList
+    """
+    try:
+        stats = asyncio.run(_ping_shard(shard, connection, concurrency, batch_size, kwargs))
+        connection.send_bytes(b'')
+        connection.send(stats)
+    finally:
+        connection.close()
+
+
+class ShardedScanner(object):
+    """
+    Ping a large number of targets from multiple worker processes
+
+    The targets are split round robin into one shard per process, so each worker gets an
+    even mix of the targets, and each worker pings up to concurrency targets of its shard at
+    once.  The workers only send back packed binary records, so the host, port, response and
+    error message of the ping responses are not available in the responses, the host and
+    port are filled in from the targets.  If a worker process fails, the targets of its shard
+    that it did not report get an error response with the exit code of the worker as the
+    error message.
+
+    Parameters
+    ----------
+    processes : int, optional
+        Number of worker processes, default is the number of cpus
+
+    concurrency : int, optional
+        Number of pings each worker has in flight at once, default=100
+
+    batch_size : int, optional
+        Number of records a worker sends to the parent at once, default=256
+
+    **kwargs
+        serviceping.aio.async_ping() keyword arguments used for every ping, such as url, https,
+        timeout and verify
+
+    Attributes
+    ----------
+    stats : StatsList
+        The ping times of all the responding targets in milliseconds, merged from the
+        statistics of the workers as they finish
+
+    count_sent : int
+        The number of targets pinged
+
+    count_received : int
+        The number of targets that responded
+    """
+    def __init__(self, processes=None, concurrency=100, batch_size=256, **kwargs):
+        self.processes = processes or os.cpu_count() or 1
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.kwargs = kwargs
+        self.stats = StatsList()
+        self.count_sent = 0
+        self.count_received = 0
+
+    def scan(self, targets):
+        """
+        Ping the targets
+
+        Parameters
+        ----------
+        targets : iterable of tuple
+            The (host, port) of each target
+
+        Yields
+        ------
+        PingResponse
+            The response of each target as the workers report them, the sequence is the
+            index of the target
+        """
+        targets = [(host, int(port)) for host, port in targets]
+        shards = [[] for _ in range(min(self.processes, len(targets)))]
+        for index, (host, port) in enumerate(targets):
+            shards[index % len(shards)].append((index, host, port))
+        workers = {}
+        unfinished = {}
+        for shard in shards:
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            worker = multiprocessing.Process(
+                target=_shard_worker, args=(shard, sender, self.concurrency, self.batch_size, self.kwargs),
+                daemon=True
+            )
+            worker.start()
+            sender.close()
+            workers[receiver] = worker
+            unfinished[receiver] = {index for index, _, _ in shard}
+        try:
+            while workers:
+                for receiver in wait(list(workers)):
+                    try:
+                        batch = receiver.recv_bytes()
+                    except EOFError:
+                        batch = None
+                    if batch:
+                        for offset in range(0, len(batch), RECORD.size):
+                            ping_response = unpack_response(batch, targets, offset)
+                            unfinished[receiver].discard(ping_response.sequence)
+                            self.count_sent += 1
+                            self.count_received += ping_response.responding
+                            yield ping_response
+                        continue
+                    if batch is not None:
+                        try:
+                            self.stats.merge(receiver.recv())
+                        except EOFError:
+                            pass
+                    receiver.close()
+                    worker = workers.pop(receiver)
+                    worker.join()
+                    # A worker that died reports the targets it did not finish as errors
+                    for index in sorted(unfinished.pop(receiver)):
+                        host, port = targets[index]
+                        self.count_sent += 1
+                        yield PingResponse(
+                            host=host, port=port, sequence=index, error=True, reason='error', state='closed',
+                            error_message='Shard worker failed with exit code %s' % worker.exitcode
+                        )
+        finally:
+            for receiver, worker in workers.items():
+                receiver.close()
+                worker.terminate()
+                worker.join()
+
+
+def sharded_scan(targets, processes=None, concurrency=100, **kwargs):
+    """
+    Ping the targets from multiple worker processes
+
+    Parameters
+    ----------
+    targets : iterable of tuple
+        The (host, port) of each target
+
+    processes : int, optional
+        Number of worker processes, default is the number of cpus
+
+    concurrency : int, optional
+        Number of pings each worker has in flight at once, default=100
+
+    **kwargs
+        serviceping.aio.async_ping() keyword arguments used for every ping
+
+    Returns
+    -------
+    tuple
+        A list of the responses in the order of the targets, and the merged StatsList of the
+        ping times of the responding targets in milliseconds
+    """
+    scanner = ShardedScanner(processes=processes, concurrency=concurrency, **kwargs)
+    responses = sorted(scanner.scan(targets), key=lambda ping_response: ping_response.sequence)
+    return responses, scanner.stats
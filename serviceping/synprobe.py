@@ -0,0 +1,343 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Half-open (SYN) port probes
+
+A SYN probe sends only the first packet of the TCP handshake from a raw socket and reads the
+reply of the target, a SYN-ACK for an open port or a RST for a closed port.  The kernel
+answers the SYN-ACK with a RST because it has no connection for it, so the target never
+accepts a connection and no file descriptor is used for each probe, which makes it possible
+to probe a very large number of ports quickly.
+
+Raw sockets need root or the CAP_NET_RAW capability, use :func:`available` to check.  Only
+IPv4 addresses are supported.
+"""
+import os
+import selectors
+import socket
+import struct
+import time
+import zlib
+from collections import deque
+
+from .network import PingResponse
+from .resolver import getaddresses
+
+
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+# Maximum segment size option, some stacks drop SYNs without one
+_MSS_OPTION = b'\x02\x04\x05\xb4'
+
+
+def available():
+    """
+    Check if SYN probes can be sent
+
+    Returns
+    -------
+    bool
+        True if this process can open a raw socket
+    """
+    try:
+        socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP).close()
+    except (PermissionError, OSError):
+        return False
+    return True
+
+
+def checksum(data):
+    """
+    Calculate the internet checksum (RFC 1071) of data
+
+    Parameters
+    ----------
+    data : bytes
+        The data to checksum
+
+    Returns
+    -------
+    int
+        The 16 bit ones' complement checksum
+    """
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+def syn_packet(source_ip, destination_ip, source_port, destination_port, sequence):
+    """
+    Build the TCP header of a SYN segment
+
+    Parameters
+    ----------
+    source_ip : bytes
+        The packed IPv4 source address, used for the checksum
+
+    destination_ip : bytes
+        The packed IPv4 destination address, used for the checksum
+
+    source_port : int
+        The source port
+
+    destination_port : int
+        The destination port
+
+    sequence : int
+        The initial sequence number
+
+    Returns
+    -------
+    bytes
+        The TCP segment, the IP header is added by the kernel
+    """
+    header = struct.pack(
+        '!HHIIBBHHH', source_port, destination_port, sequence, 0, 6 << 4, TCP_SYN, 65535, 0, 0
+    ) + _MSS_OPTION
+    pseudo_header = struct.pack('!4s4sBBH', source_ip, destination_ip, 0, socket.IPPROTO_TCP, len(header))
+    return header[:16] + struct.pack('!H', checksum(pseudo_header + header)) + header[18:]
+
+
+def _source_ip(destination_ip):
+    """
+    Get the packed local address the kernel uses to reach a destination
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp_socket:
+        udp_socket.connect((destination_ip, 9))
+        return socket.inet_aton(udp_socket.getsockname()[0])
+
+
+class SynProber(object):
+    """
+    Send SYN probes to many ports from one raw socket
+
+    The probes use one source port, which is reserved with an unconnected socket so no other
+    connection of this host uses it, and each probe gets a sequence number derived from its
+    target and a random secret.  Replies are matched to the probes from the acknowledgement
+    number, which is the sequence number of the probe plus one for both SYN-ACK and RST
+    replies.
+
+    Parameters
+    ----------
+    timeout : float, optional
+        Number of seconds to wait for the reply to each probe, default=1
+
+    rate : float, optional
+        Maximum number of probes sent per second, default is to send as fast as possible
+
+    dns_cache : serviceping.resolver.DNSCache, optional
+        Cache to resolve the hosts with, the hosts are resolved on every probe if not provided
+
+    Raises
+    ------
+    PermissionError - The process is not allowed to open a raw socket
+    """
+    def __init__(self, timeout=1.0, rate=None, dns_cache=None):
+        self.timeout = timeout
+        self.rate = rate
+        self.dns_cache = dns_cache
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+        self.socket.setblocking(False)
+        self._reserved = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._reserved.bind(('', 0))
+        self.source_port = self._reserved.getsockname()[1]
+        self._secret = os.urandom(4)
+        self._buffer = bytearray(65535)
+        self._source_ips = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close the raw socket and release the source port
+        """
+        self.socket.close()
+        self._reserved.close()
+
+    def _sequence(self, ip, port, index):
+        return zlib.crc32(struct.pack('!4sHI', ip, port, index) + self._secret)
+
+    def _resolve(self, host):
+        """
+        Resolve a host to its first IPv4 address, None if it has no IPv4 address
+        """
+        addresses = self.dns_cache.resolve(host) if self.dns_cache is not None else getaddresses(host)
+        for family, sockaddr in addresses:
+            if family == socket.AF_INET:
+                return sockaddr[0]
+        return None
+
+    def probe(self, targets):
+        """
+        Probe the targets
+
+        All the probes are sent before waiting for the replies, limited to rate probes per
+        second, and replies are read as the probes are sent.
+
+        Parameters
+        ----------
+        targets : iterable of tuple
+            The (host, port) of each target
+
+        Returns
+        -------
+        list of PingResponse
+            The response of each target in the order of the targets, the sequence of each
+            response is the index of its target.  The state is "open" for targets that sent a
+            SYN-ACK, and "closed" with a reason of "refused" for targets that sent a RST or
+            "timeout" for targets that did not reply.  The durations_ns contain the dns
+            lookup and the round trip time of the probe as connect.
+        """
+        responses = []
+        to_send = []
+        for index, (host, port) in enumerate(targets):
+            port = int(port)
+            response = PingResponse(host=host, port=port, sequence=index, state='closed')
+            responses.append(response)
+            dns_start = time.perf_counter_ns()
+            try:
+                ip = self._resolve(host)
+            except socket.gaierror:
+                ip = None
+                response.error_message = 'DNS Lookup failed'
+            if ip is None:
+                response.error = True
+                response.reason = 'dns'
+                response.error_message = response.error_message or 'No IPv4 address'
+                response.stop_timer()
+                continue
+            response.ip = ip
+            response.durations_ns = {'dns': time.perf_counter_ns() - dns_start}
+            to_send.append(response)
+        self._run(to_send)
+        return responses
+
+    def _run(self, to_send):
+        """
+        Send the probes of the responses and match the replies until every probe is answered
+        or timed out
+        """
+        pending = {}
+        interval = 1.0 / self.rate if self.rate else 0
+        next_send = time.monotonic()
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.socket, selectors.EVENT_READ)
+            queue = iter(to_send)
+            response = next(queue, None)
+            expiries = deque()
+            while response is not None or pending:
+                now = time.monotonic()
+                while response is not None and now >= next_send:
+                    key = self._send(response)
+                    pending[key] = response
+                    expiries.append((now + self.timeout, key))
+                    next_send += interval
+                    response = next(queue, None)
+                self._expire(pending, expiries, now)
+                if response is None and not pending:
+                    break
+                wait = expiries[0][0] - now if expiries else self.timeout
+                if response is not None:
+                    wait = min(wait, next_send - now)
+                if selector.select(max(wait, 0)):
+                    self._receive(pending)
+
+    def _send(self, response):
+        ip = socket.inet_aton(response.ip)
+        source_ip = self._source_ips.get(ip)
+        if source_ip is None:
+            source_ip = self._source_ips[ip] = _source_ip(response.ip)
+        sequence = self._sequence(ip, response.port, response.sequence)
+        packet = syn_packet(source_ip, ip, self.source_port, response.port, sequence)
+        response.start_timer()
+        self.socket.sendto(packet, (response.ip, 0))
+        return ip, response.port, sequence
+
+    def _expire(self, pending, expiries, now):
+        while expiries and expiries[0][0] <= now:
+            response = pending.pop(expiries.popleft()[1], None)
+            if response is not None:
+                self._finish(response, 'closed', 'timeout')
+
+    def _receive(self, pending):
+        """
+        Read the available packets from the raw socket and finish the probes they reply to
+        """
+        view = memoryview(self._buffer)
+        while True:
+            try:
+                size = self.socket.recv_into(view)
+            except (BlockingIOError, InterruptedError):
+                return
+            header_length = (view[0] & 0x0f) * 4
+            if size < header_length + 20:
+                continue
+            source_port, destination_port, _, acknowledgement, _, flags = struct.unpack_from(
+                '!HHIIBB', view, header_length
+            )
+            if destination_port != self.source_port or not flags & (TCP_RST | TCP_ACK):
+                continue
+            key = (bytes(view[12:16]), source_port, (acknowledgement - 1) & 0xffffffff)
+            response = pending.pop(key, None)
+            if response is None:
+                continue
+            if flags & TCP_SYN:
+                self._finish(response, 'open', None)
+            elif flags & TCP_RST:
+                self._finish(response, 'closed', 'refused')
+
+    @staticmethod
+    def _finish(response, state, reason):
+        response.stop_timer()
+        response.state = state
+        response.reason = reason
+        response.responding = state == 'open'
+        response.timeout = reason == 'timeout'
+        response.durations_ns['connect'] = response.duration_ns
+        response.durations_ns['all'] = response.durations_ns['dns'] + response.duration_ns
+
+
+def syn_ping(host, port=80, timeout=1.0, sequence=0, dns_cache=None):
+    """
+    Ping a port of a host with a single SYN probe
+
+    Parameters
+    ----------
+    host: str
+        The host or IPv4 address to ping
+
+    port: int, optional
+        The port to ping, default=80
+
+    timeout: float, optional
+        Number of seconds to wait for a reply, default=1 second
+
+    sequence: int, optional
+        Sequence number for the ping request
+
+    dns_cache: serviceping.resolver.DNSCache, optional
+        Cache to resolve the host with, the host is resolved on every ping if not provided
+
+    Returns
+    -------
+    PingResponse:
+        The ping response object, see SynProber.probe()
+
+    Raises
+    ------
+    PermissionError - The process is not allowed to open a raw socket
+    """
+    with SynProber(timeout=timeout, dns_cache=dns_cache) as prober:
+        response = prober.probe([(host, port)])[0]
+    response.sequence = sequence
+    return response
@@ -0,0 +1,154 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+SSL context and session caching
+"""
+import ssl
+import threading
+from collections import OrderedDict
+
+
+CONTEXT_CACHE_SIZE = 256
+
+_contexts = OrderedDict()
+_contexts_lock = threading.Lock()
+
+
+def get_context(host, verify=False):
+    """
+    Get the cached client ssl context for a host
+
+    Creating a context is expensive, so a context is created once for each host and
+    verify setting and reused by every ssl connection to the host.
+
+    Parameters
+    ----------
+    host : str
+        The host name the context is used to connect to
+
+    verify : bool, optional
+        Verify the server certificate and host name, default=False
+
+    Returns
+    -------
+    ssl.SSLContext
+        The client ssl context
+    """
+    key = (host, verify)
+    with _contexts_lock:
+        try:
+            _contexts.move_to_end(key)
+            return _contexts[key]
+        except KeyError:
+            pass
+    if verify:
+        context = ssl.create_default_context()
+    else:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE  # nosec
+    with _contexts_lock:
+        context = _contexts.setdefault(key, context)
+        while len(_contexts) > CONTEXT_CACHE_SIZE:
+            _contexts.popitem(last=False)
+    return context
+
+
+class TLSSessionCache(object):
+    """
+    A bounded cache of ssl sessions used to resume the handshake of later connections
+
+    A session can only be resumed with the ssl context that created it, so the sessions are
+    cached by host, port and verify setting along with their context, and a session is only
+    returned for the context it was created with.  Sessions of a context that has since been
+    dropped from the context cache are discarded.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        Maximum number of (host, port, verify) sessions to cache, default=1024
+    """
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def clear(self):
+        """
+        Remove all the cached sessions
+        """
+        with self._lock:
+            self._sessions.clear()
+
+    def get(self, host, port, verify=False, context=None):
+        """
+        Get the cached session for a host and port
+
+        Parameters
+        ----------
+        host : str
+            The host name of the connection
+
+        port : int
+            The port of the connection
+
+        verify : bool, optional
+            The verify setting of the connection, default=False
+
+        context : ssl.SSLContext, optional
+            The context the connection is made with, default is get_context(host, verify)
+
+        Returns
+        -------
+        ssl.SSLSession
+            The cached session or None if there is no session for the host and port that was
+            created with the context
+        """
+        if context is None:
+            context = get_context(host, verify)
+        key = (host, port, verify)
+        with self._lock:
+            entry = self._sessions.get(key, None)
+            if entry is None:
+                return None
+            if entry[0] is not context:
+                del self._sessions[key]
+                return None
+            self._sessions.move_to_end(key)
+            return entry[1]
+
+    def store(self, host, port, session, verify=False, context=None):
+        """
+        Cache the session of a connection to a host and port
+
+        Parameters
+        ----------
+        host : str
+            The host name of the connection
+
+        port : int
+            The port of the connection
+
+        session : ssl.SSLSession
+            The session of the connection, nothing is cached if it is None
+
+        verify : bool, optional
+            The verify setting of the connection, default=False
+
+        context : ssl.SSLContext, optional
+            The context of the connection, default is get_context(host, verify)
+        """
+        if not session:
+            return
+        if context is None:
+            context = get_context(host, verify)
+        key = (host, port, verify)
+        with self._lock:
+            self._sessions[key] = (context, session)
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
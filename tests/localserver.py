@@ -0,0 +1,136 @@
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+Loopback servers used by the tests so they do not depend on external hosts
+"""
+import os
+import socket
+import ssl
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+CERTFILE = os.path.join(os.path.dirname(__file__), 'keycert.pem')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    body = b'serviceping test response\n'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class KeepAliveHandler(_Handler):
+    """
+    Handler that keeps the connection open between requests
+    """
+    protocol_version = 'HTTP/1.1'
+
+
+class IdleCloseHandler(KeepAliveHandler):
+    """
+    Handler that advertises HTTP/1.1 but closes the connection after each response, like a
+    server closing an idle keep-alive connection
+    """
+    def do_GET(self):  # pylint: disable=invalid-name
+        super().do_GET()
+        self.close_connection = True
+
+
+class ChunkedHandler(KeepAliveHandler):
+    """
+    Handler that sends a large response with the chunked transfer encoding
+    """
+    chunks = [b'x' * 1000] * 300
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.send_response(200)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in self.chunks:
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class LocalHTTPServer(object):
+    """
+    Context manager running a http server on a random loopback port
+    """
+    def __init__(self, handler=_Handler):
+        self.server = _Server(('127.0.0.1', 0), handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def wrap_ssl(self):
+        """
+        Serve https using the test certificate
+        """
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(CERTFILE)
+        self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        return self
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SilentServer(object):
+    """
+    Context manager listening on a random loopback port that never accepts or answers
+
+    Connections are completed by the kernel until the listen backlog is full, after that new
+    connections are not answered at all, like a host behind a firewall that drops packets.
+    """
+    def __init__(self, backlog=8):
+        self.backlog = backlog
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.bind(('127.0.0.1', 0))
+        self.port = self.socket.getsockname()[1]
+        self.clients = []
+
+    def fill(self):
+        """
+        Fill the listen backlog so the next connection is dropped
+        """
+        for _ in range(self.backlog + 2):
+            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            client.setblocking(False)
+            client.connect_ex(('127.0.0.1', self.port))
+            self.clients.append(client)
+        return self
+
+    def __enter__(self):
+        self.socket.listen(self.backlog)
+        return self
+
+    def __exit__(self, *args):
+        for client in self.clients:
+            client.close()
+        self.socket.close()
+
+
+def unused_port():
+    """
+    Get a loopback port number that nothing is listening on
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping asyncio scan
+"""
+import asyncio
+import gc
+import socket
+import time
+import unittest
+import warnings
+from serviceping.aio import async_scan, async_ping
+from serviceping.network import ScanFailed, PingResponse
+from serviceping.resolver import DNSCache
+from .localserver import LocalHTTPServer, SilentServer, unused_port
+
+
+class TestServicepingAsyncScan(unittest.TestCase):
+
+    def test_async_scan_invalid_hostname(self):
+        with self.assertRaises(ScanFailed):
+            asyncio.run(async_scan('pythonpython.python'))
+
+    def test_async_scan_closed(self):
+        port = unused_port()
+        result = asyncio.run(async_scan('localhost', port=port))
+        self.assertEqual(result['state'], 'closed')
+        self.assertEqual(result['host'], 'localhost')
+        self.assertEqual(result['port'], port)
+        self.assertEqual(result['reason'], 'refused')
+
+    def test_async_scan_request_timeout(self):
+        with SilentServer() as server:
+            with self.assertRaises(ScanFailed) as context:
+                asyncio.run(async_scan('127.0.0.1', port=server.port, url='/', timeout=0.3))
+        self.assertEqual(context.exception.result['reason'], 'timeout')
+
+    def test_async_scan_dns_timeout(self):
+        def slow_resolver(host):
+            time.sleep(0.6)
+            return [(socket.AF_INET, ('127.0.0.1', 0))]
+
+        result = asyncio.run(async_scan('slow.example', port=unused_port(), timeout=0.2, dns_cache=DNSCache(resolver=slow_resolver)))
+        self.assertEqual(result['state'], 'closed')
+        self.assertEqual(result['reason'], 'timeout')
+        self.assertNotIn('dns', result['durations_ns'])
+        self.assertLess(result['durations_ns']['all'], 500000000)
+
+    def test_async_scan_deadline_passed(self):
+        dns_cache = DNSCache(resolver=lambda host: [(socket.AF_INET, ('127.0.0.1', 0))])
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            result = asyncio.run(async_scan('localhost', port=unused_port(), timeout=0, dns_cache=dns_cache))
+            gc.collect()
+        self.assertEqual(result['reason'], 'timeout')
+        self.assertEqual([str(warning.message) for warning in caught if 'never awaited' in str(warning.message)], [])
+
+    def test_async_scan_ssl_error(self):
+        with LocalHTTPServer() as server:
+            with self.assertRaises(ScanFailed) as context:
+                asyncio.run(async_scan('localhost', port=server.port, https=True))
+        self.assertEqual(context.exception.result['reason'], 'ssl_error')
+
+    def test_async_scan_open(self):
+        with LocalHTTPServer() as server:
+            result = asyncio.run(async_scan('127.0.0.1', port=server.port))
+        self.assertEqual(result['state'], 'open')
+        self.assertEqual(list(result['durations_ns'].keys()), ['all', 'dns', 'connect'])
+        self.assertEqual(list(result['durations'].keys()), ['all', 'dns', 'connect'])
+
+    def test_async_scan_open_url(self):
+        with LocalHTTPServer() as server:
+            result = asyncio.run(async_scan('127.0.0.1', port=server.port, url='/'))
+        self.assertEqual(result['state'], 'open')
+        self.assertEqual(result['code'], 200)
+        self.assertIn('request', result['durations_ns'])
+
+    def test_async_scan_open_https_url(self):
+        with LocalHTTPServer().wrap_ssl() as server:
+            result = asyncio.run(async_scan('localhost', port=server.port, url='/', https=True))
+        self.assertEqual(result['state'], 'open')
+        self.assertEqual(result['code'], 200)
+        self.assertTrue(result['ssl_version'].startswith('TLS'))
+
+    def test_async_ping_closed(self):
+        result = asyncio.run(async_ping('localhost', port=unused_port(), sequence=3))
+        self.assertIsInstance(result, PingResponse)
+        self.assertFalse(result.responding)
+        self.assertEqual(result.sequence, 3)
+
+    def test_async_ping_many_in_flight(self):
+        async def ping_all(port):
+            return await asyncio.gather(*[
+                async_ping('127.0.0.1', port=port, url='/', sequence=sequence) for sequence in range(20)
+            ])
+
+        with LocalHTTPServer() as server:
+            results = asyncio.run(ping_all(server.port))
+        self.assertEqual([result.sequence for result in results], list(range(20)))
+        self.assertTrue(all(result.responding and result.code == 200 for result in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,18 @@
+from contextlib import redirect_stderr, redirect_stdout
 from datetime import datetime, timedelta
+import csv
+import io
+import json
+import os
 import sys
-from serviceping.cli import exit_statistics, main
+import tempfile
+import time
+from serviceping.cli import PingStatistics, exit_statistics, main
+from serviceping.network import PingResponse
+from serviceping.recording import Recording
+from serviceping.serviceping import batch_statistics
 from unittest import TestCase
+from .localserver import KeepAliveHandler, LocalHTTPServer, SilentServer
 
 
 class TestCLI(TestCase):
@@ -21,6 +32,16 @@ class TestCLI(TestCase):
             max_time=timedelta(seconds=2.0), deviation=1.2
         )
 
+    def test__exit_statistics__nanoseconds(self):
+        with redirect_stdout(io.StringIO()) as output:
+            exit_statistics(
+                hostname='localhost', start_time=time.perf_counter_ns(),
+                count_sent=2, count_received=2,
+                min_time=250000, avg_time=0.5,
+                max_time=750000, deviation=0.25
+            )
+        self.assertIn('rtt min/avg/max/dev = 0.25/0.50/0.75/0.25 ms', output.getvalue())
+
     def test__main(self):
         sys.argv = ['serviceping', '-c', '2', 'yahoo.com']
         main()
@@ -49,3 +70,158 @@ class TestCLI(TestCase):
     def test__main__https__url__timings__port(self):
         sys.argv = ['serviceping', '-c', '1', '-d', '1', 'https://yahoo.com:4443/index.html']
         main()
+
+    def test__main__multiple_destinations(self):
+        with LocalHTTPServer() as server:
+            sys.argv = [
+                'serviceping', '-c', '2', '-i', '0', '--concurrency', '2',
+                f'http://127.0.0.1:{server.port}/', f'127.0.0.1:{server.port}', 'pythonpython.python'
+            ]
+            with redirect_stdout(io.StringIO()) as output:
+                rc = main()
+        self.assertEqual(rc, 1)
+        self.assertIn(f'--- 127.0.0.1:{server.port} ping statistics ---', output.getvalue())
+        self.assertEqual(output.getvalue().count('seq=1'), 2)
+        self.assertEqual(output.getvalue().count('2 packets transmitted, 2 received'), 2)
+
+    def test__main__multiple_destinations__invalid(self):
+        with LocalHTTPServer() as server:
+            sys.argv = ['serviceping', '-c', '1', '-i', '0', '127.0.0.1:abc', f'127.0.0.1:{server.port}']
+            with redirect_stdout(io.StringIO()) as output, redirect_stderr(io.StringIO()) as error:
+                rc = main()
+        self.assertEqual(rc, 1)
+        self.assertIn('serviceping: invalid destination 127.0.0.1:abc', error.getvalue())
+        self.assertIn(f'--- 127.0.0.1:{server.port} ping statistics ---', output.getvalue())
+        self.assertIn('1 packets transmitted, 1 received', output.getvalue())
+
+    def test__main__target_file(self):
+        with LocalHTTPServer() as server, tempfile.NamedTemporaryFile('w', suffix='.txt') as target_file:
+            target_file.write(f'# targets\nhttp://127.0.0.1:{server.port}/\n\n' + f'127.0.0.1:{server.port}\n' * 5)
+            target_file.flush()
+            sys.argv = ['serviceping', '-f', target_file.name, '--concurrency', '2']
+            with redirect_stdout(io.StringIO()) as output:
+                rc = main()
+        self.assertEqual(rc, 0)
+        self.assertEqual(output.getvalue().count(f'from 127.0.0.1:{server.port}'), 6)
+        self.assertIn('--- 6 destinations ping statistics ---', output.getvalue())
+        self.assertIn('6 packets transmitted, 6 received', output.getvalue())
+
+    def test_exit_statistics_batch_statistics(self):
+        statistics = batch_statistics([1000000, 3000000, -1, -1])
+        with redirect_stdout(io.StringIO()) as output:
+            exit_statistics(hostname='recorded', start_time=time.perf_counter_ns(), **statistics)
+        self.assertIn('4 packets transmitted, 2 received, 50.0% packet loss', output.getvalue())
+        self.assertIn('rtt min/avg/max/dev = 1.00/2.00/3.00/1.41 ms', output.getvalue())
+
+    def test__main__keep_alive(self):
+        with LocalHTTPServer(KeepAliveHandler) as server:
+            sys.argv = ['serviceping', '-c', '3', '-i', '0', '-d', '--keep-alive', f'http://127.0.0.1:{server.port}/']
+            with redirect_stdout(io.StringIO()) as output:
+                rc = main()
+        self.assertEqual(rc, 0)
+        self.assertEqual(output.getvalue().count('connect='), 1)
+        self.assertIn('keep-alive 3 requests, 1 connections, 0 reconnects', output.getvalue())
+
+    def test__main__window(self):
+        with LocalHTTPServer() as server:
+            sys.argv = ['serviceping', '-c', '3', '-i', '0', '--window', '2', f'127.0.0.1:{server.port}']
+            with redirect_stdout(io.StringIO()) as output:
+                rc = main()
+        self.assertEqual(rc, 0)
+        self.assertIn('3 packets transmitted, 3 received', output.getvalue())
+        self.assertIn('rtt p50/p90/p99/p99.9', output.getvalue())
+
+    def test__main__interval_schedule(self):
+        with LocalHTTPServer() as server:
+            sys.argv = ['serviceping', '-c', '4', '-i', '0.05', '--jitter', '0.1', f'127.0.0.1:{server.port}']
+            started = time.monotonic()
+            with redirect_stdout(io.StringIO()) as output:
+                rc = main()
+        self.assertEqual(rc, 0)
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertNotIn('missed intervals', output.getvalue())
+
+    def test__main__rate(self):
+        with LocalHTTPServer() as server:
+            sys.argv = ['serviceping', '-c', '3', '-i', '0', '--rate', '20', f'127.0.0.1:{server.port}']
+            started = time.monotonic()
+            with redirect_stdout(io.StringIO()):
+                main()
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+    def test__main__missed_intervals(self):
+        with SilentServer() as server:
+            sys.argv = ['serviceping', '-c', '3', '-i', '0.02', '-W', '0.1', f'http://127.0.0.1:{server.port}/']
+            with redirect_stdout(io.StringIO()) as output:
+                rc = main()
+        self.assertEqual(rc, 1)
+        self.assertIn('missed intervals, pings took longer than the 0.02s interval', output.getvalue())
+
+    def test__main__exporter(self):
+        with LocalHTTPServer() as server:
+            sys.argv = ['serviceping', '-c', '1', '--exporter', '127.0.0.1:0', f'127.0.0.1:{server.port}']
+            with redirect_stdout(io.StringIO()) as output:
+                rc = main()
+        self.assertEqual(rc, 0)
+        self.assertIn('SERVICEPING exporter serving 1 destinations on http://127.0.0.1:', output.getvalue())
+
+    def test__main__format_jsonl(self):
+        stdout = io.TextIOWrapper(io.BytesIO())
+        with LocalHTTPServer() as server:
+            sys.argv = ['serviceping', '-c', '2', '-i', '0', '--format', 'jsonl', f'http://127.0.0.1:{server.port}/']
+            with redirect_stdout(stdout), redirect_stderr(io.StringIO()) as errors:
+                rc = main()
+        self.assertEqual(rc, 0)
+        records = [json.loads(line) for line in stdout.buffer.getvalue().splitlines()]
+        self.assertEqual([record['sequence'] for record in records], [0, 1])
+        self.assertEqual(records[0]['code'], 200)
+        self.assertIsInstance(records[0]['durations_ns']['request'], int)
+        self.assertIn('HTTP/1.0 200', records[0]['response'])
+        self.assertIn('2 packets transmitted, 2 received', errors.getvalue())
+
+    def test__main__format_csv_no_response_body(self):
+        stdout = io.TextIOWrapper(io.BytesIO())
+        with LocalHTTPServer() as server:
+            sys.argv = [
+                'serviceping', '-c', '1', '--format', 'csv', '--no-response-body', f'http://127.0.0.1:{server.port}/'
+            ]
+            with redirect_stdout(stdout), redirect_stderr(io.StringIO()):
+                main()
+        rows = list(csv.DictReader(io.StringIO(stdout.buffer.getvalue().decode('utf-8'))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['code'], '200')
+        self.assertNotIn('response', rows[0])
+
+    def test__main__record(self):
+        with LocalHTTPServer() as server, tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'pings.rec')
+            for _ in range(2):
+                sys.argv = ['serviceping', '-c', '2', '-i', '0', '--record', path, f'127.0.0.1:{server.port}']
+                with redirect_stdout(io.StringIO()) as output:
+                    main()
+                self.assertIn('2 packets transmitted, 2 received', output.getvalue())
+            with Recording(path) as pings:
+                self.assertEqual(len(pings), 4)
+                self.assertEqual(pings.targets, [('127.0.0.1', server.port)])
+                self.assertEqual(pings.statistics()['count_received'], 4)
+
+    def test__main__record_invalid_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.rec') as record_file:
+            record_file.write('not a recording')
+            record_file.flush()
+            sys.argv = ['serviceping', '-c', '1', '--record', record_file.name, '127.0.0.1:1']
+            with redirect_stderr(io.StringIO()) as errors:
+                self.assertEqual(main(), 1)
+        self.assertIn('can not record', errors.getvalue())
+
+    def test_PingStatistics_window(self):
+        statistics = PingStatistics(window=2)
+        for duration in [1000000, 2000000, 6000000]:
+            statistics.update(PingResponse(responding=True, durations_ns={'all': duration}))
+        statistics.update(PingResponse(responding=False))
+        self.assertEqual(statistics.count_sent, 4)
+        self.assertEqual(statistics.count_received, 3)
+        self.assertEqual(statistics.min_time, 1000000)
+        self.assertEqual(statistics.max_time, 6000000)
+        self.assertAlmostEqual(statistics.avg_time, 4.0)
+        self.assertAlmostEqual(statistics.deviation, 2 ** 1.5)
@@ -26,6 +26,26 @@ class TestServiceping(unittest.TestCase):
         self.assertEqual(args[0], 'yahoo.com')
         self.assertEqual(options.count, 0)
 
+    def test_parse_destination_host(self):
+        destination = serviceping.commandline.parse_destination('yahoo.com')
+        self.assertEqual(destination, ('yahoo.com', 80, None, False))
+
+    def test_parse_destination_host_port_url(self):
+        destination = serviceping.commandline.parse_destination('yahoo.com:8080:/index.html')
+        self.assertEqual(destination, ('yahoo.com', 8080, '/index.html', False))
+
+    def test_parse_destination_https_url(self):
+        destination = serviceping.commandline.parse_destination('https://yahoo.com/')
+        self.assertEqual(destination.hostname, 'yahoo.com')
+        self.assertEqual(destination.port, 443)
+        self.assertEqual(destination.url, '/')
+        self.assertTrue(destination.https)
+
+    def test_parse_listen_address(self):
+        self.assertEqual(serviceping.commandline.parse_listen_address('9115'), ('127.0.0.1', 9115))
+        self.assertEqual(serviceping.commandline.parse_listen_address('0.0.0.0:9115'), ('0.0.0.0', 9115))
+        self.assertEqual(serviceping.commandline.parse_listen_address('[::1]:9115'), ('::1', 9115))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping metrics exporter
+"""
+import asyncio
+import sys
+import unittest
+import urllib.error
+import urllib.request
+from serviceping.cli import PingTarget, monitor_targets
+from serviceping.commandline import parse_arguments
+from serviceping.exporter import MetricsServer, PingMetrics
+from serviceping.network import PingResponse
+from .localserver import LocalHTTPServer, unused_port
+
+
+def response(responding=True, **durations):
+    return PingResponse(
+        responding=responding, reason=None if responding else 'refused',
+        durations_ns=durations if responding else None
+    )
+
+
+class TestPingMetrics(unittest.TestCase):
+
+    def test_histogram(self):
+        metrics = PingMetrics(buckets=(0.001, 0.01), phases=('connect', 'all'))
+        metrics.update('web:80', response(connect=500000, all=2000000))
+        metrics.update('web:80', response(connect=5000000, all=20000000))
+        text = metrics.render()
+        self.assertIn('serviceping_up{target="web:80"} 1', text)
+        self.assertIn('serviceping_pings_total{target="web:80"} 2', text)
+        self.assertIn('serviceping_duration_seconds_bucket{target="web:80",phase="connect",le="0.001"} 1', text)
+        self.assertIn('serviceping_duration_seconds_bucket{target="web:80",phase="connect",le="0.01"} 2', text)
+        self.assertIn('serviceping_duration_seconds_bucket{target="web:80",phase="all",le="0.01"} 1', text)
+        self.assertIn('serviceping_duration_seconds_bucket{target="web:80",phase="all",le="+Inf"} 2', text)
+        self.assertIn('serviceping_duration_seconds_sum{target="web:80",phase="all"} 0.022', text)
+        self.assertIn('serviceping_duration_seconds_count{target="web:80",phase="all"} 2', text)
+        self.assertNotIn('# EOF', text)
+
+    def test_errors(self):
+        metrics = PingMetrics()
+        metrics.add_target('db:5432')
+        self.assertIn('serviceping_up{target="db:5432"} 0', metrics.render())
+        metrics.update('db:5432', response(responding=False))
+        metrics.update('db:5432', PingResponse(responding=False))
+        text = metrics.render()
+        self.assertIn('serviceping_errors_total{target="db:5432",reason="refused"} 1', text)
+        self.assertIn('serviceping_errors_total{target="db:5432",reason="error"} 1', text)
+        self.assertIn('serviceping_duration_seconds_count{target="db:5432",phase="all"} 0', text)
+        self.assertEqual(len(metrics), 1)
+
+    def test_openmetrics(self):
+        metrics = PingMetrics()
+        metrics.update('web', response(all=1000))
+        text = metrics.render(openmetrics=True)
+        self.assertTrue(text.endswith('# EOF\n'))
+        self.assertIn('# TYPE serviceping_pings counter', text)
+        self.assertIn('serviceping_pings_total{target="web"} 1', text)
+
+    def test_escape(self):
+        metrics = PingMetrics()
+        metrics.add_target('a"b\\c')
+        self.assertIn('serviceping_up{target="a\\"b\\\\c"} 0', metrics.render())
+
+
+class TestMetricsServer(unittest.TestCase):
+
+    def setUp(self):
+        self._orig_argv = sys.argv
+
+    def tearDown(self):
+        sys.argv = self._orig_argv
+
+    def test_serve(self):
+        metrics = PingMetrics()
+        with LocalHTTPServer() as server:
+            destinations = [f'127.0.0.1:{server.port}', f'127.0.0.1:{unused_port()}']
+            sys.argv = ['serviceping', '-c', '2', '-i', '0', '--exporter', '0'] + destinations
+            options, _ = parse_arguments()
+            targets = [PingTarget(destination) for destination in destinations]
+            asyncio.run(monitor_targets(targets, options, metrics))
+        with MetricsServer(metrics, port=0) as metrics_server:
+            url = f'http://127.0.0.1:{metrics_server.port}/metrics'
+            with urllib.request.urlopen(url) as reply:
+                self.assertTrue(reply.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+                text = reply.read().decode('utf-8')
+            request = urllib.request.Request(url, headers={'Accept': 'application/openmetrics-text'})
+            with urllib.request.urlopen(request) as reply:
+                self.assertTrue(reply.read().endswith(b'# EOF\n'))
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f'http://127.0.0.1:{metrics_server.port}/')
+        self.assertIn(f'serviceping_up{{target="{destinations[0]}"}} 1', text)
+        self.assertIn(f'serviceping_up{{target="{destinations[1]}"}} 0', text)
+        self.assertIn(f'serviceping_errors_total{{target="{destinations[1]}",reason="refused"}} 2', text)
+        self.assertIn(f'serviceping_duration_seconds_count{{target="{destinations[0]}",phase="connect"}} 2', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping streaming http response reader
+"""
+import threading
+import unittest
+from serviceping.httpreader import RECV_SIZE, ConnectionClosed, HTTPResponseParser, receive_buffer
+
+
+CHUNKED = (
+    b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+    b'5\r\nhello\r\n1;name=value\r\n \r\n10\r\n0123456789abcdef\r\n0\r\nTrailer: yes\r\n\r\n'
+)
+
+
+def feed(parser, data, size):
+    for start in range(0, len(data), size):
+        if parser.feed(data[start:start + size]):
+            return start + size >= len(data)
+    return False
+
+
+class TestHTTPResponseParser(unittest.TestCase):
+
+    def test_content_length(self):
+        data = b'HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\n0123456789'
+        for size in [1, 7, len(data)]:
+            parser = HTTPResponseParser()
+            self.assertTrue(feed(parser, data, size))
+            self.assertEqual(parser.code, 200)
+            self.assertEqual(parser.length, len(data))
+            self.assertEqual(parser.body_length, 10)
+            self.assertTrue(parser.keep_alive)
+            self.assertEqual(parser.response, data.decode('ascii'))
+            self.assertLessEqual(parser.first_byte_ns, parser.headers_ns)
+            self.assertLessEqual(parser.headers_ns, parser.done_ns)
+
+    def test_chunked(self):
+        for size in [1, 3, 16, len(CHUNKED)]:
+            parser = HTTPResponseParser()
+            self.assertTrue(feed(parser, CHUNKED, size), size)
+            self.assertEqual(parser.body_length, 22)
+            self.assertEqual(parser.length, len(CHUNKED))
+
+    def test_until_close(self):
+        parser = HTTPResponseParser(keep_response=False)
+        self.assertFalse(parser.feed(b'HTTP/1.0 200 OK\r\n\r\nbody'))
+        self.assertFalse(parser.feed(b' more'))
+        self.assertTrue(parser.eof())
+        self.assertEqual(parser.body_length, 9)
+        self.assertFalse(parser.keep_alive)
+        self.assertIsNone(parser.response)
+
+    def test_no_body(self):
+        parser = HTTPResponseParser()
+        self.assertTrue(parser.feed(b'HTTP/1.1 304 Not Modified\r\n\r\n'))
+        self.assertTrue(parser.keep_alive)
+
+    def test_connection_close(self):
+        parser = HTTPResponseParser()
+        self.assertTrue(parser.feed(b'HTTP/1.1 200 OK\r\nConnection: close\r\nContent-Length: 0\r\n\r\n'))
+        self.assertFalse(parser.keep_alive)
+        parser = HTTPResponseParser()
+        self.assertTrue(parser.feed(b'HTTP/1.0 200 OK\r\nConnection: Keep-Alive\r\nContent-Length: 0\r\n\r\n'))
+        self.assertTrue(parser.keep_alive)
+
+    def test_max_size(self):
+        parser = HTTPResponseParser(max_size=4)
+        feed(parser, CHUNKED, 5)
+        self.assertEqual(parser.response, 'HTTP')
+
+    def test_eof_before_response(self):
+        with self.assertRaises(ConnectionClosed):
+            HTTPResponseParser().eof()
+        parser = HTTPResponseParser()
+        parser.feed(b'HTTP/1.1 200')
+        with self.assertRaises(ValueError):
+            parser.eof()
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            HTTPResponseParser().feed(b'SSH-2.0-OpenSSH\r\n\r\n')
+        with self.assertRaises(ValueError):
+            HTTPResponseParser().feed(b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n')
+
+    def test_reused_buffer(self):
+        data = b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nhello\r\n0\r\n\r\n'
+        buffer = bytearray(8)
+        view = memoryview(buffer)
+        parser = HTTPResponseParser()
+        for start in range(0, len(data), 8):
+            piece = data[start:start + 8]
+            view[:len(piece)] = piece
+            done = parser.feed(view[:len(piece)])
+            buffer[:] = b'\0' * 8
+        self.assertTrue(done)
+        self.assertEqual(parser.code, 200)
+        self.assertEqual(parser.body_length, 5)
+        self.assertEqual(bytes(parser.kept), data)
+
+
+class TestReceiveBuffer(unittest.TestCase):
+
+    def test_per_thread(self):
+        views = []
+        thread = threading.Thread(target=lambda: views.append(receive_buffer()))
+        thread.start()
+        thread.join()
+        self.assertIs(receive_buffer(), receive_buffer())
+        self.assertIsNot(receive_buffer().obj, views[0].obj)
+        self.assertEqual(len(receive_buffer()), RECV_SIZE)
+
+
+if __name__ == '__main__':
+    unittest.main()
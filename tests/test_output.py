@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping machine readable output
+"""
+import csv
+import io
+import json
+import threading
+import time
+import unittest
+from serviceping import output
+from serviceping.network import PingResponse
+
+
+def response(sequence=0):
+    return PingResponse(
+        host='localhost', port=80, ip='127.0.0.1', sequence=sequence, responding=True, state='open', code=200,
+        length=10, durations_ns={'dns': 100, 'connect': 200, 'all': 1000}, response=b'HTTP/1.0 200 OK\r\n'
+    )
+
+
+class RecordingStream(object):
+    """
+    Stream recording each write, optionally blocking the writes until released
+    """
+    def __init__(self, blocked=False):
+        self.writes = []
+        self.released = threading.Event()
+        if not blocked:
+            self.released.set()
+
+    def write(self, data):
+        self.released.wait()
+        self.writes.append(data)
+
+    def flush(self):
+        pass
+
+
+class BrokenStream(RecordingStream):
+    def write(self, data):
+        raise BrokenPipeError()
+
+
+class TestBackgroundWriter(unittest.TestCase):
+
+    def test_batches_writes(self):
+        stream = RecordingStream()
+        with output.BackgroundWriter(stream, flush_interval=60) as writer:
+            for line in range(10):
+                print('line %d' % line, file=writer)
+        self.assertEqual(stream.writes, [''.join('line %d\n' % line for line in range(10))])
+
+    def test_buffer_size(self):
+        stream = RecordingStream()
+        with output.BackgroundWriter(stream, buffer_size=4, flush_interval=60) as writer:
+            writer.write(b'ab')
+            writer.write(b'cd')
+            writer.write(b'e')
+        self.assertEqual(stream.writes, [b'abcd', b'e'])
+
+    def test_flush_interval(self):
+        stream = RecordingStream()
+        with output.BackgroundWriter(stream, flush_interval=0.01) as writer:
+            writer.write('a')
+            deadline = time.monotonic() + 5
+            while not stream.writes and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(stream.writes, ['a'])
+
+    def test_write_does_not_block(self):
+        stream = RecordingStream(blocked=True)
+        with output.BackgroundWriter(stream, buffer_size=1) as writer:
+            start = time.monotonic()
+            for _ in range(1000):
+                writer.write('x')
+            self.assertLess(time.monotonic() - start, 1)
+            stream.released.set()
+        self.assertEqual(''.join(stream.writes), 'x' * 1000)
+
+    def test_error(self):
+        with output.BackgroundWriter(BrokenStream()) as writer:
+            writer.write('a')
+        self.assertIsInstance(writer.error, BrokenPipeError)
+
+
+class TestOutput(unittest.TestCase):
+
+    def test_response_record(self):
+        record = output.response_record(response(3))
+        self.assertEqual(list(record)[:len(output.RECORD_FIELDS)], list(output.RECORD_FIELDS))
+        self.assertEqual(record['sequence'], 3)
+        self.assertEqual(record['durations_ns'], {'dns': 100, 'connect': 200, 'all': 1000})
+        self.assertEqual(record['response'], 'HTTP/1.0 200 OK\r\n')
+        self.assertNotIn('response', output.response_record(response(), response_body=False))
+
+    def test_jsonl(self):
+        stream = io.BytesIO()
+        with output.get_writer('jsonl', stream, response_body=False) as writer:
+            writer.write(response(0))
+            writer.write(response(1))
+        lines = stream.getvalue().decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 2)
+        record = json.loads(lines[1])
+        self.assertEqual(record['sequence'], 1)
+        self.assertEqual(record['durations_ns']['connect'], 200)
+        self.assertIsInstance(record['timestamp_ns'], int)
+        self.assertNotIn('response', record)
+
+    def test_csv(self):
+        stream = io.BytesIO()
+        with output.get_writer('csv', stream) as writer:
+            writer.write(response())
+            writer.write(PingResponse(host='localhost', port=81, state='closed', reason='refused'))
+        rows = list(csv.DictReader(io.StringIO(stream.getvalue().decode('utf-8'))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['connect_ns'], '200')
+        self.assertEqual(rows[0]['ssl_ns'], '')
+        self.assertEqual(rows[0]['response'], 'HTTP/1.0 200 OK\r\n')
+        self.assertEqual(rows[1]['reason'], 'refused')
+        self.assertEqual(rows[1]['code'], '')
+
+    def test_batches(self):
+        stream = io.BytesIO()
+        writer = output.JSONLinesWriter(stream, batch_size=3, flush_interval=60)
+        writer.write(response(0))
+        writer.write(response(1))
+        self.assertEqual(stream.getvalue(), b'')
+        writer.write(response(2))
+        self.assertEqual(len(stream.getvalue().splitlines()), 3)
+        writer.write(response(3))
+        writer.close()
+        self.assertEqual(len(stream.getvalue().splitlines()), 4)
+        self.assertEqual(writer.count, 4)
+
+    def test_flush_interval(self):
+        stream = io.BytesIO()
+        writer = output.JSONLinesWriter(stream, batch_size=100, flush_interval=0)
+        writer.write(response())
+        self.assertEqual(len(stream.getvalue().splitlines()), 1)
+
+    def test_background_stream(self):
+        stream = io.BytesIO()
+        with output.BackgroundWriter(stream) as background:
+            with output.JSONLinesWriter(background, batch_size=2) as writer:
+                for sequence in range(5):
+                    writer.write(response(sequence))
+        lines = stream.getvalue().splitlines()
+        self.assertEqual([json.loads(line)['sequence'] for line in lines], list(range(5)))
+
+    @unittest.skipIf(output.msgpack is None, 'msgpack is not installed')
+    def test_msgpack(self):  # pragma: no cover
+        stream = io.BytesIO()
+        with output.get_writer('msgpack', stream) as writer:
+            writer.write(response(5))
+        record = next(iter(output.msgpack.Unpacker(io.BytesIO(stream.getvalue()))))
+        self.assertEqual(record['sequence'], 5)
+
+    def test_invalid_format(self):
+        with self.assertRaises(ValueError):
+            output.get_writer('text', io.BytesIO())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping connection pool
+"""
+import socket
+import time
+import unittest
+from serviceping.network import ping, scan
+from serviceping.pool import ConnectionPool
+from serviceping.tls import TLSSessionCache
+from .localserver import IdleCloseHandler, KeepAliveHandler, LocalHTTPServer
+
+
+def connected_socket(server):
+    return socket.create_connection(('127.0.0.1', server.port))
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def test_checkout_empty(self):
+        pool = ConnectionPool()
+        self.assertIsNone(pool.checkout('127.0.0.1', 80))
+        self.assertEqual(pool.misses, 1)
+
+    def test_checkin_checkout(self):
+        with LocalHTTPServer(KeepAliveHandler) as server, ConnectionPool() as pool:
+            network_socket = connected_socket(server)
+            pool.checkin('127.0.0.1', server.port, False, network_socket)
+            self.assertEqual(len(pool), 1)
+            self.assertIsNone(pool.checkout('127.0.0.1', server.port, True))
+            self.assertIs(pool.checkout('127.0.0.1', server.port), network_socket)
+            self.assertEqual(len(pool), 0)
+            network_socket.close()
+
+    def test_max_idle(self):
+        with LocalHTTPServer(KeepAliveHandler) as server, ConnectionPool(max_idle=1) as pool:
+            first, second = connected_socket(server), connected_socket(server)
+            pool.checkin('127.0.0.1', server.port, False, first)
+            pool.checkin('127.0.0.1', server.port, False, second)
+            self.assertEqual(len(pool), 1)
+            self.assertEqual(pool.discarded, 1)
+            self.assertEqual(first.fileno(), -1)
+            self.assertIs(pool.checkout('127.0.0.1', server.port), second)
+            second.close()
+
+    def test_idle_timeout(self):
+        with LocalHTTPServer(KeepAliveHandler) as server, ConnectionPool(idle_timeout=0) as pool:
+            network_socket = connected_socket(server)
+            pool.checkin('127.0.0.1', server.port, False, network_socket)
+            self.assertIsNone(pool.checkout('127.0.0.1', server.port))
+            self.assertEqual(network_socket.fileno(), -1)
+
+    def test_max_age(self):
+        with LocalHTTPServer(KeepAliveHandler) as server, ConnectionPool(max_age=0) as pool:
+            pool.checkin('127.0.0.1', server.port, False, connected_socket(server))
+            self.assertEqual(len(pool), 0)
+            self.assertEqual(pool.discarded, 1)
+
+    def test_health_check(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        with ConnectionPool() as pool:
+            network_socket = socket.create_connection(listener.getsockname())
+            accepted, _ = listener.accept()
+            pool.checkin('127.0.0.1', 1, False, network_socket)
+            accepted.close()
+            time.sleep(.05)
+            self.assertIsNone(pool.checkout('127.0.0.1', 1))
+            self.assertEqual(pool.discarded, 1)
+        listener.close()
+
+    def test_scan_reuses_connection(self):
+        with LocalHTTPServer(KeepAliveHandler) as server, ConnectionPool() as pool:
+            first = scan('localhost', port=server.port, url='/', pool=pool)
+            second = scan('localhost', port=server.port, url='/', pool=pool)
+        self.assertEqual(first['state'], 'open')
+        self.assertEqual(second['state'], 'open')
+        self.assertIn('connect', first['durations_ns'])
+        self.assertNotIn('connect', second['durations_ns'])
+        self.assertIn('request', second['durations_ns'])
+        self.assertEqual(second['code'], 200)
+        self.assertEqual(pool.hits, 1)
+
+    def test_ping_https_reuses_connection(self):
+        with LocalHTTPServer(KeepAliveHandler).wrap_ssl() as server, ConnectionPool() as pool:
+            sessions = TLSSessionCache()
+            responses = [
+                ping('localhost', port=server.port, url='/', https=True, pool=pool, tls_sessions=sessions)
+                for _ in range(3)
+            ]
+        self.assertTrue(all(response.responding for response in responses))
+        self.assertIn('ssl', responses[0].durations_ns)
+        self.assertNotIn('ssl', responses[2].durations_ns)
+        self.assertTrue(responses[2].ssl_version.startswith('TLS'))
+        self.assertEqual(pool.hits, 2)
+
+    def test_ping_server_closes(self):
+        with LocalHTTPServer(IdleCloseHandler) as server, ConnectionPool() as pool:
+            responses = [ping('localhost', port=server.port, url='/', pool=pool) for _ in range(3)]
+        self.assertTrue(all(response.responding for response in responses))
+        self.assertTrue(all('connect' in response.durations_ns for response in responses))
+
+    def test_ping_no_keep_alive(self):
+        with LocalHTTPServer() as server, ConnectionPool() as pool:
+            responses = [ping('localhost', port=server.port, url='/', pool=pool) for _ in range(3)]
+            self.assertEqual(len(pool), 0)
+            self.assertEqual(pool.discarded, 0)
+        self.assertTrue(all(response.responding for response in responses))
+        self.assertTrue(all('connect' in response.durations_ns for response in responses))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping binary recordings
+"""
+import os
+import tempfile
+import unittest
+from serviceping import recording
+from serviceping.network import PingResponse
+from serviceping.results import REASONS
+from serviceping.serviceping import batch_statistics
+
+
+def responding(host, port, all_ns):
+    return PingResponse(
+        host=host, port=port, responding=True, state='open', code=200, durations_ns={'dns': 10, 'all': all_ns}
+    )
+
+
+class TestRecording(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'pings.rec')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def record(self, responses):
+        with recording.RecordingWriter(self.path, batch_size=2) as writer:
+            for response in responses:
+                writer.write(response)
+
+    def test_record_size(self):
+        self.assertEqual(recording.RECORD.size % 8, 0)
+        for typecode, offset, size in recording.FIELDS.values():
+            self.assertEqual(offset % size, 0)
+
+    def test_columns(self):
+        self.record([
+            responding('a', 80, 1000000), responding('b', 443, 2000000),
+            PingResponse(host='a', port=80, state='closed', reason='refused', durations_ns={'dns': 10, 'all': 5}),
+        ])
+        with recording.Recording(self.path) as pings:
+            self.assertEqual(len(pings), 3)
+            self.assertEqual(pings.targets, [('a', 80), ('b', 443)])
+            self.assertIsInstance(pings.column('all'), memoryview)
+            self.assertEqual(list(pings.column('all')), [1000000, 2000000, -1])
+            self.assertEqual(list(pings.column('dns')), [10, 10, -1])
+            self.assertEqual(list(pings.column('ssl')), [-1, -1, -1])
+            self.assertEqual(list(pings.column('target')), [0, 1, 0])
+            self.assertEqual(list(pings.column('code')), [200, 200, 0])
+            self.assertEqual(REASONS[pings.column('reason')[2]], 'refused')
+            timestamps = pings.column('timestamp_ns')
+            self.assertLessEqual(timestamps[0], timestamps[2])
+
+    def test_getitem(self):
+        self.record([responding('a', 80, 1000000), PingResponse(host='b', port=81, state='closed', reason='timeout')])
+        with recording.Recording(self.path) as pings:
+            response = pings[0]
+            self.assertTrue(response.responding)
+            self.assertEqual((response.host, response.port, response.code), ('a', 80, 200))
+            self.assertEqual(response.durations_ns, {'dns': 10, 'all': 1000000})
+            response = pings[-1]
+            self.assertFalse(response.responding)
+            self.assertTrue(response.timeout)
+            self.assertEqual(response.reason, 'timeout')
+            with self.assertRaises(IndexError):
+                pings[2]
+
+    def test_statistics(self):
+        self.record([responding('a', 80, 1000000 * value) for value in range(1, 6)] + [responding('b', 80, 9000000)])
+        with recording.Recording(self.path) as pings:
+            self.assertEqual(pings.statistics(), batch_statistics([1000000 * value for value in range(1, 6)] + [9000000]))
+            statistics = pings.statistics(host='a', port=80)
+            self.assertEqual(statistics['count_sent'], 5)
+            self.assertEqual(statistics['max_time'], 5000000)
+            self.assertEqual(pings.statistics(host='c', port=80)['count_sent'], 0)
+
+    def test_window(self):
+        self.record([responding('a', 80, value) for value in range(5)])
+        with recording.Recording(self.path) as pings:
+            timestamps = pings.column('timestamp_ns')
+            self.assertEqual(pings.window(), slice(0, 5))
+            self.assertEqual(pings.window(start_ns=timestamps[-1] + 1), slice(5, 5))
+            self.assertEqual(pings.window(end_ns=timestamps[0]), slice(0, 0))
+            window = pings.window(timestamps[1], timestamps[3])
+            self.assertEqual(list(pings.series(start_ns=timestamps[1], end_ns=timestamps[3])), list(range(5))[window])
+
+    def test_append(self):
+        self.record([responding('a', 80, 1)])
+        self.record([responding('b', 80, 2), responding('a', 80, 3)])
+        with recording.Recording(self.path) as pings:
+            self.assertEqual(pings.targets, [('a', 80), ('b', 80)])
+            self.assertEqual(list(pings.column('target')), [0, 1, 0])
+            self.assertEqual(list(pings.series(host='a', port=80)), [1, 3])
+
+    def test_partial_record(self):
+        self.record([responding('a', 80, 1), responding('a', 80, 2)])
+        with open(self.path, 'ab') as file_handle:
+            file_handle.write(b'\x01' * 10)
+        with recording.Recording(self.path) as pings:
+            self.assertEqual(len(pings), 2)
+        self.record([responding('a', 80, 3)])
+        with recording.Recording(self.path) as pings:
+            self.assertEqual(list(pings.column('all')), [1, 2, 3])
+
+    def test_empty(self):
+        self.record([])
+        with recording.Recording(self.path) as pings:
+            self.assertEqual(len(pings), 0)
+            self.assertEqual(list(pings.column('all')), [])
+            self.assertEqual(pings.statistics()['count_sent'], 0)
+
+    def test_invalid_file(self):
+        with open(self.path, 'wb') as file_handle:
+            file_handle.write(b'not a recording at all')
+        with self.assertRaises(ValueError):
+            recording.Recording(self.path)
+        with self.assertRaises(ValueError):
+            recording.RecordingWriter(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping dns cache
+"""
+import asyncio
+import socket
+import unittest
+from serviceping.resolver import DNSCache, getaddresses
+
+
+class CountingResolver(object):
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, host):
+        self.calls.append(host)
+        if host.endswith('.invalid'):
+            raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+        return '127.0.0.%d' % len(self.calls)
+
+
+class TestGetAddresses(unittest.TestCase):
+
+    def test_getaddresses(self):
+        addresses = getaddresses('127.0.0.1')
+        self.assertEqual(addresses, [(socket.AF_INET, ('127.0.0.1', 0))])
+
+    def test_getaddresses_invalid_hostname(self):
+        with self.assertRaises(socket.gaierror):
+            getaddresses('pythonpython.python')
+
+
+class TestDNSCache(unittest.TestCase):
+
+    def test_resolve_cached(self):
+        resolver = CountingResolver()
+        cache = DNSCache(resolver=resolver)
+        self.assertEqual(cache.resolve('localhost'), '127.0.0.1')
+        self.assertEqual(cache.resolve('localhost'), '127.0.0.1')
+        self.assertEqual(resolver.calls, ['localhost'])
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_resolve_expired(self):
+        resolver = CountingResolver()
+        cache = DNSCache(ttl=0, resolver=resolver)
+        cache.resolve('localhost')
+        self.assertEqual(cache.resolve('localhost'), '127.0.0.2')
+        self.assertEqual(len(resolver.calls), 2)
+
+    def test_resolve_negative_cached(self):
+        resolver = CountingResolver()
+        cache = DNSCache(resolver=resolver)
+        for _ in range(2):
+            with self.assertRaises(socket.gaierror):
+                cache.resolve('pythonpython.invalid')
+        self.assertEqual(len(resolver.calls), 1)
+
+    def test_resolve_negative_cached_traceback(self):
+        cache = DNSCache(resolver=CountingResolver())
+        errors = []
+        for _ in range(100):
+            try:
+                cache.resolve('pythonpython.invalid')
+            except socket.gaierror as error:
+                errors.append(error)
+        self.assertEqual(errors[-1].args, (socket.EAI_NONAME, 'Name or service not known'))
+        self.assertIsNot(errors[-1], errors[-2])
+        depth = 0
+        traceback = errors[-1].__traceback__
+        while traceback is not None:
+            depth += 1
+            traceback = traceback.tb_next
+        self.assertLess(depth, 10)
+
+    def test_resolve_negative_expired(self):
+        resolver = CountingResolver()
+        cache = DNSCache(negative_ttl=0, resolver=resolver)
+        for _ in range(2):
+            with self.assertRaises(socket.gaierror):
+                cache.resolve('pythonpython.invalid')
+        self.assertEqual(len(resolver.calls), 2)
+
+    def test_max_size(self):
+        cache = DNSCache(max_size=2, resolver=CountingResolver())
+        cache.resolve('a')
+        cache.resolve('b')
+        cache.resolve('a')
+        cache.resolve('c')
+        self.assertEqual(len(cache), 2)
+        with self.assertRaises(KeyError):
+            cache.lookup('b')
+        self.assertEqual(cache.lookup('a'), '127.0.0.1')
+
+    def test_async_resolve(self):
+        resolver = CountingResolver()
+        cache = DNSCache(resolver=resolver)
+        self.assertEqual(asyncio.run(cache.async_resolve('localhost')), '127.0.0.1')
+        self.assertEqual(asyncio.run(cache.async_resolve('localhost')), '127.0.0.1')
+        self.assertEqual(resolver.calls, ['localhost'])
+
+    def test_clear(self):
+        cache = DNSCache(resolver=CountingResolver())
+        cache.resolve('localhost')
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
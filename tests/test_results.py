@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping compact ping response storage
+"""
+import unittest
+from serviceping.network import PingResponse, ping
+from serviceping.results import PingResultBuffer
+from .localserver import LocalHTTPServer
+
+
+def response(host='localhost', port=80, sequence=0, duration=1000000, **kwargs):
+    responding = duration is not None
+    return PingResponse(
+        host=host, port=port, ip='127.0.0.1', sequence=sequence, responding=responding,
+        state='open' if responding else 'closed', start=5000, end=5000 + (duration or 0),
+        durations_ns={'dns': 100, 'connect': 200, 'all': duration} if responding else {'dns': 100},
+        **kwargs
+    )
+
+
+class TestPingResultBuffer(unittest.TestCase):
+
+    def test_round_trip(self):
+        buffer = PingResultBuffer()
+        with LocalHTTPServer() as server:
+            original = ping('localhost', port=server.port, url='/', sequence=3)
+        buffer.append(original)
+        self.assertEqual(len(buffer), 1)
+        stored = buffer[0]
+        for name in ['host', 'port', 'ip', 'sequence', 'responding', 'code', 'state', 'length', 'start', 'end',
+                     'durations_ns', 'ssl_version', 'ssl_resumed', 'error', 'error_message']:
+            self.assertEqual(getattr(stored, name), getattr(original, name), name)
+        self.assertIsNone(stored.response)
+
+    def test_flags(self):
+        buffer = PingResultBuffer()
+        buffer.append(response(duration=None, error=True, error_message='DNS Lookup failed', reason='dns'))
+        buffer.append(response(ssl_version='TLSv1.3', ssl_resumed=True))
+        self.assertFalse(buffer[0].responding)
+        self.assertTrue(buffer[0].error)
+        self.assertEqual(buffer[0].error_message, 'DNS Lookup failed')
+        self.assertEqual(buffer[0].reason, 'dns')
+        self.assertIsNone(buffer[1].reason)
+        self.assertEqual(buffer[0].durations_ns, {'dns': 100})
+        self.assertTrue(buffer[-1].ssl_resumed)
+        self.assertEqual(buffer[-1].ssl_version, 'TLSv1.3')
+        with self.assertRaises(IndexError):
+            buffer[2]
+
+    def test_targets(self):
+        buffer = PingResultBuffer()
+        buffer.extend([response('a', 80), response('b', 443), response('a', 80, sequence=1)])
+        self.assertEqual(buffer.targets, [('a', 80), ('b', 443)])
+        self.assertEqual([item.sequence for item in buffer], [0, 0, 1])
+        buffer.clear()
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(buffer.targets, [])
+
+    def test_series(self):
+        buffer = PingResultBuffer()
+        buffer.extend([
+            response('a', 80, duration=1000000), response('b', 80, duration=5000000),
+            response('a', 80, duration=None), response('a', 80, duration=3000000)
+        ])
+        self.assertEqual(list(buffer.series()), [1000000, 5000000, -1, 3000000])
+        self.assertEqual(list(buffer.series('connect', 'a', 80)), [200, -1, 200])
+        self.assertEqual(list(buffer.series('ssl', 'a', 80)), [-1, -1, -1])
+        self.assertEqual(list(buffer.series(host='c', port=80)), [])
+
+    def test_statistics(self):
+        buffer = PingResultBuffer()
+        buffer.extend([
+            response('a', 80, duration=1000000), response('b', 80, duration=5000000),
+            response('a', 80, duration=None), response('a', 80, duration=3000000)
+        ])
+        statistics = buffer.statistics('a', 80)
+        self.assertEqual(statistics['count_sent'], 3)
+        self.assertEqual(statistics['count_received'], 2)
+        self.assertAlmostEqual(statistics['avg_time'], 2.0)
+        self.assertEqual(buffer.statistics()['max_time'], 5000000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping rollups
+"""
+import unittest
+from serviceping.network import PingResponse
+from serviceping.rollup import DEFAULT_RESOLUTIONS, RollupBucket, Rollups, RollupSeries
+
+
+class TestRollupBucket(unittest.TestCase):
+
+    def test_bucket(self):
+        bucket = RollupBucket(100, 10)
+        for value in [1.0, 2.0, None, 3.0]:
+            bucket.add(value)
+        self.assertEqual(bucket.end, 110)
+        self.assertEqual((bucket.sent, bucket.received), (4, 3))
+        self.assertEqual(bucket.loss, 25.0)
+        summary = bucket.as_dict()
+        self.assertEqual((summary['min_time'], summary['max_time']), (1.0, 3.0))
+        self.assertAlmostEqual(summary['avg_time'], 2.0)
+        self.assertAlmostEqual(summary['percentiles'][50], 2.0, delta=0.05)
+
+    def test_empty_bucket(self):
+        bucket = RollupBucket(0, 10)
+        self.assertEqual(bucket.loss, 0.0)
+        bucket.add(None)
+        summary = bucket.as_dict()
+        self.assertEqual(summary['loss'], 100.0)
+        self.assertIsNone(summary['avg_time'])
+        self.assertEqual(summary['percentiles'], {})
+
+
+class TestRollupSeries(unittest.TestCase):
+
+    def test_rotation(self):
+        series = RollupSeries(10, 3)
+        for timestamp in range(0, 100, 5):
+            series.add(timestamp, 1.0)
+        self.assertEqual([bucket.start for bucket in series.buckets], [70, 80, 90])
+        self.assertEqual([bucket.sent for bucket in series.buckets], [2, 2, 2])
+        self.assertEqual(series.oldest, 70)
+
+    def test_gaps(self):
+        series = RollupSeries(10, 3)
+        series.add(0, 1.0)
+        series.add(15, 1.0)
+        series.add(45, 1.0)
+        self.assertEqual([bucket.start for bucket in series.buckets], [40])
+
+    def test_late_pings(self):
+        series = RollupSeries(10, 5)
+        series.add(5, 1.0)
+        series.add(35, 1.0)
+        series.add(8, 2.0)
+        series.add(25, None)
+        self.assertEqual([(bucket.start, bucket.sent) for bucket in series.buckets], [(0, 2), (20, 1), (30, 1)])
+        series.add(65, 1.0)
+        series.add(15, 1.0)
+        self.assertEqual(series.dropped, 1)
+        self.assertEqual([bucket.start for bucket in series.buckets], [20, 30, 60])
+
+    def test_query(self):
+        series = RollupSeries(10, 10)
+        for timestamp in range(0, 50, 10):
+            series.add(timestamp, 1.0)
+        self.assertEqual([bucket.start for bucket in series.query(15, 35)], [10, 20, 30])
+        self.assertEqual([bucket.start for bucket in series.query(end=20)], [0, 10])
+        self.assertEqual(len(series.query()), 5)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            RollupSeries(0, 10)
+
+
+class TestRollups(unittest.TestCase):
+
+    def test_update(self):
+        rollups = Rollups()
+        rollups.update('a', PingResponse(responding=True, durations_ns={'all': 2000000}), timestamp=1000)
+        rollups.update('a', PingResponse(responding=False), timestamp=1001)
+        self.assertEqual(rollups.targets, ['a'])
+        for width, _ in DEFAULT_RESOLUTIONS:
+            bucket = rollups.series('a', width).buckets[0]
+            self.assertEqual((bucket.sent, bucket.received), (2, 1))
+            self.assertEqual(bucket.stats.max, 2.0)
+
+    def test_bounded_memory(self):
+        rollups = Rollups()
+        for second in range(0, 3 * 24 * 3600, 5):
+            rollups.add('a', 1.0, timestamp=second)
+        for width, retention in DEFAULT_RESOLUTIONS:
+            self.assertLessEqual(len(rollups.series('a', width)), retention)
+        self.assertEqual(len(rollups.series('a', 10)), 360)
+        self.assertEqual(len(rollups.series('a', 3600)), 72)
+
+    def test_query_resolution(self):
+        rollups = Rollups(resolutions=[(60, 10), (10, 6)])
+        for second in range(0, 600):
+            rollups.add('a', float(second), timestamp=second)
+        # The last minute is kept in 10 second buckets
+        buckets = rollups.query('a', start=540)
+        self.assertEqual([bucket.width for bucket in buckets], [10] * 6)
+        # Older times are only kept in 1 minute buckets
+        buckets = rollups.query('a', start=120, end=240)
+        self.assertEqual([(bucket.start, bucket.width) for bucket in buckets], [(120, 60), (180, 60)])
+        self.assertEqual(len(rollups.query('a', width=10)), 6)
+        self.assertEqual(rollups.query('b'), [])
+
+    def test_query_copies(self):
+        rollups = Rollups()
+        rollups.add('a', 1.0, timestamp=0)
+        rollups.query('a')[0].add(5.0)
+        self.assertEqual(rollups.query('a')[0].sent, 1)
+
+    def test_summary(self):
+        rollups = Rollups(resolutions=[(10, 100)])
+        for second in range(100):
+            rollups.add('a', None if second % 10 == 0 else 1.0 + second, timestamp=second)
+        summary = rollups.summary('a', start=20, end=40)
+        self.assertEqual((summary.start, summary.width), (20, 20))
+        self.assertEqual((summary.sent, summary.received), (20, 18))
+        self.assertEqual((summary.stats.min, summary.stats.max), (22.0, 40.0))
+        self.assertEqual(rollups.summary('b').sent, 0)
+
+    def test_clock(self):
+        rollups = Rollups(resolutions=[(10, 10)], clock=lambda: 125.0)
+        rollups.add('a', 1.0)
+        self.assertEqual(rollups.query('a')[0].start, 120)
+
+    def test_remove(self):
+        rollups = Rollups()
+        rollups.add('a', 1.0, timestamp=0)
+        rollups.remove('a')
+        self.assertEqual(len(rollups), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping ping scheduling
+"""
+import asyncio
+import time
+import unittest
+from serviceping.scheduler import IntervalScheduler
+
+
+class TestIntervalScheduler(unittest.TestCase):
+
+    def test_no_drift(self):
+        scheduler = IntervalScheduler(1.0)
+        self.assertEqual(scheduler.delay(100.0), 0)
+        # The ping took 0.3 seconds, the next one is still due one interval after the first
+        self.assertAlmostEqual(scheduler.delay(100.3), 0.7)
+        self.assertAlmostEqual(scheduler.delay(101.25), 0.75)
+        self.assertEqual(scheduler.missed, 0)
+        self.assertEqual(scheduler.slots, 3)
+
+    def test_late_within_interval(self):
+        scheduler = IntervalScheduler(1.0)
+        scheduler.delay(0.0)
+        self.assertEqual(scheduler.delay(1.5), 0)
+        self.assertAlmostEqual(scheduler.delay(1.6), 0.4)
+        self.assertEqual(scheduler.missed, 0)
+
+    def test_missed(self):
+        scheduler = IntervalScheduler(1.0)
+        scheduler.delay(0.0)
+        # The first ping ran until 3.5, slots 1 and 2 are missed and slot 3 starts now
+        self.assertEqual(scheduler.delay(3.5), 0)
+        self.assertEqual(scheduler.missed, 2)
+        self.assertAlmostEqual(scheduler.delay(3.6), 0.4)
+        self.assertEqual(scheduler.missed, 2)
+
+    def test_sub_millisecond(self):
+        scheduler = IntervalScheduler(0.0001)
+        scheduler.delay(0.0)
+        self.assertAlmostEqual(scheduler.delay(0.00002), 0.00008)
+        self.assertAlmostEqual(scheduler.delay(0.0001), 0.0001)
+
+    def test_jitter(self):
+        scheduler = IntervalScheduler(1.0, jitter=0.5)
+        delays = [scheduler.delay(float(second)) for second in range(50)]
+        self.assertTrue(all(0 <= delay < 0.5 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_rate(self):
+        scheduler = IntervalScheduler(0, rate=10)
+        self.assertEqual(scheduler.delay(0.0), 0)
+        self.assertAlmostEqual(scheduler.delay(0.0), 0.1)
+        self.assertAlmostEqual(scheduler.delay(0.15), 0.05)
+        self.assertEqual(scheduler.delay(0.5), 0)
+
+    def test_rate_slower_than_interval(self):
+        scheduler = IntervalScheduler(0.1, rate=5)
+        self.assertEqual(scheduler.period, 0.2)
+        now = 0.0
+        for _ in range(10):
+            # Each ping starts when its slot is due and takes 10ms
+            now += scheduler.delay(now) + 0.01
+        self.assertAlmostEqual(now, 1.81)
+        self.assertEqual(scheduler.missed, 0)
+        # A ping that runs past the next slot is still counted, slot 10 is due at 2.0
+        self.assertEqual(scheduler.delay(2.3), 0)
+        self.assertEqual(scheduler.missed, 1)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            IntervalScheduler(-1)
+        with self.assertRaises(ValueError):
+            IntervalScheduler(1, jitter=2)
+
+    def test_wait(self):
+        scheduler = IntervalScheduler(0.02)
+        started = time.monotonic()
+        for _ in range(6):
+            scheduler.wait()
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+    def test_async_wait(self):
+        async def run(scheduler):
+            for _ in range(6):
+                await scheduler.async_wait()
+
+        started = time.monotonic()
+        asyncio.run(run(IntervalScheduler(0.02)))
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
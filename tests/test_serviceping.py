@@ -9,6 +9,7 @@ test_serviceping
 
 Tests for `serviceping` module.
 """
+from array import array
 import serviceping
 import serviceping.serviceping
 import unittest
@@ -40,6 +41,146 @@ class TestServiceping(unittest.TestCase):
         statslist = serviceping.serviceping.StatsList([1,2])
         statslist.reset()
         self.assertEqual(statslist.count, 0)
+        self.assertIsNone(statslist.min)
+        self.assertEqual(statslist.percentile(50), 0.0)
+
+    def test_serviceping_StatsList_min_max(self):
+        statslist = serviceping.serviceping.StatsList([3, 1, 2])
+        self.assertEqual(statslist.min, 1)
+        self.assertEqual(statslist.max, 3)
+
+    def test_serviceping_StatsList_percentiles(self):
+        statslist = serviceping.serviceping.StatsList(range(1, 10001))
+        percentiles = statslist.percentiles()
+        self.assertEqual(list(percentiles.keys()), [50, 90, 99, 99.9])
+        for percentile, expected in [(50, 5000), (90, 9000), (99, 9900), (99.9, 9990)]:
+            self.assertAlmostEqual(percentiles[percentile], expected, delta=expected * 0.01)
+
+    def test_serviceping_StatsList_tail_percentiles(self):
+        statslist = serviceping.serviceping.StatsList(range(1, 101))
+        self.assertAlmostEqual(statslist.percentile(99.9), 100, delta=1)
+        self.assertAlmostEqual(statslist.percentile(99), 99, delta=99 * 0.01)
+        self.assertLessEqual(statslist.percentile(100), 100)
+
+    def test_serviceping_StatsList_two_values(self):
+        statslist = serviceping.serviceping.StatsList([1.59, 2.23])
+        self.assertAlmostEqual(statslist.percentile(50), 1.59, delta=1.59 * 0.01)
+        for percentile in [90, 99, 99.9]:
+            self.assertAlmostEqual(statslist.percentile(percentile), 2.23, delta=2.23 * 0.01)
+
+    def test_serviceping_StatsList_percentile_clamped(self):
+        statslist = serviceping.serviceping.StatsList([1, 100])
+        self.assertEqual(statslist.percentile(50), 1)
+        self.assertEqual(statslist.percentile(0), 1)
+        self.assertEqual(statslist.percentile(100), 100)
+
+    def test_serviceping_StatsList_merge(self):
+        values = [24.913, 25.120, 25.266, 26.371, 25.237, 24.833, 26.465, 25.053, 25.857, 25.121]
+        merged = serviceping.serviceping.StatsList(values[:3])
+        merged.merge(serviceping.serviceping.StatsList(values[3:]))
+        merged.merge(serviceping.serviceping.StatsList())
+        expected = serviceping.serviceping.StatsList(values)
+        self.assertEqual(merged.count, expected.count)
+        self.assertAlmostEqual(merged.mean(), expected.mean())
+        self.assertAlmostEqual(merged.standard_deviation(), expected.standard_deviation())
+        self.assertEqual(merged.min, 24.833)
+        self.assertEqual(merged.max, 26.465)
+        self.assertEqual(merged.percentiles(), expected.percentiles())
+
+    def test_serviceping_StatsList_merge_into_empty(self):
+        merged = serviceping.serviceping.StatsList()
+        merged.merge(serviceping.serviceping.StatsList([1, 2, 3]))
+        self.assertEqual(merged.count, 3)
+        self.assertAlmostEqual(merged.mean(), 2)
+        self.assertAlmostEqual(merged.variance(), 1)
+
+    def test_serviceping_LogHistogram_zero(self):
+        histogram = serviceping.serviceping.LogHistogram()
+        histogram.add(0, count=3)
+        histogram.add(10)
+        self.assertEqual(len(histogram), 4)
+        self.assertEqual(histogram.percentile(50), 0.0)
+        self.assertAlmostEqual(histogram.percentile(100), 10, delta=0.1)
+
+    def test_serviceping_LogHistogram_merge_mismatch(self):
+        histogram = serviceping.serviceping.LogHistogram(relative_error=0.01)
+        with self.assertRaises(ValueError):
+            histogram.merge(serviceping.serviceping.LogHistogram(relative_error=0.02))
+
+    def test_serviceping_LogHistogram_bounded(self):
+        histogram = serviceping.serviceping.LogHistogram()
+        for value in range(1, 100000):
+            histogram.add(value * 1000)
+        self.assertLess(len(histogram.buckets), 600)
+
+    def test_serviceping_WindowedStatsList(self):
+        values = [5, 1, 4, 2, 8, 3, 7, 6]
+        statslist = serviceping.serviceping.WindowedStatsList(3)
+        for position, value in enumerate(values):
+            statslist.append(value)
+            window = values[max(0, position - 2):position + 1]
+            expected = serviceping.serviceping.StatsList(window)
+            self.assertEqual(statslist.window(), window)
+            self.assertEqual(statslist.count, len(window))
+            self.assertAlmostEqual(statslist.mean(), expected.mean())
+            self.assertAlmostEqual(statslist.standard_deviation(), expected.standard_deviation())
+            self.assertEqual(statslist.min, min(window))
+            self.assertEqual(statslist.max, max(window))
+
+    def test_serviceping_WindowedStatsList_percentiles(self):
+        statslist = serviceping.serviceping.WindowedStatsList(100, range(1000))
+        self.assertEqual(statslist.percentiles([0, 50, 100]), {0: 900, 50: 950, 100: 999})
+
+    def test_serviceping_WindowedStatsList_reset(self):
+        statslist = serviceping.serviceping.WindowedStatsList(2, [1, 2, 3])
+        statslist.reset()
+        self.assertEqual(statslist.count, 0)
+        self.assertIsNone(statslist.min)
+        self.assertEqual(statslist.mean(), 0.0)
+        self.assertEqual(statslist.percentile(50), 0.0)
+
+    def test_serviceping_WindowedStatsList_size(self):
+        with self.assertRaises(ValueError):
+            serviceping.serviceping.WindowedStatsList(0)
+
+    def test_serviceping_batch_statistics(self):
+        durations = array('q', [1000000, 2000000, -1, 4000000, 3000000])
+        result = serviceping.serviceping.batch_statistics(durations)
+        self.assertEqual(result['count_sent'], 5)
+        self.assertEqual(result['count_received'], 4)
+        self.assertEqual(result['min_time'], 1000000)
+        self.assertEqual(result['max_time'], 4000000)
+        self.assertAlmostEqual(result['avg_time'], 2.5)
+        self.assertAlmostEqual(result['deviation'], serviceping.serviceping.StatsList([1, 2, 3, 4]).standard_deviation())
+        self.assertAlmostEqual(result['percentiles'][50], 2.5)
+        self.assertAlmostEqual(result['percentiles'][90], 3.7)
+        self.assertAlmostEqual(result['loss'], 20.0)
+
+    def test_serviceping_batch_statistics_count_sent(self):
+        result = serviceping.serviceping.batch_statistics([1000000], count_sent=4, percentiles=[50])
+        self.assertEqual(result['count_received'], 1)
+        self.assertAlmostEqual(result['loss'], 75.0)
+        self.assertEqual(result['deviation'], 0.0)
+        self.assertEqual(list(result['percentiles'].keys()), [50])
+
+    def test_serviceping_batch_statistics_empty(self):
+        result = serviceping.serviceping.batch_statistics([])
+        self.assertEqual(result['count_received'], 0)
+        self.assertEqual(result['loss'], 100.0)
+
+    def test_serviceping_batch_statistics_backends_match(self):
+        durations = [((index * 7919) % 1000) * 1000 + 500 for index in range(1000)]
+        percentiles = [0, 50, 99.9, 100]
+        expected = serviceping.serviceping._array_statistics(durations, percentiles)
+        if serviceping.serviceping.numpy is None:
+            self.skipTest('numpy is not installed')
+        result = serviceping.serviceping._numpy_statistics(durations, percentiles)
+        self.assertEqual(result[:3], expected[:3])
+        self.assertAlmostEqual(result[3], expected[3])
+        self.assertEqual(result[4], expected[4])
+        self.assertAlmostEqual(result[5], expected[5])
+        for percentile in percentiles:
+            self.assertAlmostEqual(result[6][percentile], expected[6][percentile])
 
 
 if __name__ == '__main__':
@@ -6,8 +6,22 @@
 test serviceping network scan
 """
 from __future__ import print_function
-from serviceping.network import scan, ScanFailed, ping, PingResponse
+from serviceping.network import scan, ScanFailed, ping, ping_many, PingResponse, TokenBucket
+from serviceping.resolver import DNSCache
+from datetime import timedelta
+import socket
+import time
 import unittest
+from .localserver import ChunkedHandler, LocalHTTPServer, SilentServer, unused_port
+
+
+def multi_address_cache():
+    """
+    DNS cache that resolves every host to a closed address, followed by the loopback addresses
+    """
+    return DNSCache(resolver=lambda host: [
+        (socket.AF_INET, ('127.0.0.2', 0)), (socket.AF_INET6, ('::1', 0, 0, 0)), (socket.AF_INET, ('127.0.0.1', 0))
+    ])
 
 
 # Any methods of the class below that begin with "test" will be executed
@@ -24,12 +38,98 @@ class TestServicepingScan(unittest.TestCase):
         self.assertEqual(result['host'], 'localhost')
         self.assertEqual(result['port'], 65500)
 
+    def test_serviceping_scan_no_max_size_url(self):
+        with LocalHTTPServer(ChunkedHandler) as server:
+            result = scan('localhost', port=server.port, url='/', max_size=0)
+        self.assertEqual(result['code'], 200)
+        self.assertEqual(result['length'], len(result['response']))
+        self.assertGreater(result['length'], 300000)
+
+    def test_serviceping_scan_chunked(self):
+        with LocalHTTPServer(ChunkedHandler) as server:
+            result = scan('localhost', port=server.port, url='/', max_size=1024)
+        self.assertEqual(result['state'], 'open')
+        self.assertEqual(result['code'], 200)
+        self.assertGreater(result['length'], 300000)
+        self.assertEqual(len(result['response']), 1024)
+        durations = result['durations_ns']
+        self.assertLessEqual(durations['ttfb'], durations['headers'])
+        self.assertLessEqual(durations['headers'], durations['request'])
+        self.assertLessEqual(durations['body'], durations['request'])
+
     def test_serviceping_scan_closed(self):
         result = scan('localhost', port=65500)
         self.assertEqual(result['state'], 'closed')
         self.assertEqual(result['host'], 'localhost')
         self.assertEqual(result['port'], 65500)
 
+    def test_serviceping_scan_durations_compatibility(self):
+        with LocalHTTPServer() as server:
+            result = scan('127.0.0.1', port=server.port, url='/')
+        self.assertEqual(list(result['durations']), list(result['durations_ns']))
+        for key, value in result['durations_ns'].items():
+            self.assertIsInstance(result['durations'][key], timedelta)
+            self.assertAlmostEqual(result['durations'][key] / timedelta(microseconds=1), value / 1000, delta=1)
+        with self.assertRaises(ScanFailed) as context:
+            scan('pythonpython.python')
+        self.assertEqual(context.exception.result['durations'], {})
+
+    def test_serviceping_scan_dns_cache(self):
+        dns_cache = DNSCache()
+        scan('localhost', port=65500, dns_cache=dns_cache)
+        result = scan('localhost', port=65500, dns_cache=dns_cache)
+        self.assertEqual(result['ip'], '127.0.0.1')
+        self.assertEqual(dns_cache.hits, 1)
+
+    def test_serviceping_scan_dns_cache_invalid_hostname(self):
+        with self.assertRaises(ScanFailed):
+            scan('pythonpython.python', dns_cache=DNSCache())
+
+    def test_serviceping_scan_invalid_address_mode(self):
+        with self.assertRaises(ValueError):
+            scan('localhost', address_mode='fastest')
+
+    def test_serviceping_scan_address_mode_first(self):
+        with LocalHTTPServer() as server:
+            result = scan('multi', port=server.port, dns_cache=multi_address_cache())
+        self.assertEqual(result['state'], 'closed')
+        self.assertEqual(result['ip'], '127.0.0.2')
+        self.assertNotIn('addresses', result)
+
+    def test_serviceping_scan_address_mode_all(self):
+        with LocalHTTPServer() as server:
+            result = scan('multi', port=server.port, url='/', dns_cache=multi_address_cache(), address_mode='all')
+        self.assertEqual(result['state'], 'open')
+        self.assertEqual(result['ip'], '127.0.0.1')
+        self.assertEqual(result['code'], 200)
+        self.assertEqual(
+            list(result['durations_ns'].keys()), ['all', 'dns', 'connect', 'request', 'ttfb', 'headers', 'body']
+        )
+        self.assertEqual([address['ip'] for address in result['addresses']], ['127.0.0.2', '::1', '127.0.0.1'])
+        self.assertEqual([address['state'] for address in result['addresses']], ['closed', 'closed', 'open'])
+        self.assertIn('connect', result['addresses'][0]['durations_ns'])
+
+    def test_serviceping_scan_address_mode_race(self):
+        with LocalHTTPServer() as server:
+            result = scan('multi', port=server.port, url='/', dns_cache=multi_address_cache(), address_mode='race')
+        self.assertEqual(result['state'], 'open')
+        self.assertEqual(result['ip'], '127.0.0.1')
+        self.assertEqual(result['code'], 200)
+        # The attempts alternate between the address families
+        self.assertEqual([address['ip'] for address in result['addresses']], ['127.0.0.2', '::1', '127.0.0.1'])
+        self.assertEqual(result['addresses'][-1]['state'], 'open')
+
+    def test_serviceping_scan_address_mode_race_closed(self):
+        result = scan('localhost', port=unused_port(), address_mode='race')
+        self.assertEqual(result['state'], 'closed')
+        self.assertEqual(result['addresses'][0]['state'], 'closed')
+
+    def test_serviceping_ping_address_mode_all(self):
+        with LocalHTTPServer() as server:
+            result = ping('multi', port=server.port, dns_cache=multi_address_cache(), address_mode='all')
+        self.assertTrue(result.responding)
+        self.assertEqual(len(result.addresses), 3)
+
     def test_serviceping_scan_open_http(self):
         result = scan('yahoo.com', port=80)
         self.assertEqual(result['state'], 'open')
@@ -87,10 +187,165 @@ class TestServicepingScan(unittest.TestCase):
         self.assertEqual(result.port, 443)
         self.assertIn(result.code, [200, 301])
 
+    def test_serviceping_scan_durations_ns(self):
+        result = scan('localhost', port=65500)
+        self.assertEqual(list(result['durations_ns'].keys()), ['all', 'dns', 'connect'])
+        self.assertTrue(all(isinstance(value, int) for value in result['durations_ns'].values()))
+
+    def test_serviceping_pingresponse_durations(self):
+        result = ping('localhost', port=65500)
+        self.assertIsInstance(result.durations_ns['all'], int)
+        self.assertIsInstance(result.durations['all'], timedelta)
+        self.assertEqual(result.durations['all'], timedelta(microseconds=result.durations_ns['all'] / 1000))
+        self.assertEqual(result.duration_ns, result.durations_ns['all'])
+
+    def test_serviceping_pingresponse_legacy_durations(self):
+        result = PingResponse(durations={'all': timedelta(milliseconds=1.5)})
+        self.assertEqual(result.durations_ns, {'all': 1500000})
+
+    def test_serviceping_pingresponse_lazy_response(self):
+        result = PingResponse(response=bytearray(b'HTTP/1.1 200 OK\r\n'))
+        self.assertEqual(result.response, 'HTTP/1.1 200 OK\r\n')
+        self.assertIs(result.response, result.response)
+
+    def test_serviceping_scan_response_text(self):
+        with LocalHTTPServer() as server:
+            result = scan('localhost', port=server.port, url='/')
+        self.assertIsInstance(result['response'], str)
+        self.assertTrue(result['response'].startswith('HTTP/1.0 200'))
+
+    def test_serviceping_pingresponse_slots(self):
+        result = PingResponse()
+        self.assertFalse(hasattr(result, '__dict__'))
+        with self.assertRaises(AttributeError):
+            result.unknown = True
+
+    def test_serviceping_ping_keep_response(self):
+        with LocalHTTPServer() as server:
+            kept = ping('localhost', port=server.port, url='/')
+            dropped = ping('localhost', port=server.port, url='/', keep_response=False)
+        self.assertIn('HTTP/1.0 200', kept.response)
+        self.assertIsNone(dropped.response)
+        self.assertEqual(dropped.code, 200)
+        self.assertTrue(dropped.length)
+
     def test_serviceping_pingresponse__str__(self):
         result = ping('localhost', 65500)
         self.assertIn('ip=localhost(127.0.0.1):port=65500:responding=False:data_mismatch=False:timeout=False:ssl_version=:duration=', str(result))
 
+    def test_serviceping_scanfailed_default_result(self):
+        self.assertEqual(ScanFailed('failed').result, {})
+
+    def test_serviceping_scan_invalid_hostname_reason(self):
+        with self.assertRaises(ScanFailed) as context:
+            scan('pythonpython.python')
+        self.assertEqual(context.exception.result['reason'], 'dns')
+
+    def test_serviceping_scan_refused(self):
+        result = scan('localhost', port=unused_port(), timeout=5)
+        self.assertEqual(result['state'], 'closed')
+        self.assertEqual(result['reason'], 'refused')
+        # A refused connection fails as soon as the reset arrives, not at the timeout
+        self.assertLess(result['durations_ns']['connect'], 1000000000)
+
+    def test_serviceping_scan_connect_timeout(self):
+        with SilentServer(backlog=0) as server:
+            server.fill()
+            started = time.monotonic()
+            result = scan('127.0.0.1', port=server.port, timeout=0.2)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(result['state'], 'closed')
+        self.assertEqual(result['reason'], 'timeout')
+
+    def test_serviceping_scan_request_timeout_deadline(self):
+        with SilentServer() as server:
+            started = time.monotonic()
+            with self.assertRaises(ScanFailed) as context:
+                scan('127.0.0.1', port=server.port, url='/', timeout=0.3)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(context.exception.result['reason'], 'timeout')
+
+    def test_serviceping_scan_ssl_error(self):
+        with LocalHTTPServer() as server:
+            with self.assertRaises(ScanFailed) as context:
+                scan('localhost', port=server.port, https=True)
+        self.assertEqual(context.exception.result['reason'], 'ssl_error')
+
+    def test_serviceping_ping_reason(self):
+        result = ping('localhost', port=unused_port())
+        self.assertEqual(result.reason, 'refused')
+        self.assertFalse(result.timeout)
+        with SilentServer(backlog=0) as server:
+            server.fill()
+            result = ping('127.0.0.1', port=server.port, timeout=0.2)
+        self.assertEqual(result.reason, 'timeout')
+        self.assertTrue(result.timeout)
+        self.assertIn("reason='timeout'", repr(result))
+
+    def test_serviceping_scan_address_mode_race_reason(self):
+        result = scan('localhost', port=unused_port(), address_mode='race')
+        self.assertEqual(result['reason'], 'refused')
+        self.assertEqual(result['addresses'][0]['reason'], 'refused')
+
+
+
+class TestServicepingPingMany(unittest.TestCase):
+
+    def test_ping_many(self):
+        closed = unused_port()
+        with LocalHTTPServer() as server:
+            responses = list(ping_many(
+                [('127.0.0.1', server.port), ('localhost', closed), {'host': '127.0.0.1', 'port': server.port}],
+                workers=2, url='/'
+            ))
+        self.assertEqual(len(responses), 3)
+        by_target = sorted((response.port, response.sequence, response.responding) for response in responses)
+        self.assertIn((closed, 0, False), by_target)
+        self.assertIn((server.port, 0, True), by_target)
+        self.assertIn((server.port, 1, True), by_target)
+        self.assertTrue(all(response.code == 200 for response in responses if response.responding))
+
+    def test_ping_many_bounded(self):
+        consumed = []
+
+        def targets(port):
+            for sequence in range(20):
+                consumed.append(sequence)
+                yield '127.0.0.1', port
+
+        with LocalHTTPServer() as server:
+            responses = ping_many(targets(server.port), workers=2, max_pending=3)
+            next(responses)
+            self.assertLessEqual(len(consumed), 4)
+            self.assertEqual(len(list(responses)), 19)
+
+    def test_ping_many_rate(self):
+        closed = unused_port()
+        with LocalHTTPServer() as server:
+            started = time.monotonic()
+            responses = list(ping_many(
+                [('127.0.0.1', server.port)] * 4 + [('127.0.0.1', closed)], workers=4, rate=20
+            ))
+        # The pings of the rate limited target are spread out without holding up the other target
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertLess([response.port for response in responses].index(closed), 2)
+        self.assertEqual([response.sequence for response in responses if response.port == server.port], [0, 1, 2, 3])
+
+    def test_ping_many_close(self):
+        with LocalHTTPServer() as server:
+            responses = ping_many([('127.0.0.1', server.port)] * 100, workers=2)
+            next(responses)
+            responses.close()
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        now = bucket.updated
+        self.assertEqual(bucket.reserve(now), 0)
+        self.assertEqual(bucket.reserve(now), 0)
+        self.assertAlmostEqual(bucket.reserve(now), 0.1)
+        self.assertAlmostEqual(bucket.reserve(now), 0.2)
+        self.assertEqual(bucket.reserve(now + 1), 0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping persistent connection pings
+"""
+import unittest
+from serviceping.session import PingSession
+from serviceping.tls import TLSSessionCache
+from .localserver import IdleCloseHandler, KeepAliveHandler, LocalHTTPServer, unused_port
+
+
+class TestPingSession(unittest.TestCase):
+
+    def test_keep_alive(self):
+        with LocalHTTPServer(KeepAliveHandler) as server, PingSession('localhost', port=server.port) as session:
+            responses = [session.ping(sequence) for sequence in range(3)]
+        self.assertTrue(all(response.responding for response in responses))
+        self.assertEqual([response.code for response in responses], [200, 200, 200])
+        self.assertEqual([response.sequence for response in responses], [0, 1, 2])
+        self.assertIn('connect', responses[0].durations_ns)
+        self.assertEqual(list(responses[1].durations_ns.keys()), ['all', 'request', 'ttfb', 'headers', 'body'])
+        self.assertIn('serviceping test response', responses[2].response)
+        self.assertEqual(session.requests, 3)
+        self.assertEqual(session.connections, 1)
+        self.assertEqual(session.reconnects, 0)
+        self.assertIsNone(session.socket)
+
+    def test_server_closes(self):
+        with LocalHTTPServer() as server, PingSession('localhost', port=server.port, keep_response=False) as session:
+            responses = [session.ping(sequence) for sequence in range(3)]
+        self.assertTrue(all(response.responding for response in responses))
+        self.assertIsNone(responses[0].response)
+        self.assertIn('connect', responses[2].durations_ns)
+        self.assertEqual(session.connections, 3)
+        self.assertEqual(session.reconnects, 2)
+
+    def test_idle_connection_closed(self):
+        with LocalHTTPServer(IdleCloseHandler) as server, PingSession('localhost', port=server.port) as session:
+            first = session.ping(0)
+            second = session.ping(1)
+        self.assertTrue(first.responding)
+        self.assertTrue(second.responding)
+        self.assertIn('connect', second.durations_ns)
+        self.assertEqual(session.requests, 2)
+        self.assertEqual(session.reconnects, 1)
+
+    def test_https(self):
+        with LocalHTTPServer(KeepAliveHandler).wrap_ssl() as server:
+            with PingSession('localhost', port=server.port, https=True, tls_sessions=TLSSessionCache()) as session:
+                first = session.ping(0)
+                second = session.ping(1)
+        self.assertIn('ssl', first.durations_ns)
+        self.assertNotIn('ssl', second.durations_ns)
+        self.assertTrue(second.ssl_version.startswith('TLS'))
+        self.assertEqual(second.code, 200)
+        self.assertEqual(session.connections, 1)
+
+    def test_closed_port(self):
+        with PingSession('localhost', port=unused_port()) as session:
+            response = session.ping(0)
+        self.assertFalse(response.responding)
+        self.assertEqual(response.state, 'closed')
+        self.assertEqual(response.reason, 'refused')
+        self.assertEqual(session.connections, 0)
+
+    def test_invalid_host(self):
+        response = PingSession('pythonpython.python').ping(0)
+        self.assertFalse(response.responding)
+        self.assertTrue(response.error)
+        self.assertEqual(response.error_message, 'DNS Lookup failed')
+        self.assertEqual(response.reason, 'dns')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping sharded scans
+"""
+import asyncio
+import unittest
+from serviceping.network import PingResponse
+from serviceping.sharded import RECORD, ShardedScanner, _ping_shard, pack_response, sharded_scan, unpack_response
+from .localserver import LocalHTTPServer, unused_port
+
+
+class TestShardedScan(unittest.TestCase):
+
+    def test_pack_round_trip(self):
+        targets = [('localhost', 80), ('ip6-localhost', 443)]
+        original = PingResponse(
+            host='ip6-localhost', port=443, ip='::1', responding=True, state='open', code=200, length=1234,
+            ssl_resumed=True, durations_ns={'dns': 1, 'connect': 2, 'ssl': 3, 'all': 10}, start=0, end=10
+        )
+        record = pack_response(1, original)
+        self.assertEqual(len(record), RECORD.size)
+        unpacked = unpack_response(record, targets)
+        for name in ['host', 'port', 'ip', 'responding', 'state', 'code', 'length', 'ssl_resumed', 'durations_ns',
+                     'reason']:
+            self.assertEqual(getattr(unpacked, name), getattr(original, name), name)
+        self.assertEqual(unpacked.sequence, 1)
+
+    def test_pack_failure(self):
+        failed = PingResponse(host='localhost', port=80, ip='127.0.0.1', state='closed', reason='refused')
+        unpacked = unpack_response(b'xx' + pack_response(0, failed), [('localhost', 80)], offset=2)
+        self.assertFalse(unpacked.responding)
+        self.assertEqual(unpacked.reason, 'refused')
+        self.assertEqual(unpacked.ip, '127.0.0.1')
+        self.assertIsNone(unpacked.code)
+
+    def test_ping_shard_bounded(self):
+        port = unused_port()
+        pulled = []
+        sent = []
+
+        def shard():
+            for index in range(20):
+                pulled.append(index)
+                yield index, '127.0.0.1', port
+
+        class Connection(object):
+            def send_bytes(self, batch):
+                sent.append((len(batch) // RECORD.size, len(pulled)))
+
+        stats = asyncio.run(_ping_shard(shard(), Connection(), 3, 1, {}))
+        self.assertEqual(stats.count, 0)
+        self.assertEqual(sum(count for count, _ in sent), 20)
+        records = 0
+        for count, pulled_count in sent:
+            # Only the finished pings and the pings in flight have been taken from the shard
+            self.assertLessEqual(pulled_count, records + count + 3)
+            records += count
+
+    def test_sharded_scan(self):
+        closed = unused_port()
+        with LocalHTTPServer() as server:
+            targets = [('127.0.0.1', server.port)] * 10 + [('localhost', closed)]
+            responses, stats = sharded_scan(targets, processes=3, concurrency=4, url='/')
+        self.assertEqual([response.sequence for response in responses], list(range(11)))
+        self.assertTrue(all(response.code == 200 for response in responses[:10]))
+        self.assertEqual(responses[-1].reason, 'refused')
+        self.assertEqual(stats.count, 10)
+        self.assertGreater(stats.mean(), 0)
+
+    def test_scanner_counts(self):
+        scanner = ShardedScanner(processes=2)
+        with LocalHTTPServer() as server:
+            responses = list(scanner.scan([('127.0.0.1', server.port), ('127.0.0.1', unused_port())]))
+        self.assertEqual(len(responses), 2)
+        self.assertEqual(scanner.count_sent, 2)
+        self.assertEqual(scanner.count_received, 1)
+        self.assertEqual(scanner.stats.count, 1)
+        self.assertEqual(list(scanner.scan([])), [])
+
+    def test_worker_failure(self):
+        targets = [('127.0.0.1', unused_port())] * 3
+        responses, stats = sharded_scan(targets, processes=2, invalid_argument=True)
+        self.assertEqual([response.sequence for response in responses], [0, 1, 2])
+        for response in responses:
+            self.assertTrue(response.error)
+            self.assertEqual(response.reason, 'error')
+            self.assertIn('exit code 1', response.error_message)
+        self.assertEqual(stats.count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping SYN probes
+"""
+import socket
+import struct
+import unittest
+from serviceping.network import PingResponse
+from serviceping.synprobe import SynProber, TCP_SYN, available, checksum, syn_ping, syn_packet
+from .localserver import LocalHTTPServer, unused_port
+
+
+class TestSynPacket(unittest.TestCase):
+
+    def test_checksum(self):
+        # Example from RFC 1071
+        data = bytes([0x00, 0x01, 0xf2, 0x03, 0xf4, 0xf5, 0xf6, 0xf7])
+        self.assertEqual(checksum(data), ~0xddf2 & 0xffff)
+        self.assertEqual(checksum(b'\x01'), ~0x0100 & 0xffff)
+
+    def test_syn_packet(self):
+        source, destination = socket.inet_aton('10.0.0.1'), socket.inet_aton('10.0.0.2')
+        packet = syn_packet(source, destination, 40000, 443, 12345)
+        self.assertEqual(len(packet), 24)
+        source_port, destination_port, sequence, _, offset, flags = struct.unpack_from('!HHIIBB', packet)
+        self.assertEqual((source_port, destination_port, sequence), (40000, 443, 12345))
+        self.assertEqual(offset >> 4, 6)
+        self.assertEqual(flags, TCP_SYN)
+        # The checksum of a segment including its checksum is zero
+        pseudo_header = struct.pack('!4s4sBBH', source, destination, 0, socket.IPPROTO_TCP, len(packet))
+        self.assertEqual(checksum(pseudo_header + packet), 0)
+
+
+@unittest.skipUnless(available(), 'SYN probes need root or CAP_NET_RAW')
+class TestSynProber(unittest.TestCase):
+
+    def test_probe(self):
+        closed = unused_port()
+        with LocalHTTPServer() as server, SynProber(timeout=1) as prober:
+            responses = prober.probe([('127.0.0.1', server.port), ('localhost', closed), ('127.0.0.1', server.port)])
+        self.assertEqual([response.sequence for response in responses], [0, 1, 2])
+        self.assertEqual([response.state for response in responses], ['open', 'closed', 'open'])
+        self.assertTrue(responses[0].responding)
+        self.assertFalse(responses[1].responding)
+        self.assertEqual(responses[1].reason, 'refused')
+        self.assertEqual(responses[1].ip, '127.0.0.1')
+        self.assertEqual(list(responses[0].durations_ns), ['dns', 'connect', 'all'])
+
+    def test_probe_invalid_host(self):
+        with SynProber(timeout=0.1) as prober:
+            response = prober.probe([('pythonpython.python', 80)])[0]
+        self.assertTrue(response.error)
+        self.assertEqual(response.reason, 'dns')
+
+    def test_syn_ping(self):
+        with LocalHTTPServer() as server:
+            response = syn_ping('localhost', port=server.port, sequence=7)
+        self.assertIsInstance(response, PingResponse)
+        self.assertTrue(response.responding)
+        self.assertEqual(response.sequence, 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# Copyright (c) 2013-2015, Yahoo Inc.
+# Copyrights licensed under the Apache 2.0 License
+# See the accompanying LICENSE.txt file for terms.
+"""
+test serviceping ssl context and session caching
+"""
+import ssl
+import unittest
+from serviceping import tls
+from serviceping.network import ping
+from serviceping.tls import TLSSessionCache, get_context
+from .localserver import LocalHTTPServer
+
+
+class TestTLS(unittest.TestCase):
+
+    def test_get_context_cached(self):
+        self.assertIs(get_context('localhost'), get_context('localhost'))
+        self.assertIsNot(get_context('localhost'), get_context('localhost', verify=True))
+
+    def test_get_context_verify(self):
+        self.assertEqual(get_context('localhost').verify_mode, ssl.CERT_NONE)
+        self.assertEqual(get_context('localhost', verify=True).verify_mode, ssl.CERT_REQUIRED)
+        self.assertTrue(get_context('localhost', verify=True).check_hostname)
+
+    def test_session_cache_max_size(self):
+        sessions = TLSSessionCache(max_size=1)
+        sessions.store('a', 443, 'session_a')
+        sessions.store('b', 443, 'session_b')
+        sessions.store('c', 443, None)
+        self.assertEqual(len(sessions), 1)
+        self.assertIsNone(sessions.get('a', 443))
+        self.assertEqual(sessions.get('b', 443), 'session_b')
+
+    def test_ping_session_resumed(self):
+        sessions = TLSSessionCache()
+        with LocalHTTPServer().wrap_ssl() as server:
+            first = ping('localhost', port=server.port, url='/', https=True, tls_sessions=sessions)
+            second = ping('localhost', port=server.port, url='/', https=True, tls_sessions=sessions)
+        self.assertTrue(first.responding)
+        self.assertEqual(first.code, 200)
+        self.assertFalse(first.ssl_resumed)
+        self.assertTrue(second.ssl_resumed)
+        self.assertIn('ssl', second.durations)
+
+    def test_session_cache_context(self):
+        sessions = TLSSessionCache()
+        sessions.store('a', 443, 'session_a')
+        self.assertIsNone(sessions.get('a', 443, verify=True))
+        sessions.store('a', 443, 'session_verified', verify=True)
+        self.assertEqual(sessions.get('a', 443), 'session_a')
+        self.assertEqual(sessions.get('a', 443, verify=True), 'session_verified')
+        # A session of another context is discarded
+        self.assertIsNone(sessions.get('a', 443, context=get_context('a', verify=True)))
+        self.assertIsNone(sessions.get('a', 443))
+        self.assertEqual(len(sessions), 1)
+
+    def test_ping_context_cache_dropped(self):
+        sessions = TLSSessionCache()
+        with LocalHTTPServer().wrap_ssl() as server:
+            first = ping('localhost', port=server.port, url='/', https=True, tls_sessions=sessions)
+            tls._contexts.clear()
+            second = ping('localhost', port=server.port, url='/', https=True, tls_sessions=sessions)
+            third = ping('localhost', port=server.port, url='/', https=True, tls_sessions=sessions)
+        self.assertTrue(first.responding)
+        self.assertTrue(second.responding)
+        self.assertFalse(second.ssl_resumed)
+        self.assertTrue(third.ssl_resumed)
+
+    def test_ping_without_session_cache(self):
+        with LocalHTTPServer().wrap_ssl() as server:
+            ping('localhost', port=server.port, url='/', https=True)
+            result = ping('localhost', port=server.port, url='/', https=True)
+        self.assertTrue(result.responding)
+        self.assertTrue(result.ssl_version.startswith('TLS'))
+        self.assertFalse(result.ssl_resumed)
+
+
+if __name__ == '__main__':
+    unittest.main()